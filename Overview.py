@@ -2,24 +2,61 @@ from pathlib import Path
 import streamlit as st
 
 from cfg.cfg import load_config
-from src.album import Album, load_albums
+from src.album_store import AlbumStore
+from src.storage import StorageBackend, get_storage
 import src.album_calcs as ac
+from src.network_jobs import start_network_jobs
 
 SETTING_PATH = Path("C:/Users/ste-c/OneDrive/Documents/1001-albums/cfg/setting.yaml")
 
 
-def set_albums() -> list[Album]:
-    if "albums" in st.session_state:
+@st.cache_resource(max_entries=1)
+def shared_albums(_storage: StorageBackend, data_stamp: str) -> AlbumStore:
+    """loads one read only copy of the catalogue for every session. data_stamp changes
+    whenever the data files do, which reloads the catalogue. Edits are not part of it,
+    so saving an album does not reload it"""
+    albums = _storage.load_catalogue()
+    albums.freeze()
+    return albums
+
+
+def set_albums() -> AlbumStore:
+    if "storage" not in st.session_state:
+        st.session_state.storage = get_storage(st.session_state.config)
+    storage: StorageBackend = st.session_state.storage
+    data_stamp = storage.data_stamp()
+    edits_stamp = storage.edits_stamp()
+    if (
+        st.session_state.get("data_stamp") == data_stamp
+        and st.session_state.get("edits_stamp") == edits_stamp
+    ):
         return st.session_state.albums
-    albums = load_albums(st.session_state.config)
+    # every edit is saved straight away, so a fresh overlay never loses a session's
+    # changes. the edits are applied to the overlay, leaving the shared catalogue as is
+    albums = shared_albums(storage, data_stamp).overlay()
+    storage.apply_edits(albums)
     st.session_state.albums = albums
+    st.session_state.data_stamp = data_stamp
+    st.session_state.edits_stamp = edits_stamp
     return albums
 
 
+def set_summary(albums: AlbumStore) -> ac.OverviewSummary:
+    """returns the overview figures, only recalculating them if the albums have changed"""
+    summary: ac.OverviewSummary | None = st.session_state.get("overview_summary")
+    if summary is not None and summary.version == albums.version:
+        return summary
+    summary = ac.OverviewSummary.from_albums(albums)
+    st.session_state.overview_summary = summary
+    return summary
+
+
 def main() -> None:
 
     st.session_state.config = load_config(SETTING_PATH)
     albums = set_albums()
+    summary = set_summary(albums)
+    start_network_jobs()
 
     st.set_page_config(
         page_title="Hello",
@@ -27,22 +64,26 @@ def main() -> None:
     st.write("## 1001 Albums to Hear Before you Die")
     left1, right1 = st.columns(2)
     left1.write(
-        f"Albums Heard Previously\n\n{ac.albums_previously_listened_to(albums)} / 1001"
-    )
-    right1.write(
-        f"Total Previous Listening Time\n\n{ac.previous_listened_time(albums)}"
+        f"Albums Heard Previously\n\n{summary.previously_listened} / {summary.total_albums}"
     )
+    right1.write(f"Total Previous Listening Time\n\n{summary.previous_listened_time}")
 
     left2, right2 = st.columns(2)
-    left2.write(f"New Albums Heard\n\n{ac.albums_newly_listened_to(albums)} / 1001")
-    right2.write(f"Total New Listening Time\n\n{ac.new_listened_time(albums)}")
+    left2.write(
+        f"New Albums Heard\n\n{summary.newly_listened} / {summary.total_albums}"
+    )
+    right2.write(f"Total New Listening Time\n\n{summary.new_listened_time}")
 
     left3, right3 = st.columns(2)
-    left3.markdown(f"**Albums Heard**\n\n**{len(ac.albums_listened_to())} / 1001**")
-    right3.markdown(f"**Total Listening Time**\n\n**{ac.total_listened_time(albums)}**")
+    left3.markdown(
+        f"**Albums Heard**\n\n**{summary.listened} / {summary.total_albums}**"
+    )
+    right3.markdown(f"**Total Listening Time**\n\n**{summary.total_listened_time}**")
     st.sidebar.success("Select a page above.")
 
-    next_album = ac.next_album(albums)
+    next_album = summary.next_album
+    if next_album is None:
+        return
     st.write(f"**Next Album**")
     st.write(f"Title: {next_album.album_title}")
     st.write(f"Artist: {next_album.artist}")
@@ -0,0 +1,35 @@
+"""times the album_calcs aggregate functions on synthetic catalogues.
+run from the repository root with: python -m benchmarks.album_calcs"""
+
+from timeit import Timer
+from typing import Callable
+from benchmarks.synthetic import SIZES, synthetic_store
+import src.album_calcs as ac
+
+FUNCTIONS: list[Callable] = [
+    ac.previous_listened_time,
+    ac.new_listened_time,
+    ac.total_listened_time,
+    ac.albums_newly_listened_to,
+    ac.listened_albums_by_year,
+    ac.listened_time_by_year,
+]
+
+
+def time_function(func: Callable, *args) -> float:
+    """returns the best time of a function call in seconds"""
+    timer = Timer(lambda: func(*args))
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=3, number=number)) / number
+
+
+def main() -> None:
+    print(f"{'function':<28}" + "".join(f"{n:>14,}" for n in SIZES))
+    stores = [synthetic_store(n) for n in SIZES]
+    for func in FUNCTIONS:
+        times = [time_function(func, store) for store in stores]
+        print(f"{func.__name__:<28}" + "".join(f"{t * 1000:>12.3f}ms" for t in times))
+
+
+if __name__ == "__main__":
+    main()
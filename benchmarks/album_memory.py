@@ -0,0 +1,82 @@
+"""compares the memory used by a list of Album dataclasses, laid out as they were before
+the AlbumStore, with the columnar AlbumStore on synthetic catalogues.
+run from the repository root with: python -m benchmarks.album_memory"""
+
+from dataclasses import dataclass, field
+import gc
+import tracemalloc
+from typing import Any, Callable
+from benchmarks.synthetic import (
+    SIZES,
+    person_name,
+    synthetic_personnel,
+    synthetic_store,
+)
+
+PEOPLE_PER_ALBUM = 4
+
+
+@dataclass
+class LegacyAlbum:
+    """the Album layout before the AlbumStore: a __dict__ per album, and separate
+    string objects for every name, as read from json"""
+
+    key: int
+    album_title: str
+    artist: str
+    previous_listened: bool
+    listened: bool
+    release_date: int
+    total_time_s: int
+    comments: str = ""
+    listen_again: str | None = None
+    tracks: int = 1
+    genres: list[str] = field(default_factory=list)
+    musicians: list[str] = field(default_factory=list)
+    producers: list[str] = field(default_factory=list)
+    writers: list[str] = field(default_factory=list)
+    arrangers: list[str] = field(default_factory=list)
+
+
+def legacy_albums(n: int) -> list[LegacyAlbum]:
+    people = synthetic_personnel(n, PEOPLE_PER_ALBUM).tolist()
+    return [
+        LegacyAlbum(
+            key=i,
+            album_title=f"Album {i}",
+            artist=f"Artist {i % (n // 3 + 1)}",
+            previous_listened=False,
+            listened=i % 2 == 0,
+            release_date=1955 + i % 65,
+            total_time_s=2400,
+            tracks=10,
+            musicians=[person_name(p) for p in people[i]],
+        )
+        for i in range(n)
+    ]
+
+
+def measure(build: Callable[[int], Any], n: int) -> float:
+    """returns the memory held by the result of build(n) in MB"""
+    gc.collect()
+    tracemalloc.start()
+    data = build(n)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del data
+    return current / 1e6
+
+
+def main() -> None:
+    layouts: dict[str, Callable[[int], Any]] = {
+        "list[Album]": legacy_albums,
+        "AlbumStore": lambda n: synthetic_store(n, people_per_album=PEOPLE_PER_ALBUM),
+    }
+    print(f"{'layout':<16}" + "".join(f"{n:>14,}" for n in SIZES))
+    for name, build in layouts.items():
+        sizes = [measure(build, n) for n in SIZES]
+        print(f"{name:<16}" + "".join(f"{mb:>12.1f}MB" for mb in sizes))
+
+
+if __name__ == "__main__":
+    main()
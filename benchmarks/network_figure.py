@@ -0,0 +1,104 @@
+"""compares the size, build and serialisation time of the personnel network figure,
+drawn with a trace for every line, as it was before, with a WebGL trace for each colour,
+and with the default rendering budget, which groups the nodes into clusters when the
+figure is larger than it.
+run from the repository root with: python -m benchmarks.network_figure"""
+
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+import plotly.graph_objects as go
+from benchmarks.synthetic import synthetic_store
+from cfg.cfg import Config, Data, NetworkGraphSettings
+from src.network_graph import NetworkPlots, PersonelNetowrkGraph, PersonelNetworkLines
+
+GRAPH_SIZES = [300, 1_000, 3_000]
+PEOPLE_PER_ALBUM = 2
+
+
+def benchmark_config(directory: Path) -> Config:
+    """a config that keeps the layout cache in the given directory, and draws every
+    node and line"""
+    return Config(
+        data=Data(
+            album_data_csv_name="albums",
+            album_data_json_path=str(directory / "albums.json"),
+            csv_save_dir=str(directory),
+            personal_data_csv_name="personal",
+            personal_data_json_path=str(directory / "personal.json"),
+            raw_excel_path=str(directory / "albums.xlsx"),
+            sheet_name="Sheet1",
+        ),
+        network_graph=NetworkGraphSettings(
+            layout_seed=0, max_rendered_nodes=10**9, max_rendered_edges=10**9
+        ),
+    )
+
+
+def per_edge_traces(network_lines: PersonelNetworkLines) -> list[go.Scatter]:
+    """the lines as they were drawn before, with a trace for every line"""
+    nodes = network_lines.network_graph.graph.nodes
+    return [
+        go.Scatter(
+            x=[
+                nodes[details["album_title"]]["pos"][0],
+                nodes[details["group_name"]]["pos"][0],
+            ],
+            y=[
+                nodes[details["album_title"]]["pos"][1],
+                nodes[details["group_name"]]["pos"][1],
+            ],
+            line=dict(width=1, color=network_lines.edge_colour(details)),
+            hoverinfo="none",
+            showlegend=False,
+            mode="lines",
+        )
+        for details in network_lines.edge_details
+    ]
+
+
+def run(network_plots: NetworkPlots, per_edge: bool, clustered: bool) -> str:
+    settings = network_plots.config.network_graph
+    if clustered:
+        settings.max_rendered_nodes = NetworkGraphSettings.max_rendered_nodes
+        settings.max_rendered_edges = NetworkGraphSettings.max_rendered_edges
+    start = perf_counter()
+    fig = network_plots.network_plot()
+    if per_edge:
+        fig = go.Figure(
+            data=[*per_edge_traces(network_plots.network_lines), *fig.data[-2:]],
+            layout=fig.layout,
+        )
+    build = perf_counter() - start
+    start = perf_counter()
+    json = fig.to_json()
+    serialise = perf_counter() - start
+    settings.max_rendered_nodes = settings.max_rendered_edges = 10**9
+    return (
+        f"{len(fig.data):>8} {len(json) / 1024:>10.0f}kB"
+        f" {build:>9.3f}s {serialise:>11.3f}s"
+    )
+
+
+def main() -> None:
+    print(
+        f"{'lines':<18}{'edges':>8}{'traces':>9}{'size':>13}{'build':>11}{'serialise':>13}"
+    )
+    with TemporaryDirectory() as directory:
+        config = benchmark_config(Path(directory))
+        for n in GRAPH_SIZES:
+            store = synthetic_store(n, people_per_album=PEOPLE_PER_ALBUM)
+            network_graph = PersonelNetowrkGraph(config, store)
+            edges = network_graph.graph.number_of_edges()
+            for name, per_edge, clustered in [
+                ("trace per line", True, False),
+                ("trace per colour", False, False),
+                ("default budget", False, True),
+            ]:
+                # the graph is shared, and the lines and points are built for each
+                network_plots = NetworkPlots(PersonelNetworkLines(network_graph))
+                print(f"{name:<18}{edges:>8}{run(network_plots, per_edge, clustered)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""times building the linking groups of the personnel network graph, which groups the
+people that have worked on the same albums, on synthetic catalogues.
+run from the repository root with: python -m benchmarks.network_groups"""
+
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from benchmarks.network_figure import benchmark_config
+from benchmarks.synthetic import synthetic_store
+from src.network_graph import PersonelNetowrkGraph
+
+GRAPH_SIZES = [1_000, 10_000, 30_000]
+PEOPLE_PER_ALBUM = 4
+
+
+def main() -> None:
+    print(f"{'albums':>8}{'people':>9}{'groups':>9}{'people':>11}{'groups':>11}")
+    with TemporaryDirectory() as directory:
+        config = benchmark_config(Path(directory))
+        for n in GRAPH_SIZES:
+            store = synthetic_store(n, people_per_album=PEOPLE_PER_ALBUM)
+            network_graph = PersonelNetowrkGraph(config, store)
+            start = perf_counter()
+            people = network_graph.non_album_nodes
+            people_time = perf_counter() - start
+            start = perf_counter()
+            groups = network_graph.linking_groups
+            groups_time = perf_counter() - start
+            print(
+                f"{n:>8}{len(people):>9}{len(groups):>9}"
+                f"{people_time:>10.2f}s{groups_time:>10.2f}s"
+            )
+
+
+if __name__ == "__main__":
+    main()
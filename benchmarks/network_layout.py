@@ -0,0 +1,82 @@
+"""compares the layout engines on synthetic album/personnel graphs, reporting the time
+taken and the mean edge length relative to the mean distance between nodes, which is
+lower for layouts that keep connected nodes together.
+run from the repository root with: python -m benchmarks.network_layout"""
+
+from dataclasses import replace
+from time import perf_counter
+import networkx as nx
+import numpy as np
+from benchmarks.synthetic import synthetic_store
+from cfg.cfg import NetworkGraphSettings
+from src.layout import LayoutEngine, LayoutType, get_layout_engine
+
+GRAPH_SIZES = [300, 1_000, 3_000]
+PEOPLE_PER_ALBUM = 2
+# the networkx spring layout takes minutes on larger graphs
+SPRING_MAX_ALBUMS = 1_000
+
+
+def synthetic_graph(n: int) -> nx.Graph:
+    """a graph of n albums, linked through the people that have worked on two or more"""
+    store = synthetic_store(n, people_per_album=PEOPLE_PER_ALBUM)
+    musicians = store.columns["musicians"]
+    graph = nx.Graph()
+    people_albums: dict[int, list[int]] = {}
+    for album, person in zip(musicians.rows.tolist(), musicians.codes.tolist()):
+        people_albums.setdefault(person, []).append(album)
+    for person, albums in people_albums.items():
+        if len(albums) < 2:
+            continue
+        graph.add_edges_from((f"Album {album}", f"Person {person}") for album in albums)
+    return graph
+
+
+def edge_length_ratio(graph: nx.Graph, pos: dict) -> float:
+    points = np.array([pos[node] for node in graph.nodes])
+    index = {node: i for i, node in enumerate(graph.nodes)}
+    edges = np.array([(index[u], index[v]) for u, v in graph.edges])
+    edge_lengths = np.linalg.norm(points[edges[:, 0]] - points[edges[:, 1]], axis=1)
+    rng = np.random.default_rng(0)
+    pairs = rng.integers(0, len(points), (10_000, 2))
+    distances = np.linalg.norm(points[pairs[:, 0]] - points[pairs[:, 1]], axis=1)
+    return float(edge_lengths.mean() / distances.mean())
+
+
+def run(engine: LayoutEngine, graph: nx.Graph) -> str:
+    start = perf_counter()
+    pos = engine.layout(graph)
+    total = perf_counter() - start
+    iterations = len(engine.iteration_times)
+    return (
+        f"{total:>9.2f}s {iterations:>6} {np.mean(engine.iteration_times) * 1000:>9.2f}ms"
+        f" {edge_length_ratio(graph, pos):>8.3f}"
+    )
+
+
+def main() -> None:
+    settings = NetworkGraphSettings(layout_seed=0)
+    engines = {
+        "spring": replace(settings, layout_engine=LayoutType.SPRING),
+        "grid": replace(settings, layout_engine=LayoutType.GRID),
+        "grid (random start)": replace(
+            settings, layout_engine=LayoutType.GRID, layout_spectral_init=False
+        ),
+    }
+    print(
+        f"{'engine':<26}{'nodes':>8}{'time':>11} {'iters':>6} {'per iter':>11} {'ratio':>8}"
+    )
+    for n in GRAPH_SIZES:
+        graph = synthetic_graph(n)
+        for name, engine_settings in engines.items():
+            if (
+                engine_settings.layout_engine == LayoutType.SPRING
+                and n > SPRING_MAX_ALBUMS
+            ):
+                continue
+            result = run(get_layout_engine(engine_settings), graph)
+            print(f"{name:<26}{len(graph):>8}{result}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import numpy as np
+from src.album_store import LIST_COLUMNS, AlbumStore, ListColumn
+from src.symbol_table import SymbolTable
+import cfg.schema as sch
+
+SIZES = [1_000, 100_000, 1_000_000]
+
+
+def person_name(i: int) -> str:
+    return f"Person {i}"
+
+
+def synthetic_personnel(n: int, people_per_album: int, seed: int = 0) -> np.ndarray:
+    """returns an (n, people_per_album) array of person ids, drawn from a pool of people
+    that grows with the catalogue, so names are shared between albums"""
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, max(n // 10, 1), (n, people_per_album))
+
+
+def synthetic_store(n: int, seed: int = 0, people_per_album: int = 0) -> AlbumStore:
+    """creates an AlbumStore of n random albums, with people_per_album musicians each"""
+    rng = np.random.default_rng(seed)
+    listened = rng.random(n) < 0.4
+    titles = np.array([f"Album {i}" for i in range(n)], dtype=object)
+    artists = np.array([f"Artist {i % (n // 3 + 1)}" for i in range(n)], dtype=object)
+    symbols = SymbolTable()
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    columns = {
+        name: ListColumn(np.empty(0, dtype=np.int32), offsets.copy(), symbols)
+        for name in LIST_COLUMNS
+    }
+    if people_per_album:
+        people = synthetic_personnel(n, people_per_album, seed)
+        unique_people, codes = np.unique(people, return_inverse=True)
+        for i in unique_people:
+            symbols.intern(person_name(int(i)))
+        columns[sch.Album.musicians] = ListColumn(
+            codes.reshape(-1).astype(np.int32),
+            np.arange(n + 1, dtype=np.int64) * people_per_album,
+            symbols,
+        )
+    return AlbumStore(
+        {
+            sch.Album.key: np.arange(n, dtype=np.int64),
+            sch.Album.album_title: titles,
+            sch.Album.artist: artists,
+            sch.Album.release_date: rng.integers(1955, 2020, n),
+            sch.Album.total_time_s: rng.integers(1200, 5400, n),
+            sch.Album.tracks: rng.integers(6, 20, n),
+            sch.PersonalData.listened: listened,
+            sch.PersonalData.previous_listened: listened & (rng.random(n) < 0.2),
+            sch.PersonalData.comments: np.full(n, "", dtype=object),
+            sch.PersonalData.listen_again: np.full(n, None, dtype=object),
+            **columns,
+        }
+    )
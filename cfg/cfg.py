@@ -16,6 +16,10 @@ class Data:
     raw_excel_path: str
     sheet_name: str
 
+    journal_compaction_threshold: int = 100
+    storage_backend: str = "json"
+    sqlite_path: str = ""
+
 
 @dataclass
 class NetworkGraphSettings:
@@ -44,6 +48,31 @@ class NetworkGraphSettings:
     person_highlight_color: str = "#AB63FA"
     person_size: int = 5
     person_highlight_size: int = 10
+    layout_engine: str = "grid"
+    layout_spring_iterations: int = 1000
+    layout_grid_iterations: int = 500
+    layout_tolerance: float = 1e-3
+    layout_spectral_init: bool = True
+    layout_seed: int | None = None
+    layout_incremental: bool = True
+    layout_incremental_iterations: int = 50
+    betweenness_samples: int = 100
+    betweenness_seed: int | None = 0
+    projected_role_weights: dict[str, float] = field(
+        default_factory=lambda: {
+            "musician": 1.0,
+            "producer": 1.0,
+            "arranger": 1.0,
+            "writer": 1.0,
+            "genre": 0.5,
+        }
+    )
+    projected_min_weight: float = 1.0
+    max_rendered_nodes: int = 2000
+    max_rendered_edges: int = 5000
+    projected_relations: list[str] = field(
+        default_factory=lambda: ["musician", "producer", "arranger", "writer", "genre"]
+    )
 
 
 @dataclass
@@ -1,18 +1,19 @@
-import json
-from pathlib import Path
 import streamlit as st
 import src.album_calcs as ac
 from src.album import Album
+from src.album_store import AlbumStore
+from src.storage import StorageBackend
 
 
 def update_album_key(update_value=0) -> Album:
     if "key" not in st.session_state:
-        st.session_state.key = ac.next_album(st.session_state.albums).key
+        next_album = ac.next_album(st.session_state.albums)
+        st.session_state.key = 0 if next_album is None else next_album.key
     st.session_state.key += update_value
     if st.session_state.key < 0:
         st.session_state.key = 0
-    elif st.session_state.key > 1000:
-        st.session_state.key = 1000
+    elif st.session_state.key > len(st.session_state.albums) - 1:
+        st.session_state.key = len(st.session_state.albums) - 1
     return st.session_state.albums[st.session_state.key]
 
 
@@ -22,21 +23,9 @@ def get_album_by_number() -> None:
 
 
 def save_album_details() -> None:
-    albums: list[Album] = st.session_state.albums
-    with open(Path(st.session_state.config.data.album_data_json_path), "w") as f:
-        json.dump(
-            [album.album_details() for album in albums],
-            fp=f,
-            sort_keys=True,
-            indent=4,
-        )
-    with open(Path(st.session_state.config.data.personal_data_json_path), "w") as f:
-        json.dump(
-            [album.personal_details() for album in albums],
-            fp=f,
-            sort_keys=True,
-            indent=4,
-        )
+    """saves the current album, rather than rewriting every album"""
+    storage: StorageBackend = st.session_state.storage
+    storage.save_album(album, st.session_state.albums)
 
 
 album = update_album_key(0)
@@ -71,16 +60,12 @@ def save_album_comment():
 
 
 def save_album_number():
-    current_album = st.session_state.albums.pop(album.key)
-    current_album.album_number = st.session_state.album_number
-    st.session_state.albums.insert(current_album.key, current_album)
-    albums: list[Album] = []
-    for i, a in enumerate(st.session_state.albums):
-        a.key = i
-        albums.append(a)
-    st.session_state.albums = albums
-    save_album_details()
-    st.session_state.key = current_album.key
+    albums: AlbumStore = st.session_state.albums
+    new_key = int(st.session_state.album_number) - 1
+    # a move renumbers every album after it, so the whole catalogue is written out
+    storage: StorageBackend = st.session_state.storage
+    storage.move_album(albums, album.key, new_key)
+    st.session_state.key = min(max(new_key, 0), len(albums) - 1)
     num_status.write("")
     num_status.write("")
     num_status.write(":green[Position Updated!]")
@@ -134,61 +119,66 @@ def update_listen_again():
 
 
 def update_genres(genre_keys: list[str]) -> None:
-    album.genres = []
+    genres: list[str] = []
     for key in genre_keys:
         genre: str = st.session_state.get(key).strip()  # type: ignore
         if genre == "":
             continue
-        if genre not in album.genres:
-            album.genres.append(genre)
+        if genre not in genres:
+            genres.append(genre)
+    album.genres = genres
     save_album_details()
     genre_status.write(":green[Saved!]")
 
 
 def update_musicians(musician_keys: list[str]) -> None:
-    album.musicians = []
+    musicians: list[str] = []
     for key in musician_keys:
         musician: str = st.session_state.get(key).strip()  # type: ignore
         if musician == "":
             continue
-        if musician not in album.musicians:
-            album.musicians.append(musician)
+        if musician not in musicians:
+            musicians.append(musician)
+    album.musicians = musicians
     save_album_details()
     musician_status.write(":green[Saved!]")
 
 
 def update_producers(producer_keys: list[str]) -> None:
-    album.producers = []
+    producers: list[str] = []
     for key in producer_keys:
         producer: str = st.session_state.get(key).strip()  # type: ignore
         if producer == "":
             continue
-        if producer not in album.producers:
-            album.producers.append(producer)
+        if producer not in producers:
+            producers.append(producer)
+    album.producers = producers
     save_album_details()
     producer_status.write(":green[Saved!]")
 
 
 def update_writers(writer_keys: list[str]) -> None:
-    album.writers = []
+    writers: list[str] = []
     for key in writer_keys:
         writer: str = st.session_state.get(key).strip()  # type: ignore
         if writer == "":
             continue
-        if writer not in album.writers:
-            album.writers.append(writer)
+        if writer not in writers:
+            writers.append(writer)
+    album.writers = writers
     save_album_details()
     writer_status.write(":green[Saved!]")
 
 
 def update_arrangers(arranger_keys: list[str]) -> None:
-    album.arrangers = []
+    arrangers: list[str] = []
     for key in arranger_keys:
         arranger: str = st.session_state.get(key).strip()  # type: ignore
         if arranger == "":
             continue
-        if arranger not in album.arrangers:
-            album.arrangers.append(arranger)
+        if arranger not in arrangers:
+            arrangers.append(arranger)
+    album.arrangers = arrangers
     save_album_details()
     arranger_status.write(":green[Saved!]")
 
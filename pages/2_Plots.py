@@ -7,12 +7,13 @@ import plotly.graph_objects as go
 import pandas as pd
 
 from src.network_graph import (
-    GenreNetowrkGraph,
     GenreNetworkLines,
     NetworkPlots,
-    PersonelNetowrkGraph,
     PersonelNetworkLines,
+    ProjectedAlbumLines,
 )
+from src.network_jobs import NetworkJob, drop_network_job, network_job
+from src.network_lod import Viewport
 
 
 class Graphs(StrEnum):
@@ -22,11 +23,13 @@ class Graphs(StrEnum):
     GENRES = "Genre Network Graph"
     ALBUM_AVERAGES = "Album Averages"
     NETWORK_GRAPH = "Personel Network Graph"
+    ALBUM_NETWORK = "Album Network Graph"
 
 
 class NetworkTypes(Enum):
     PERSONEL = auto()
     GENRE = auto()
+    ALBUM = auto()
 
 
 def drop_down():
@@ -145,32 +148,123 @@ def album_averages() -> None:
     st.plotly_chart(avg_track_length_fig)
 
 
+def refresh_network_graph(session_key: str) -> None:
+    """lays the graph out again in the background, overwriting the cached layout, and
+    clears the plots so they are rebuilt with the new positions"""
+    network_job(session_key, use_cache=False)
+    del st.session_state[session_key]
+
+
+def network_graph_selected(session_key: str) -> None:
+    """zooms the network graph into the box selected on it, or saves the node clicked
+    on, so its details are shown"""
+    selection = st.session_state[f"{session_key}_chart"].selection
+    if selection.box:
+        st.session_state[f"{session_key}_viewport"] = Viewport.from_box(
+            selection.box[0]
+        )
+        return
+    # the points of the clusters carry no node id
+    nodes = [point["customdata"] for point in selection.points if "customdata" in point]
+    if nodes:
+        st.session_state[f"{session_key}_node"] = int(nodes[0])
+
+
+def reset_network_view(session_key: str) -> None:
+    """shows the whole network graph again"""
+    st.session_state.pop(f"{session_key}_viewport", None)
+
+
+def network_outdated(session_key: str) -> bool:
+    """returns true if the network graph has not been built, or the albums have been
+    edited since it was"""
+    if session_key not in st.session_state:
+        return True
+    network_plots: NetworkPlots = st.session_state[session_key]
+    return network_plots.network_graph.albums_version != st.session_state.albums.version
+
+
+@st.fragment(run_every=1)
+def layout_placeholder(job: NetworkJob) -> None:
+    """shows a message until the layout is ready, then reruns the page to show it"""
+    if job.future.done():
+        st.rerun()
+    st.info("Computing the graph layout...")
+
+
+def network_failed(session_key: str, job: NetworkJob) -> None:
+    """shows the error from a failed build. The job is dropped, so the build is started
+    again when the page reruns"""
+    drop_network_job(session_key, job)
+    st.error(f"The network graph could not be built: {job.future.exception()}")
+    st.button("Retry")
+
+
+def network_bar_charts(network_plots: NetworkPlots) -> None:
+    # the album network has no linking nodes
+    if network_plots.network_graph.linking_groups:
+        people = network_plots.top_nodes()
+        st.plotly_chart(people)
+
+    album_bar = network_plots.top_albums()
+
+    st.plotly_chart(album_bar)
+
+
+def album_path(network_plots: NetworkPlots) -> None:
+    """shows a shortest path between two albums, through the nodes that link them"""
+    st.markdown("### Album Path")
+    albums = [album.album_title for album in network_plots.network_graph.albums]
+    left, right = st.columns(2)
+    from_album = left.selectbox(
+        "From", albums, index=None, placeholder="Select album..."
+    )
+    to_album = right.selectbox("To", albums, index=None, placeholder="Select album...")
+    if from_album is None or to_album is None:
+        return
+    analytics = network_plots.network_graph.analytics
+    path = analytics.album_path(from_album, to_album)
+    if path is None:
+        st.write("These albums are not connected.")
+        return
+    st.write(f"{analytics.album_steps(path)} steps: " + " → ".join(path))
+
+
 def network_graph(netowrk_type: NetworkTypes) -> None:
     """plotting the network graph, showing all the connections between people who have worked on albums"""
     if netowrk_type == NetworkTypes.PERSONEL:
-        if "personel_network" not in st.session_state:
-            network_plot = PersonelNetowrkGraph()
-            personelnetworklines = PersonelNetworkLines(network_plot)
-            st.session_state.personel_network = NetworkPlots(
-                network_lines=personelnetworklines,
-            )
-        network_plots: NetworkPlots = st.session_state.personel_network
+        session_key = "personel_network"
+        lines_type = PersonelNetworkLines
 
     if netowrk_type == NetworkTypes.GENRE:
-        if "genre_network" not in st.session_state:
-            network_plot = GenreNetowrkGraph()
-            personelnetworklines = GenreNetworkLines(network_plot)
-            st.session_state.genre_network = NetworkPlots(
-                network_lines=personelnetworklines,
-            )
-        network_plots: NetworkPlots = st.session_state.genre_network
-
+        session_key = "genre_network"
+        lines_type = GenreNetworkLines
+
+    if netowrk_type == NetworkTypes.ALBUM:
+        session_key = "album_network"
+        lines_type = ProjectedAlbumLines
+
+    if network_outdated(session_key):
+        job = network_job(session_key)
+        if not job.future.done():
+            layout_placeholder(job)
+            return
+        if job.future.exception() is not None:
+            network_failed(session_key, job)
+            return
+        st.session_state[session_key] = NetworkPlots(
+            network_lines=lines_type(job.future.result()),
+        )
+        # the node ids of the old graph may not match the new one
+        st.session_state.pop(f"{session_key}_node", None)
+    network_plots: NetworkPlots = st.session_state[session_key]
 
     left, right = st.columns([1, 3])
     left.markdown("")
     left.markdown("")
     left.button(
-        "Refresh Graph", on_click=lambda: network_plots.network_graph.create_graph()
+        "Refresh Graph",
+        on_click=partial(refresh_network_graph, session_key),
     )
     highlight_album = right.selectbox(
         "Highlight album",
@@ -178,17 +272,30 @@ def network_graph(netowrk_type: NetworkTypes) -> None:
         index=None,
         placeholder="Select album...",
     )
-    fig = network_plots.network_plot(highlight_album)
-    st.plotly_chart(fig)
-
-    people = network_plots.top_nodes()
-
-
-    st.plotly_chart(people)
-
-    album_bar = network_plots.top_albums()
+    viewport: Viewport | None = st.session_state.get(f"{session_key}_viewport")
+    fig = network_plots.network_plot(highlight_album, viewport)
+    # only the part of the graph in the viewport is sent to the browser, so zooming is
+    # done by selecting a box on the graph, and the details of a node are only shown
+    # when it is clicked on
+    st.plotly_chart(
+        fig,
+        key=f"{session_key}_chart",
+        on_select=partial(network_graph_selected, session_key),
+        selection_mode=("points", "box"),
+    )
+    if network_plots.clustered:
+        st.caption(
+            "The graph is too large to draw in full, so nearby nodes are grouped. "
+            "Select a box on the graph to zoom in."
+        )
+    if viewport is not None:
+        st.button("Reset View", on_click=partial(reset_network_view, session_key))
+    selected_node: int | None = st.session_state.get(f"{session_key}_node")
+    if selected_node is not None:
+        st.markdown(network_plots.node_details(selected_node), unsafe_allow_html=True)
 
-    st.plotly_chart(album_bar)
+    album_path(network_plots)
+    network_bar_charts(network_plots)
 
 
 def plot_selector():
@@ -201,6 +308,7 @@ def plot_selector():
         Graphs.GENRES: partial(network_graph, NetworkTypes.GENRE),
         Graphs.ALBUM_AVERAGES: album_averages,
         Graphs.NETWORK_GRAPH: partial(network_graph, NetworkTypes.PERSONEL),
+        Graphs.ALBUM_NETWORK: partial(network_graph, NetworkTypes.ALBUM),
     }
     plot_funcs[plot_type]()
 
@@ -1,12 +1,10 @@
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields
 from datetime import timedelta
-from pathlib import Path
-import pandas as pd
-from cfg.cfg import Config
+from typing import Any
 import cfg.schema as sch
 
 
-@dataclass
+@dataclass(slots=True)
 class Album:
 
     key: int
@@ -45,21 +43,23 @@ class Album:
     @property
     def hours(self) -> int:
         """returns the number of hours that the album lasts for"""
-        return self.total_time.seconds // 3600
+        return self.total_time_s // 3600
 
     @property
     def minutes(self) -> int:
         """returns the number of minutes past the hour that the album lasts for
         will always be less than 60"""
-        m = self.total_time.seconds - (3600 * self.hours)
-        return m // 60
+        return (self.total_time_s % 3600) // 60
 
     @property
     def seconds(self) -> int:
         """returns the number of seconds past the minute that the album lasts for
         will always be less than 60"""
-        s = self.total_time.seconds - (3600 * self.hours) - (60 * self.minutes)
-        return s
+        return self.total_time_s % 60
+
+    def field_values(self) -> dict[str, Any]:
+        """returns the value of every field, without copying them"""
+        return {f.name: getattr(self, f.name) for f in fields(Album)}
 
     def personnel(
         self, arrangers: bool = True, writers: bool = True, producers: bool = True
@@ -109,12 +109,3 @@ class Album:
             sch.PersonalData.comments: self.comments,
             sch.PersonalData.listen_again: self.listen_again,
         }
-
-
-def load_albums(cfg: Config) -> list[Album]:
-    albums = pd.read_json(Path(cfg.data.album_data_json_path), orient="records")
-    personal = pd.read_json(Path(cfg.data.personal_data_json_path), orient="records")
-    albums[sch.Album.total_time_s] = albums[sch.Album.total_time_s].fillna(0)
-
-    data = albums.merge(personal, on=sch.Album.key)
-    return [Album(**row) for row in data.to_dict("records")]  # type: ignore (arguemnts are of type string, not Hashable)
@@ -1,41 +1,84 @@
-from collections import defaultdict
+from dataclasses import dataclass
 from datetime import timedelta
+import numpy as np
 import pandas as pd
 from src.album import Album
+from src.album_store import AlbumStore
+from src.storage import StorageBackend
 import streamlit as st
 
 
-def next_album(albums: list[Album]) -> Album:
+def next_album(albums: AlbumStore) -> Album | None:
     """find the next album that needs to be listened to"""
-    key = min([album.album_number for album in albums if album.listened == False])
-    return [album for album in albums if album.album_number == key][0]
+    key = albums.unlistened.peek()
+    if key is None:
+        return None
+    return albums[key]
+
+
+def next_n_albums(albums: AlbumStore, n: int) -> list[Album]:
+    """returns the next n albums that need to be listened to, in order"""
+    return [albums[key] for key in albums.unlistened.smallest(n)]
+
+
+@dataclass
+class OverviewSummary:
+    """All of the figures shown on the overview page, calculated in a single pass.
+    the next album comes from the store's unlistened index"""
+
+    version: int
+    total_albums: int
+    previously_listened: int
+    newly_listened: int
+    listened: int
+    previous_listened_time: timedelta
+    new_listened_time: timedelta
+    total_listened_time: timedelta
+    next_album: Album | None
+
+    @classmethod
+    def from_albums(cls, albums: AlbumStore) -> "OverviewSummary":
+        # each album is given a status code of 2 * listened + previous_listened,
+        # so one count and one weighted count give every figure
+        status = 2 * albums.listened.astype(np.int64) + albums.previous_listened
+        counts = np.bincount(status, minlength=4)
+        seconds = np.bincount(status, weights=albums.total_time_s, minlength=4)
+        return cls(
+            version=albums.version,
+            total_albums=len(albums),
+            previously_listened=int(counts[1] + counts[3]),
+            newly_listened=int(counts[2]),
+            listened=int(counts[2] + counts[3]),
+            previous_listened_time=timedelta(seconds=int(seconds[1] + seconds[3])),
+            new_listened_time=timedelta(seconds=int(seconds[2])),
+            total_listened_time=timedelta(seconds=int(seconds[2] + seconds[3])),
+            next_album=next_album(albums),
+        )
 
 
-def num_albums_listened_to(albums: list[Album]) -> int:
-    return len([album for album in albums if album.listened == True])
+def num_albums_listened_to(albums: AlbumStore) -> int:
+    return int(albums.listened.sum())
 
 
 def albums_listened_to() -> list[Album]:
-    return [album for album in st.session_state.albums if album.listened == True]
+    albums: AlbumStore = st.session_state.albums
+    return [albums[int(i)] for i in np.flatnonzero(albums.listened)]
 
 
-def albums_previously_listened_to(albums: list[Album]) -> int:
-    return len([album for album in albums if album.previous_listened == True])
+def albums_previously_listened_to(albums: AlbumStore) -> int:
+    return int(albums.previous_listened.sum())
 
 
 def annual_averages() -> pd.DataFrame:
-    data = []
-    albums: list[Album] = st.session_state.albums
-    for album in albums:
-        data.append(
-            {
-                "Year": album.release_date,
-                "length": album.total_time,
-                "tracks": album.tracks,
-                "count": 1,
-            }
-        )
-    df = pd.DataFrame(data)
+    albums: AlbumStore = st.session_state.albums
+    df = pd.DataFrame(
+        {
+            "Year": albums.release_date,
+            "length": pd.to_timedelta(albums.total_time_s, unit="s"),
+            "tracks": albums.tracks,
+            "count": 1,
+        }
+    )
     df = df.groupby("Year").sum().reset_index()
     df["Average Length"] = df["length"] / df["count"]
     df["Average Tracks"] = df["tracks"] / df["count"]
@@ -43,83 +86,52 @@ def annual_averages() -> pd.DataFrame:
     return df
 
 
-def previous_listened_time(albums: list[Album]) -> timedelta:
-    total_time = timedelta()
-    for album in albums:
-        total_time += (
-            album.total_time if album.previous_listened == True else timedelta(0)
-        )
-    return total_time
+def listened_time(albums: AlbumStore, mask: np.ndarray) -> timedelta:
+    """returns the total length of the albums selected by the boolean mask"""
+    return timedelta(seconds=int(albums.total_time_s[mask].sum()))
 
 
-def albums_newly_listened_to(albums: list[Album]) -> int:
-    return len(
-        [
-            album
-            for album in albums
-            if (album.previous_listened == False) & (album.listened == True)
-        ]
-    )
+def newly_listened_mask(albums: AlbumStore) -> np.ndarray:
+    """returns a boolean mask of the albums that have been listened to, but not previously"""
+    return albums.listened & ~albums.previous_listened
+
+
+def previous_listened_time(albums: AlbumStore) -> timedelta:
+    return listened_time(albums, albums.previous_listened)
+
+
+def albums_newly_listened_to(albums: AlbumStore) -> int:
+    return int(newly_listened_mask(albums).sum())
 
 
 def genres_by_year() -> pd.DataFrame:
-    albums: list[Album] = st.session_state.albums
-    data = []
-    for album in albums:
-        for genre in album.genres:
-            data.append({"Year": album.release_date, "Genre": genre, "Count": 1})
-    df = pd.DataFrame(data)
-    df = df.groupby(["Year", "Genre"]).sum().reset_index()
+    storage: StorageBackend = st.session_state.storage
+    df = storage.genre_counts_by_year(st.session_state.albums)
     year_total = df[["Year", "Count"]].groupby("Year").sum().reset_index()
     df = df.merge(year_total, on="Year", suffixes=("", "_total"))
     df["Percentage"] = df["Count"] / df["Count_total"]
     return df
 
 
-def new_listened_time(albums: list[Album]) -> timedelta:
-    total_time = timedelta()
-    for album in albums:
-        total_time += (
-            album.total_time
-            if (album.previous_listened == False) & (album.listened == True)
-            else timedelta(0)
-        )
-    return total_time
+def new_listened_time(albums: AlbumStore) -> timedelta:
+    return listened_time(albums, newly_listened_mask(albums))
 
 
-def total_listened_time(albums: list[Album]) -> timedelta:
-    total_time = timedelta()
-    for album in albums:
-        total_time += album.total_time if (album.listened == True) else timedelta(0)
-    return total_time
+def total_listened_time(albums: AlbumStore) -> timedelta:
+    return listened_time(albums, albums.listened)
 
 
-def total_albums_by_year(albums: list[Album]) -> dict[int, int]:
+def total_albums_by_year(albums: AlbumStore) -> dict[int, int]:
     """returns a dictionary of the form {year: number of albums}"""
-    d = defaultdict(int)
-    for album in albums:
-        d[album.release_date] += 1
-    return d
+    years, counts = np.unique(albums.release_date, return_counts=True)
+    return dict(zip(years.tolist(), counts.tolist()))
 
 
 def album_listened_status_by_year() -> pd.DataFrame:
     """returns a dataframe of the form {Year, Status, Albums}. Status is one of "Previously Heard", "Listened", "Unlistened"
     the year is unique"""
-    d = defaultdict(list)
-    for album in st.session_state.albums:
-        d["Year"].append(album.release_date)
-        if album.listened:
-            status = "Listened"
-        elif album.previous_listened:
-            status = "Previously Heard"
-        else:
-            status = "Unlistened"
-        d["Status"].append(status)
-        d["Albums"].append(1)
-
-    listend_df = pd.DataFrame(d)
-    listend_df = listend_df.groupby(["Year", "Status"]).sum().reset_index()
-    return listend_df
+    storage: StorageBackend = st.session_state.storage
+    return storage.listened_status_by_year(st.session_state.albums)
 
 
 def running_albums_listened_by_year() -> pd.DataFrame:
@@ -134,14 +146,14 @@ def running_albums_listened_by_year() -> pd.DataFrame:
 def time_listened_by_year() -> pd.DataFrame:
     """returns a dataframe of the form {Year, Status, Albums}. Status is one of "Previously Heard", "Listened", "Unlistened"
     the year is unique"""
-    d = defaultdict(list)
-    for album in st.session_state.albums:
-        if not album.listened:
-            continue
-        d["Year"].append(album.release_date)
-        d["Time"].append(album.total_time)
-
-    listend_df = pd.DataFrame(d)
+    albums: AlbumStore = st.session_state.albums
+    listened = albums.listened
+    listend_df = pd.DataFrame(
+        {
+            "Year": albums.release_date[listened],
+            "Time": pd.to_timedelta(albums.total_time_s[listened], unit="s"),
+        }
+    )
     listend_df = listend_df.groupby(["Year"]).sum().reset_index()
     return listend_df
 
@@ -158,17 +170,8 @@ def running_time_listened_by_year() -> pd.DataFrame:
 def artists_heard() -> pd.DataFrame:
     """returns a dataframe of the form {Year, Status, Albums}. Status is one of "Previously Heard", "Listened", "Unlistened"
     the year is unique"""
-    d = defaultdict(list)
-    for album in st.session_state.albums:
-        d["Artist"].append(album.artist)
-        if album.listened:
-            status = "Listened"
-        else:
-            status = "Unlistened"
-        d["Status"].append(status)
-        d["Albums"].append(1)
-
-    df = pd.DataFrame(d)
+    storage: StorageBackend = st.session_state.storage
+    df = storage.artist_status_counts(st.session_state.albums)
     df = df.pivot_table(
         index="Artist", columns="Status", values="Albums", aggfunc="sum"
     )
@@ -190,18 +193,16 @@ def artists_heard() -> pd.DataFrame:
     return df
 
 
-def listened_albums_by_year(albums: list[Album]) -> dict[int, int]:
-    d = {year: 0 for year in set([album.release_date for album in albums])}
-    for album in albums:
-        if album.listened:
-            d[album.release_date] += 1
-    return d
+def listened_albums_by_year(albums: AlbumStore) -> dict[int, int]:
+    years, year_index = np.unique(albums.release_date, return_inverse=True)
+    counts = np.bincount(year_index, weights=albums.listened, minlength=len(years))
+    return dict(zip(years.tolist(), counts.astype(np.int64).tolist()))
 
 
-def listened_time_by_year(albums: list[Album]) -> dict[int, float]:
-    d = defaultdict(timedelta)
-    for album in albums:
-        if album.listened:
-            d[album.release_date] += album.total_time
-    d = {year: d[year].total_seconds() for year in d}
-    return d
+def listened_time_by_year(albums: AlbumStore) -> dict[int, float]:
+    listened = albums.listened
+    years, year_index = np.unique(albums.release_date[listened], return_inverse=True)
+    seconds = np.bincount(
+        year_index, weights=albums.total_time_s[listened], minlength=len(years)
+    )
+    return dict(zip(years.tolist(), seconds.tolist()))
@@ -0,0 +1,203 @@
+from contextlib import contextmanager
+import json
+import os
+from pathlib import Path
+import time
+from typing import Any, Callable, Iterable, Iterator
+import numpy as np
+from cfg.cfg import Config
+from src.album import Album
+from src.album_store import AlbumStore
+import cfg.schema as sch
+
+# how long to wait before trying to take the journal lock again
+LOCK_RETRY_S = 0.01
+# how old a lock must be before it is taken to be left from a stopped session
+LOCK_STALE_S = 30
+
+
+def write_json(path: Path, data: list[dict[str, Any]]) -> None:
+    """writes the data to a temporary file, then swaps it in, so that a failed write never
+    leaves a half written file behind"""
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(data, fp=f, sort_keys=True, indent=4)
+    os.replace(tmp_path, path)
+
+
+def write_snapshot(cfg: Config, albums: Iterable[Album]) -> None:
+    """writes every album to the album and personal data json files"""
+    album_details = []
+    personal_details = []
+    for album in albums:
+        album_details.append(album.album_details())
+        personal_details.append(album.personal_details())
+    write_json(Path(cfg.data.album_data_json_path), album_details)
+    write_json(Path(cfg.data.personal_data_json_path), personal_details)
+
+
+class StaleEditError(Exception):
+    """Raised when an album edited against older album keys cannot be found among the
+    current albums"""
+
+
+class AlbumJournal:
+    """An append only log of album edits, stored as json lines next to the personal data.
+    Each line holds the full details of one edited album. Once the journal holds
+    cfg.data.journal_compaction_threshold entries, it is folded back into the json files.
+    The journal is shared by every session, so it is only changed while holding a lock
+    file, and the entries are always counted from the file.
+    Records are keyed by album position, so the generation file counts the times the
+    positions have changed. Each record holds the generation it was written at, and an
+    edit made against an older generation is moved to the album's current key first"""
+
+    def __init__(self, cfg: Config) -> None:
+        self.cfg = cfg
+        self.path = Path(cfg.data.personal_data_json_path).with_suffix(".journal.jsonl")
+        self.lock_path = self.path.with_name(f"{self.path.name}.lock")
+        self.generation_path = self.path.with_name(f"{self.path.name}.generation")
+
+    @contextmanager
+    def lock(self) -> Iterator[None]:
+        """holds the lock file while the journal is changed. A lock older than
+        LOCK_STALE_S is left from a session that stopped while holding it, and is
+        removed"""
+        while True:
+            try:
+                os.close(os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - self.lock_path.stat().st_mtime > LOCK_STALE_S:
+                        self.lock_path.unlink(missing_ok=True)
+                except FileNotFoundError:
+                    pass
+                time.sleep(LOCK_RETRY_S)
+        try:
+            yield
+        finally:
+            self.lock_path.unlink(missing_ok=True)
+
+    @property
+    def generation(self) -> int:
+        """the number of times the album keys have changed"""
+        try:
+            return int(self.generation_path.read_text())
+        except (OSError, ValueError):
+            return 0
+
+    def _next_generation(self) -> int:
+        """moves to the next generation, which must be done while holding the lock"""
+        generation = self.generation + 1
+        tmp_path = self.generation_path.with_name(f"{self.generation_path.name}.tmp")
+        tmp_path.write_text(str(generation))
+        os.replace(tmp_path, self.generation_path)
+        return generation
+
+    @property
+    def entries(self) -> int:
+        """the number of edits in the journal"""
+        return sum(1 for _ in self.records())
+
+    def records(self) -> Iterator[dict[str, Any]]:
+        """returns the edits in the order they were made"""
+        if not self.path.exists():
+            return
+        with open(self.path, "r") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # a partly written final line from an interrupted save
+                    continue
+
+    def replay(self, albums: AlbumStore) -> None:
+        """applies the edits to the albums, in the order they were made. Records left
+        from an older generation are skipped, as their keys may belong to other albums
+        """
+        generation = self.generation
+        for record in self.records():
+            if record.get("generation", 0) == generation:
+                albums.update_row(record[sch.Album.key], record)
+
+    def current_key(self, album: Album, albums: AlbumStore) -> int:
+        """returns the key of the album among the current albums, found by its title
+        and artist"""
+        rows = np.flatnonzero(
+            (albums.album_title == album.album_title) & (albums.artist == album.artist)
+        )
+        if len(rows) != 1:
+            raise StaleEditError(
+                f"{album.album_title} by {album.artist} was edited against older album"
+                " keys, and could not be found among the current albums"
+            )
+        return int(albums.key[rows[0]])
+
+    def record(
+        self,
+        album: Album,
+        generation: int,
+        load_catalogue: Callable[[Config], AlbumStore],
+    ) -> None:
+        """appends the details of the edited album. If the album was loaded at an older
+        generation, it is found in the catalogue loaded with load_catalogue, and the
+        record is written with its current key"""
+        with self.lock():
+            current = self.generation
+            details = {**album.album_details(), **album.personal_details()}
+            if generation != current:
+                details[sch.Album.key] = self.current_key(
+                    album, load_catalogue(self.cfg)
+                )
+            with open(self.path, "a") as f:
+                f.write(json.dumps({**details, "generation": current}) + "\n")
+
+    def fold(self, load_catalogue: Callable[[Config], AlbumStore]) -> None:
+        """folds the journal into the json files. The albums the json files were last
+        written with are loaded with load_catalogue, and the journal is read and replayed
+        over them under the lock, so the edits of every session are kept"""
+        with self.lock():
+            albums = load_catalogue(self.cfg)
+            self.replay(albums)
+            write_snapshot(self.cfg, albums)
+            self.path.unlink(missing_ok=True)
+
+    def clear(self) -> None:
+        """removes the journal, when the json files have been written without it, so its
+        edits are not applied over them. The keys may have changed, so a new generation
+        is started"""
+        with self.lock():
+            self.path.unlink(missing_ok=True)
+            self._next_generation()
+
+    def compact(self, albums: Iterable[Album]) -> None:
+        """writes all of the albums to the json files, when their keys have changed, and
+        clears the journal"""
+        with self.lock():
+            write_snapshot(self.cfg, albums)
+            self.path.unlink(missing_ok=True)
+            self._next_generation()
+
+    def move(
+        self,
+        album: Album,
+        new_key: int,
+        generation: int,
+        load_catalogue: Callable[[Config], AlbumStore],
+    ) -> int:
+        """moves the album to new_key in the json files. Under the lock, the catalogue
+        is loaded with load_catalogue and the journal replayed over it, so the edits of
+        every session are kept, then the album is moved and the albums written. Returns
+        the new generation"""
+        with self.lock():
+            albums = load_catalogue(self.cfg)
+            self.replay(albums)
+            key = (
+                album.key
+                if generation == self.generation
+                else self.current_key(album, albums)
+            )
+            albums.move(key, new_key)
+            write_snapshot(self.cfg, albums)
+            self.path.unlink(missing_ok=True)
+            return self._next_generation()
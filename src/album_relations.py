@@ -0,0 +1,132 @@
+from enum import StrEnum
+import numpy as np
+from src.album_store import AlbumStore, ListColumn
+from src.symbol_table import SymbolTable
+import cfg.schema as sch
+
+
+class Relation(StrEnum):
+    MUSICIAN = "musician"
+    PRODUCER = "producer"
+    ARRANGER = "arranger"
+    WRITER = "writer"
+    GENRE = "genre"
+
+
+# the personnel relations, in the order Album.personnel_role picks a person's role
+PERSONNEL_RELATIONS: list[Relation] = [
+    Relation.MUSICIAN,
+    Relation.PRODUCER,
+    Relation.ARRANGER,
+    Relation.WRITER,
+]
+RELATION_COLUMNS: dict[Relation, str] = {
+    Relation.MUSICIAN: sch.Album.musicians,
+    Relation.PRODUCER: sch.Album.producers,
+    Relation.ARRANGER: sch.Album.arrangers,
+    Relation.WRITER: sch.Album.writers,
+    Relation.GENRE: sch.Album.genres,
+}
+
+
+class AlbumRelations:
+    """Every link between an album and a person or genre, typed by the relation, built
+    once for a version of the albums and shared by the network graphs, which each view
+    the relations they need.
+    Links are stored as arrays of the album's row in the store, the node id and the
+    relation's position in Relation. A person is linked to an album once, with the
+    role Album.personnel_role gives them. People and genres are separate nodes, even
+    when they have the same name. Nodes are numbered in the order they are first
+    found, going through the albums in order, with each album's people by name and then
+    its genres in order"""
+
+    relation_names: list[Relation] = list(Relation)
+
+    def __init__(self, albums: AlbumStore) -> None:
+        self.version = albums.version
+        self.num_albums = len(albums)
+        symbols: SymbolTable = albums.columns[sch.Album.musicians].symbols
+        people = self._links(albums, PERSONNEL_RELATIONS, symbols)
+        rows, codes, relations = self._links(albums, [Relation.GENRE], symbols)
+        # the table can be added to by other stores, so only the names given out by now
+        # are used
+        names = symbols.array[: len(symbols)]
+        people = self._first_links(people, names)
+        # people and genres are kept apart by giving genres codes after every name
+        genres = rows, codes + len(names), relations
+
+        # number the nodes in the order they are first found
+        rows, codes, relations = (np.concatenate(a) for a in zip(people, genres))
+        order = np.argsort(rows, kind="stable")
+        rows, codes, relations = rows[order], codes[order], relations[order]
+        node_codes, first = np.unique(codes, return_index=True)
+        node_codes = node_codes[np.argsort(first)]
+        node_ids = np.empty(2 * len(names), dtype=np.int64)
+        node_ids[node_codes] = np.arange(len(node_codes))
+
+        self.node_names: list[str] = names[node_codes % len(names)].tolist()
+        self.genre_nodes: np.ndarray = node_codes >= len(names)
+        self.albums: np.ndarray = rows
+        self.nodes: np.ndarray = node_ids[codes]
+        self.relations: np.ndarray = relations
+
+    def _links(
+        self, albums: AlbumStore, relations: list[Relation], symbols: SymbolTable
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """returns the rows, codes in symbols and relations of the links in the columns
+        of the relations"""
+        rows, codes, relation_ids = [], [], []
+        for relation in relations:
+            column: ListColumn = albums.columns[RELATION_COLUMNS[relation]]
+            rows.append(column.rows)
+            codes.append(
+                column.codes
+                if column.symbols is symbols
+                else symbols.encode(column.values)
+            )
+            relation_ids.append(
+                np.full(len(column.codes), self.relation_names.index(relation))
+            )
+        return (
+            np.concatenate(rows),
+            np.concatenate(codes).astype(np.int64),
+            np.concatenate(relation_ids).astype(np.int8),
+        )
+
+    def _first_links(
+        self, links: tuple[np.ndarray, np.ndarray, np.ndarray], names: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """keeps the first link of each person to each album, which has the role
+        personnel_role gives them, and orders each album's people by name"""
+        rows, codes, relations = links
+        name_rank = np.empty(len(names), dtype=np.int64)
+        name_rank[np.argsort(names.astype(str), kind="stable")] = np.arange(len(names))
+        order = np.lexsort((relations, name_rank[codes], rows))
+        rows, codes, relations = rows[order], codes[order], relations[order]
+        first = np.ones(len(rows), dtype=bool)
+        first[1:] = (rows[1:] != rows[:-1]) | (codes[1:] != codes[:-1])
+        return rows[first], codes[first], relations[first]
+
+    def view(self, relations: list[str]) -> np.ndarray:
+        """returns a mask of the links with one of the relations"""
+        relation_ids = [self.relation_names.index(Relation(r)) for r in relations]
+        return np.isin(self.relations, relation_ids)
+
+    def album_rows(self, relations: list[str]) -> np.ndarray:
+        """returns the rows of the albums with at least one of the relations"""
+        return np.unique(self.albums[self.view(relations)])
+
+    def node_albums(self, relations: list[str]) -> list[tuple[int, list[int]]]:
+        """returns each node with one of the relations, in node order, with the rows of
+        the albums it is linked to by them"""
+        mask = self.view(relations)
+        nodes, rows = self.nodes[mask], self.albums[mask]
+        order = np.argsort(nodes, kind="stable")
+        nodes, rows = nodes[order], rows[order]
+        starts = np.flatnonzero(np.r_[True, nodes[1:] != nodes[:-1]])[: len(nodes)]
+        return [
+            (node, node_rows.tolist())
+            for node, node_rows in zip(
+                nodes[starts].tolist(), np.split(rows, starts[1:])
+            )
+        ]
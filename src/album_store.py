@@ -0,0 +1,393 @@
+from dataclasses import MISSING, fields
+from itertools import count
+from typing import Any, Iterator
+import numpy as np
+import pandas as pd
+from src.album import Album
+from src.symbol_table import SymbolTable
+from src.unlistened_index import UnlistenedIndex
+import cfg.schema as sch
+
+SCALAR_COLUMNS: dict[str, type] = {
+    sch.Album.key: np.int64,
+    sch.Album.release_date: np.int64,
+    sch.Album.total_time_s: np.int64,
+    sch.Album.tracks: np.int64,
+    sch.PersonalData.listened: np.bool_,
+    sch.PersonalData.previous_listened: np.bool_,
+}
+TEXT_COLUMNS: list[str] = [
+    sch.Album.album_title,
+    sch.Album.artist,
+    sch.PersonalData.comments,
+    sch.PersonalData.listen_again,
+]
+LIST_COLUMNS: list[str] = [
+    sch.Album.genres,
+    sch.Album.musicians,
+    sch.Album.producers,
+    sch.Album.writers,
+    sch.Album.arrangers,
+]
+
+# versions are unique across every store in the process, so that a cached result can
+# never be mistaken for one from a different store
+_versions = count()
+
+
+class ListColumn:
+    """A list valued column stored in offset encoded form, with the values interned in a
+    symbol table. the ids of the values for row i are codes[offsets[i]:offsets[i + 1]]
+    """
+
+    def __init__(
+        self, codes: np.ndarray, offsets: np.ndarray, symbols: SymbolTable
+    ) -> None:
+        self.codes = codes
+        self.offsets = offsets
+        self.symbols = symbols
+
+    @classmethod
+    def from_lists(cls, lists: list[list[str]], symbols: SymbolTable) -> "ListColumn":
+        lengths = np.fromiter((len(l) for l in lists), dtype=np.int64, count=len(lists))
+        offsets = np.zeros(len(lists) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        codes = symbols.encode(value for l in lists for value in l)
+        return cls(codes, offsets, symbols)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> list[str]:
+        return self.symbols.decode(
+            self.codes[self.offsets[i] : self.offsets[i + 1]]
+        ).tolist()
+
+    def __setitem__(self, i: int, value: list[str]) -> None:
+        start, end = self.offsets[i], self.offsets[i + 1]
+        self.codes = np.concatenate(
+            [self.codes[:start], self.symbols.encode(value), self.codes[end:]]
+        )
+        self.offsets[i + 1 :] += len(value) - (end - start)
+
+    @property
+    def values(self) -> np.ndarray:
+        """every value in the column, as an object array"""
+        return self.symbols.decode(self.codes)
+
+    @property
+    def lengths(self) -> np.ndarray:
+        """the number of values in each row"""
+        return np.diff(self.offsets)
+
+    @property
+    def rows(self) -> np.ndarray:
+        """the row index of each entry in values"""
+        return np.repeat(np.arange(len(self)), self.lengths)
+
+    def take(self, order: np.ndarray) -> "ListColumn":
+        """returns a new column with the rows reordered"""
+        lengths = self.lengths[order]
+        offsets = np.zeros(len(order) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        # the position of each new value in the old codes
+        index = np.repeat(self.offsets[:-1][order] - offsets[:-1], lengths)
+        index += np.arange(offsets[-1])
+        return ListColumn(self.codes[index], offsets, self.symbols)
+
+    def extend(self, other: "ListColumn") -> "ListColumn":
+        """returns a new column with the rows of other added to the end"""
+        codes = (
+            other.codes
+            if other.symbols is self.symbols
+            else self.symbols.encode(other.values)
+        )
+        return ListColumn(
+            np.concatenate([self.codes, codes]),
+            np.concatenate([self.offsets, self.offsets[-1] + other.offsets[1:]]),
+            self.symbols,
+        )
+
+    def copy(self) -> "ListColumn":
+        # setting a row replaces codes, but edits offsets in place
+        return ListColumn(self.codes, self.offsets.copy(), self.symbols)
+
+
+class _Field:
+    """Descriptor that reads and writes a single cell of an AlbumStore column"""
+
+    def __set_name__(self, owner: type, name: str) -> None:
+        self.name = name
+
+    def __get__(self, view: "AlbumView | None", owner: type) -> Any:
+        if view is None:
+            return self
+        value = view._store.columns[self.name][view._index]
+        if isinstance(value, np.generic):
+            return value.item()
+        return value
+
+    def __set__(self, view: "AlbumView", value: Any) -> None:
+        view._store.set_value(self.name, view._index, value)
+
+
+class AlbumView(Album):
+    """A row of an AlbumStore that behaves like an Album.
+    reads and writes go straight through to the store's columns"""
+
+    __slots__ = ("_store", "_index")
+
+    key = _Field()
+    album_title = _Field()
+    artist = _Field()
+    previous_listened = _Field()
+    listened = _Field()
+    release_date = _Field()
+    total_time_s = _Field()
+    comments = _Field()
+    listen_again = _Field()
+    tracks = _Field()
+    genres = _Field()
+    musicians = _Field()
+    producers = _Field()
+    writers = _Field()
+    arrangers = _Field()
+
+    def __init__(self, store: "AlbumStore", index: int) -> None:
+        self._store = store
+        self._index = index
+
+    def to_album(self) -> Album:
+        """returns a detached copy of the row as a plain Album"""
+        return Album(**self.field_values())
+
+
+class AlbumStore:
+    """Stores the album catalogue as columns, rather than a list of Album objects.
+    Rows can be accessed as AlbumView objects, which behave like Albums.
+    version changes on every edit, so that derived data can be cached against it.
+    A frozen store can be shared between sessions, with each session editing its own
+    overlay, which copies a column the first time it is written to.
+    generation is the number of times the saved album keys had been changed when the
+    store was loaded, so that edits made against older keys can be found"""
+
+    def __init__(self, columns: dict[str, Any]) -> None:
+        self.columns = columns
+        self.version = next(_versions)
+        self.generation = 0
+        # the store that this store is an overlay of
+        self.base: AlbumStore | None = None
+        self._unlistened: UnlistenedIndex | None = None
+        self._shared_columns: set[str] = set()
+
+    @classmethod
+    def from_frame(cls, data: pd.DataFrame) -> "AlbumStore":
+        """creates the store from a dataframe with one row per album"""
+        data = data.sort_values(sch.Album.key).reset_index(drop=True)
+        defaults = {
+            f.name: None if f.default is MISSING else f.default for f in fields(Album)
+        }
+        columns: dict[str, Any] = {}
+        for name, dtype in SCALAR_COLUMNS.items():
+            if name not in data.columns:
+                columns[name] = np.full(len(data), defaults[name] or 0, dtype=dtype)
+                continue
+            columns[name] = np.array(
+                data[name].fillna(defaults[name] or 0), dtype=dtype
+            )
+        for name in TEXT_COLUMNS:
+            column = np.empty(len(data), dtype=object)
+            if name not in data.columns:
+                column[:] = defaults[name]
+            else:
+                # read_json turns titles such as "1999" into numbers, and blanks into nan
+                column[:] = [
+                    str(value) if pd.notna(value) else defaults[name]
+                    for value in data[name].tolist()
+                ]
+            columns[name] = column
+        # genres and personnel share one table, so each name is only held once
+        symbols = SymbolTable()
+        for name in LIST_COLUMNS:
+            if name not in data.columns:
+                columns[name] = ListColumn.from_lists(
+                    [[] for _ in range(len(data))], symbols
+                )
+                continue
+            columns[name] = ListColumn.from_lists(
+                [l if isinstance(l, list) else [] for l in data[name]], symbols
+            )
+        return cls(columns)
+
+    @classmethod
+    def from_albums(cls, albums: list[Album]) -> "AlbumStore":
+        return cls.from_frame(pd.DataFrame([album.field_values() for album in albums]))
+
+    def __len__(self) -> int:
+        return len(self.columns[sch.Album.key])
+
+    def __getitem__(self, i: int) -> AlbumView:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(f"album index {i} out of range")
+        return AlbumView(self, i)
+
+    def __iter__(self) -> Iterator[AlbumView]:
+        for i in range(len(self)):
+            yield AlbumView(self, i)
+
+    @property
+    def key(self) -> np.ndarray:
+        return self.columns[sch.Album.key]
+
+    @property
+    def release_date(self) -> np.ndarray:
+        return self.columns[sch.Album.release_date]
+
+    @property
+    def total_time_s(self) -> np.ndarray:
+        return self.columns[sch.Album.total_time_s]
+
+    @property
+    def tracks(self) -> np.ndarray:
+        return self.columns[sch.Album.tracks]
+
+    @property
+    def listened(self) -> np.ndarray:
+        return self.columns[sch.PersonalData.listened]
+
+    @property
+    def previous_listened(self) -> np.ndarray:
+        return self.columns[sch.PersonalData.previous_listened]
+
+    @property
+    def artist(self) -> np.ndarray:
+        return self.columns[sch.Album.artist]
+
+    @property
+    def album_title(self) -> np.ndarray:
+        return self.columns[sch.Album.album_title]
+
+    @property
+    def genres(self) -> ListColumn:
+        return self.columns[sch.Album.genres]
+
+    @property
+    def unlistened(self) -> UnlistenedIndex:
+        """an index of the keys of the albums that have not been listened to"""
+        if self._unlistened is None:
+            self._unlistened = UnlistenedIndex(self.key[~self.listened].tolist())
+        return self._unlistened
+
+    def freeze(self) -> None:
+        """makes every column read only, so the store can be shared safely"""
+        for column in self.columns.values():
+            arrays = (
+                [column.codes, column.offsets]
+                if isinstance(column, ListColumn)
+                else [column]
+            )
+            for array in arrays:
+                array.flags.writeable = False
+
+    def overlay(self) -> "AlbumStore":
+        """returns a store that shares this store's columns until it is edited"""
+        store = AlbumStore(dict(self.columns))
+        store.version = self.version
+        store.generation = self.generation
+        store._shared_columns = set(self.columns)
+        store.base = self
+        return store
+
+    @property
+    def edited(self) -> bool:
+        """true if this is not an overlay, or it has been edited since it was made"""
+        return self.base is None or self.version != self.base.version
+
+    def _own_column(self, name: str) -> None:
+        """copies a shared column, so that it can be edited"""
+        if name not in self._shared_columns:
+            return
+        self.columns[name] = self.columns[name].copy()
+        self._shared_columns.discard(name)
+
+    def set_value(self, name: str, index: int, value: Any) -> None:
+        """sets a single cell, keeping the unlistened index up to date"""
+        self._own_column(name)
+        self.columns[name][index] = value
+        if name == sch.PersonalData.listened and self._unlistened is not None:
+            self._unlistened.update(int(self.key[index]), bool(value))
+        self.version = next(_versions)
+
+    def update_row(self, key: int, values: dict[str, Any]) -> None:
+        """sets every field in values for the album with the given key"""
+        view = self[key]
+        for name, value in values.items():
+            if name in self.columns and name != sch.Album.key:
+                setattr(view, name, value)
+
+    def move(self, key: int, new_key: int) -> None:
+        """moves the album at key to new_key, shifting the albums in between.
+        the key column is renumbered so that it always matches the row position"""
+        new_key = min(max(new_key, 0), len(self) - 1)
+        order = list(range(len(self)))
+        order.insert(new_key, order.pop(key))
+        order_array = np.array(order, dtype=np.int64)
+        for name, column in self.columns.items():
+            if isinstance(column, ListColumn):
+                self.columns[name] = column.take(order_array)
+            else:
+                self.columns[name] = column[order_array]
+        self.columns[sch.Album.key] = np.arange(len(self), dtype=np.int64)
+        self._unlistened = None
+        self._shared_columns.clear()
+        self.version = next(_versions)
+
+    def extend(self, other: "AlbumStore") -> None:
+        """adds the albums in other to the end of the store"""
+        for name, column in self.columns.items():
+            if isinstance(column, ListColumn):
+                self.columns[name] = column.extend(other.columns[name])
+            else:
+                self.columns[name] = np.concatenate([column, other.columns[name]])
+        self._unlistened = None
+        self._shared_columns.clear()
+        self.version = next(_versions)
+
+    def take(self, rows: np.ndarray) -> "AlbumStore":
+        """returns a new store holding copies of the given rows"""
+        return AlbumStore(
+            {
+                name: (
+                    column.take(rows)
+                    if isinstance(column, ListColumn)
+                    else column[rows]
+                )
+                for name, column in self.columns.items()
+            }
+        )
+
+    def copy(self) -> "AlbumStore":
+        """returns an independent copy of the store, with the same version"""
+        store = self.take(np.arange(len(self)))
+        store.version = self.version
+        store.generation = self.generation
+        return store
+
+    def truncate(self, length: int) -> None:
+        """removes every album after the first length"""
+        self.columns = self.take(np.arange(min(length, len(self)))).columns
+        self._unlistened = None
+        self._shared_columns.clear()
+        self.version = next(_versions)
+
+    def to_frame(self) -> pd.DataFrame:
+        """returns the scalar columns as a dataframe"""
+        return pd.DataFrame(
+            {
+                name: column
+                for name, column in self.columns.items()
+                if not isinstance(column, ListColumn)
+            }
+        )
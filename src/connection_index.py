@@ -0,0 +1,133 @@
+import numpy as np
+from scipy import sparse
+
+
+class ConnectionIndex:
+    """An index of which albums are connected through a shared linking node.
+    Albums and linking groups are given integer ids, and the album by group incidence
+    matrix A is multiplied by its transpose to give every album pair in one step.
+    weights counts the linking nodes that each pair of albums share, where a group of
+    nodes with the same albums counts once for each node in it"""
+
+    def __init__(
+        self,
+        album_titles: list[str],
+        group_albums: list[list[str]],
+        group_sizes: list[int],
+    ) -> None:
+        self.album_titles = album_titles
+        self.album_ids: dict[str, int] = {}
+        for i, title in enumerate(album_titles):
+            self.album_ids.setdefault(title, i)
+
+        rows = np.fromiter(
+            (self.album_ids[title] for albums in group_albums for title in albums),
+            dtype=np.int64,
+        )
+        lengths = np.fromiter((len(albums) for albums in group_albums), dtype=np.int64)
+        columns = np.repeat(np.arange(len(group_albums)), lengths)
+        self.incidence = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.int64), (rows, columns)),
+            shape=(len(album_titles), len(group_albums)),
+        )
+        # an album appears once in a group, so the diagonal only holds self links
+        sizes = sparse.diags(np.asarray(group_sizes, dtype=np.int64), dtype=np.int64)
+        weights = (self.incidence @ sizes @ self.incidence.T).tocsr()
+        weights.setdiag(0)
+        weights.eliminate_zeros()
+        weights.sort_indices()
+        self.weights: sparse.csr_matrix = weights
+
+    @property
+    def counts(self) -> np.ndarray:
+        """the number of other albums each album is connected to"""
+        return np.diff(self.weights.indptr)
+
+    def neighbours(self, album_id: int) -> np.ndarray:
+        """returns the ids of the albums connected to the album"""
+        start, end = self.weights.indptr[album_id], self.weights.indptr[album_id + 1]
+        return self.weights.indices[start:end]
+
+    def neighbour_weights(self, album_id: int) -> np.ndarray:
+        """returns the number of shared nodes for each of the album's neighbours"""
+        start, end = self.weights.indptr[album_id], self.weights.indptr[album_id + 1]
+        return self.weights.data[start:end]
+
+    def album_groups(self, album_id: int) -> np.ndarray:
+        """returns the ids of the linking groups the album is in"""
+        indptr = self.incidence.indptr
+        return self.incidence.indices[indptr[album_id] : indptr[album_id + 1]]
+
+    def connected_titles(self, album_title: str) -> list[str]:
+        """returns the titles of the albums connected to the album"""
+        album_id = self.album_ids.get(album_title)
+        if album_id is None:
+            return []
+        return [self.album_titles[i] for i in self.neighbours(album_id)]
+
+    def pairs(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """returns the album ids and weight of every connected pair, in both directions"""
+        coo = self.weights.tocoo()
+        return coo.row, coo.col, coo.data
+
+
+class ProjectedConnections:
+    """The albums connected through shared linking nodes, with the connections split by
+    the relation of the node to each album, such as a person's role or "genre".
+    counts is the number of nodes each pair of albums share. relation_counts is the
+    number they share with the same relation to both albums. weights adds the weight
+    of the relation for each shared node, using the geometric mean of the two weights
+    when the node has a different relation to each album"""
+
+    def __init__(
+        self,
+        album_titles: list[str],
+        albums: np.ndarray,
+        nodes: np.ndarray,
+        relations: np.ndarray,
+        relation_weights: dict[str, float],
+    ) -> None:
+        """albums, nodes and relations give the album id, node id and relation of each
+        link between an album and a node"""
+        self.album_titles = album_titles
+        self.album_ids: dict[str, int] = {}
+        for i, title in enumerate(album_titles):
+            self.album_ids.setdefault(title, i)
+        shape = (len(album_titles), int(nodes.max(initial=-1)) + 1)
+
+        def incidence(values: np.ndarray) -> sparse.csr_matrix:
+            return sparse.csr_matrix((values, (albums, nodes)), shape=shape)
+
+        def co_occurrence(matrix: sparse.csr_matrix) -> sparse.csr_matrix:
+            product = (matrix @ matrix.T).tocsr()
+            product.setdiag(0)
+            product.eliminate_zeros()
+            product.sort_indices()
+            return product
+
+        self.counts = co_occurrence(incidence(np.ones(len(albums), dtype=np.int64)))
+        self.relation_counts: dict[str, sparse.csr_matrix] = {
+            relation: co_occurrence(incidence((relations == relation).astype(np.int64)))
+            for relation in dict.fromkeys(relations)
+        }
+        link_weights = np.ones(len(albums))
+        for relation in self.relation_counts:
+            link_weights[relations == relation] = relation_weights.get(relation, 1.0)
+        self.weights = co_occurrence(incidence(np.sqrt(link_weights)))
+
+    def edges(self, min_weight: float) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """returns the album ids and weight of each connected pair whose weight is at
+        least min_weight, once for each pair"""
+        upper = sparse.triu(self.weights, k=1).tocoo()
+        # the weights are sums of products of square roots, so allow for rounding
+        keep = upper.data >= min_weight - 1e-9
+        return upper.row[keep], upper.col[keep], upper.data[keep]
+
+    def pair_counts(
+        self, albums: np.ndarray, connecting_albums: np.ndarray
+    ) -> dict[str, np.ndarray]:
+        """returns the number of nodes each of the pairs share, by relation"""
+        return {
+            relation: np.asarray(counts[albums, connecting_albums]).ravel()
+            for relation, counts in self.relation_counts.items()
+        }
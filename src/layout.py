@@ -0,0 +1,405 @@
+from enum import StrEnum
+from time import perf_counter
+from typing import Any, Hashable
+import networkx as nx
+import numpy as np
+from scipy import sparse
+from scipy.sparse import csgraph
+from scipy.sparse.linalg import eigsh
+from cfg.cfg import NetworkGraphSettings
+
+# the offsets to the cells that are compared with each cell. only half of the
+# neighbouring cells are listed, so that each pair of cells is compared once
+HALF_NEIGHBOURHOOD = [(0, 0), (1, -1), (1, 0), (1, 1), (0, 1)]
+
+
+def node_identity(graph: nx.Graph, node: Hashable) -> str:
+    """returns the name that identifies the node between versions of the graph. This is
+    the node's identity attribute if it has one, as display names can change"""
+    return graph.nodes[node].get("identity", str(node))
+
+
+def rescale(pos: np.ndarray) -> np.ndarray:
+    """centres the positions on the origin, and scales them to fit in [-1, 1]"""
+    pos = pos - pos.mean(axis=0)
+    extent = np.abs(pos).max() if len(pos) else 0
+    if extent > 0:
+        pos /= extent
+    return pos
+
+
+class LayoutType(StrEnum):
+
+    SPRING = "spring"
+    GRID = "grid"
+
+
+class LayoutEngine:
+    """A parent class for the algorithms that position the nodes of the network graph.
+    iteration_times holds the time taken by each iteration of the last layout"""
+
+    def __init__(self, settings: NetworkGraphSettings) -> None:
+        self.settings = settings
+        self.iteration_times: list[float] = []
+        self.converged = False
+
+    def layout(self, graph: nx.Graph) -> dict[Hashable, np.ndarray]:
+        """returns the position of each node in the graph, scaled to [-1, 1]"""
+        raise NotImplementedError("This must be impleneted in the child class")
+
+    def update(
+        self,
+        graph: nx.Graph,
+        previous: dict[str, np.ndarray],
+        changed: set[str],
+    ) -> dict[Hashable, np.ndarray]:
+        """returns the position of each node, starting from the previous positions of a
+        graph that differs from this one at the changed nodes. Engines that cannot
+        start from previous positions lay the whole graph out again"""
+        return self.layout(graph)
+
+    @property
+    def iterations(self) -> int:
+        """the most iterations a full layout runs for"""
+        raise NotImplementedError("This must be impleneted in the child class")
+
+    @property
+    def parameters(self) -> dict[str, Any]:
+        """the settings that change the layout"""
+        return {
+            "engine": self.settings.layout_engine,
+            "iterations": self.iterations,
+        }
+
+
+class SpringLayout(LayoutEngine):
+    """The networkx spring layout. Timings are only available for the whole layout"""
+
+    @property
+    def iterations(self) -> int:
+        return self.settings.layout_spring_iterations
+
+    def layout(self, graph: nx.Graph) -> dict[Hashable, np.ndarray]:
+        start = perf_counter()
+        pos = nx.spring_layout(
+            graph,
+            k=3,
+            iterations=self.iterations,
+            seed=self.settings.layout_seed,
+        )
+        self.iteration_times = [perf_counter() - start]
+        self.converged = True
+        return pos
+
+
+class GridLayout(LayoutEngine):
+    """A Fruchterman-Reingold force directed layout, with the repulsion between nodes
+    only calculated for nodes in the same or neighbouring cells of a grid. Each
+    iteration is vectorised over every pair of nearby nodes, and every edge.
+    The largest connected component can be started from its spectral layout, rather
+    than at random, which needs fewer iterations to settle. The step length adapts to
+    the progress made, and the layout stops early once the average distance moved by a
+    node drops below the tolerance"""
+
+    # the distance between nodes that the forces balance at
+    k = 1.0
+    # nodes further apart than this do not repel each other
+    cutoff = 2.0
+    # the extra distance searched for nearby pairs, so they can be reused while nodes
+    # have moved less than half of it
+    skin = 0.5
+    # the most pairs checked directly when only some of the nodes can move
+    direct_pairs = 200_000
+    # the factor the step length is changed by each iteration
+    step_ratio = 0.9
+
+    @property
+    def iterations(self) -> int:
+        return self.settings.layout_grid_iterations
+
+    @property
+    def parameters(self) -> dict[str, Any]:
+        return {
+            **super().parameters,
+            "tolerance": self.settings.layout_tolerance,
+            "spectral_init": self.settings.layout_spectral_init,
+            "seed": self.settings.layout_seed,
+        }
+
+    @staticmethod
+    def edge_array(graph: nx.Graph) -> np.ndarray:
+        """returns the edges of the graph as pairs of node indexes"""
+        index = {node: i for i, node in enumerate(graph.nodes)}
+        return np.array(
+            [(index[u], index[v]) for u, v in graph.edges if u != v], dtype=np.int64
+        ).reshape(-1, 2)
+
+    def layout(self, graph: nx.Graph) -> dict[Hashable, np.ndarray]:
+        edges = self.edge_array(graph)
+        pos = self.initial_positions(len(graph), edges)
+        pos = self.relax(pos, edges, self.iterations)
+        return dict(zip(graph.nodes, rescale(pos)))
+
+    def update(
+        self,
+        graph: nx.Graph,
+        previous: dict[str, np.ndarray],
+        changed: set[str],
+    ) -> dict[Hashable, np.ndarray]:
+        """keeps every node at its previous position, except for the changed nodes and
+        their neighbours, which are relaxed for a few iterations. New nodes start at
+        the centre of their positioned neighbours. The positions are returned on the
+        same scale as the previous ones, so the unchanged nodes do not move"""
+        nodes = list(graph.nodes)
+        names = [node_identity(graph, node) for node in nodes]
+        known = np.array([name in previous for name in names], dtype=bool)
+        if not known.any():
+            return self.layout(graph)
+        edges = self.edge_array(graph)
+        pos = np.zeros((len(nodes), 2))
+        pos[known] = [previous[name] for name, k in zip(names, known) if k]
+
+        # the previous positions were scaled to fit in [-1, 1], so they are scaled back
+        # to make the edges between them about k long
+        u, v = edges[:, 0], edges[:, 1]
+        both_known = known[u] & known[v]
+        lengths = np.linalg.norm(pos[u[both_known]] - pos[v[both_known]], axis=1)
+        median = np.median(lengths) if len(lengths) else 0
+        scale = self.k / median if median > 0 else self.k * np.sqrt(len(nodes)) / 2
+        pos *= scale
+
+        self.place_new_nodes(pos, known, edges)
+        changed_index = np.array(
+            [name in changed or not k for name, k in zip(names, known)], dtype=bool
+        )
+        movable = changed_index.copy()
+        touching = changed_index[u] | changed_index[v]
+        movable[u[touching]] = True
+        movable[v[touching]] = True
+        if not movable.any():
+            # nothing has changed, so every node keeps its previous position
+            self.iteration_times = []
+            self.converged = True
+            return {node: previous[name] for node, name in zip(nodes, names)}
+        pos = self.relax(
+            pos,
+            edges,
+            self.settings.layout_incremental_iterations,
+            movable=movable,
+            step=self.k,
+        )
+        return dict(zip(nodes, pos / scale))
+
+    def place_new_nodes(
+        self, pos: np.ndarray, known: np.ndarray, edges: np.ndarray
+    ) -> None:
+        """places each node without a position at the centre of its neighbours that
+        have one, working outwards from the positioned nodes. nodes that cannot be
+        reached are placed at random"""
+        rng = np.random.default_rng(self.settings.layout_seed)
+        known = known.copy()
+        n = len(pos)
+        u, v = edges[:, 0], edges[:, 1]
+        while not known.all():
+            # the sum and count of the positioned neighbours of each node
+            weights_u, weights_v = known[v].astype(float), known[u].astype(float)
+            count = np.bincount(u, weights_u, n) + np.bincount(v, weights_v, n)
+            placeable = ~known & (count > 0)
+            if not placeable.any():
+                break
+            for axis in range(2):
+                total = np.bincount(u, pos[v, axis] * weights_u, n) + np.bincount(
+                    v, pos[u, axis] * weights_v, n
+                )
+                pos[placeable, axis] = total[placeable] / count[placeable]
+            # a small offset, so that nodes with the same neighbours do not overlap
+            pos[placeable] += rng.normal(0, 0.1 * self.k, (placeable.sum(), 2))
+            known |= placeable
+        unplaced = ~known
+        if unplaced.any():
+            low, high = pos[known].min(axis=0), pos[known].max(axis=0)
+            pos[unplaced] = rng.uniform(low, high, (unplaced.sum(), 2))
+
+    def initial_positions(self, n: int, edges: np.ndarray) -> np.ndarray:
+        """places the nodes at random in a square big enough to hold them at a spacing
+        of k, with the largest component at its spectral position if enabled"""
+        rng = np.random.default_rng(self.settings.layout_seed)
+        side = self.k * np.sqrt(max(n, 1))
+        pos = rng.random((n, 2)) * side
+        if not self.settings.layout_spectral_init or n < 3:
+            return pos
+        adjacency = sparse.coo_matrix(
+            (np.ones(len(edges)), (edges[:, 0], edges[:, 1])), shape=(n, n)
+        ).tocsr()
+        _, labels = csgraph.connected_components(adjacency, directed=False)
+        largest = np.flatnonzero(labels == np.bincount(labels).argmax())
+        if len(largest) < 3:
+            return pos
+        spectral = self.spectral_positions(adjacency[largest][:, largest])
+        # the largest component is spread over an area in proportion to its size
+        pos[largest] = (
+            side / 2 + rescale(spectral) * side * np.sqrt(len(largest) / n) / 2
+        )
+        return pos
+
+    @staticmethod
+    def spectral_positions(adjacency: sparse.csr_matrix) -> np.ndarray:
+        """returns the second and third eigenvectors of the graph laplacian"""
+        adjacency = ((adjacency + adjacency.T) > 0).astype(np.float64)
+        laplacian = csgraph.laplacian(adjacency, normed=True)
+        n = adjacency.shape[0]
+        if n < 50:
+            _, vectors = np.linalg.eigh(laplacian.toarray())
+            return vectors[:, 1:3]
+        # shift and invert about a small negative value finds the smallest eigenvalues
+        _, vectors = eigsh(laplacian, k=3, sigma=-1e-3, which="LM")
+        return vectors[:, 1:3]
+
+    def near_pairs(
+        self, pos: np.ndarray, radius: float
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """returns the index of every pair of nodes in the same or neighbouring cells of
+        a grid with cells of the given size"""
+        cells = np.floor(pos / radius).astype(np.int64)
+        cells -= cells.min(axis=0) - 1
+        width = cells[:, 1].max() + 2
+        cell_ids = cells[:, 0] * width + cells[:, 1]
+        order = np.argsort(cell_ids, kind="stable")
+        unique_cells, starts, counts = np.unique(
+            cell_ids[order], return_index=True, return_counts=True
+        )
+
+        pairs_i, pairs_j = [], []
+        for dx, dy in HALF_NEIGHBOURHOOD:
+            other = np.searchsorted(unique_cells, unique_cells + dx * width + dy)
+            other = np.minimum(other, len(unique_cells) - 1)
+            found = unique_cells[other] == unique_cells + dx * width + dy
+            a, b = np.flatnonzero(found), other[found]
+            # every member of cell a is paired with every member of cell b
+            sizes = counts[a] * counts[b]
+            pair_cell = np.repeat(np.arange(len(a)), sizes)
+            local = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+            ia, ib = np.divmod(local, counts[b][pair_cell])
+            if (dx, dy) == (0, 0):
+                # within a cell, only take each pair once
+                keep = ia < ib
+                ia, ib, pair_cell = ia[keep], ib[keep], pair_cell[keep]
+            pairs_i.append(order[starts[a][pair_cell] + ia])
+            pairs_j.append(order[starts[b][pair_cell] + ib])
+        i, j = np.concatenate(pairs_i), np.concatenate(pairs_j)
+        delta = pos[i] - pos[j]
+        near = np.flatnonzero(np.einsum("ij,ij->i", delta, delta) < radius**2)
+        return i[near], j[near]
+
+    def forces(
+        self, pos: np.ndarray, edges: np.ndarray, pairs: tuple[np.ndarray, np.ndarray]
+    ) -> np.ndarray:
+        """returns the total force on each node, from the repulsion between the pairs
+        of nodes and the attraction along the edges"""
+        n = len(pos)
+        # the axes are handled separately, as gathering from 1d arrays is much faster
+        x, y = pos[:, 0].copy(), pos[:, 1].copy()
+
+        i, j = pairs
+        dx, dy = x[i] - x[j], y[i] - y[j]
+        squared = dx * dx + dy * dy
+        # repulsion of k^2 / d, pushing the pair apart, for pairs within the cutoff
+        push = np.where(squared < self.cutoff**2, self.k**2, 0) / np.maximum(
+            squared, 1e-4
+        )
+        fx = np.bincount(i, dx * push, n) - np.bincount(j, dx * push, n)
+        fy = np.bincount(i, dy * push, n) - np.bincount(j, dy * push, n)
+
+        u, v = edges[:, 0], edges[:, 1]
+        dx, dy = x[u] - x[v], y[u] - y[v]
+        # attraction of d^2 / k, pulling the pair together
+        pull = np.sqrt(dx * dx + dy * dy) / self.k
+        fx -= np.bincount(u, dx * pull, n) - np.bincount(v, dx * pull, n)
+        fy -= np.bincount(u, dy * pull, n) - np.bincount(v, dy * pull, n)
+        return np.column_stack([fx, fy])
+
+    def relax(
+        self,
+        pos: np.ndarray,
+        edges: np.ndarray,
+        iterations: int,
+        movable: np.ndarray | None = None,
+        step: float | None = None,
+    ) -> np.ndarray:
+        """moves the nodes along the forces on them, by no more than the step length.
+        the step grows while the total force keeps falling, and shrinks when it does not.
+        The pairs of nearby nodes are only found again once a node has moved far enough
+        that it could have come within the cutoff of a node that was not paired.
+        If movable is given, only those nodes are moved, and only the forces on them
+        are calculated"""
+        self.iteration_times = []
+        self.converged = False
+        if movable is None:
+            movable = np.ones(len(pos), dtype=bool)
+        if len(pos) < 2 or not movable.any():
+            self.converged = True
+            return pos
+        pos = pos.copy()
+        edges = edges[movable[edges[:, 0]] | movable[edges[:, 1]]]
+        if step is None:
+            step = 0.1 * self.k * np.sqrt(len(pos))
+        energy = np.inf
+        progress = 0
+        radius = self.cutoff + self.skin
+
+        def movable_pairs() -> tuple[np.ndarray, np.ndarray]:
+            moving = np.flatnonzero(movable)
+            if len(moving) * len(pos) > self.direct_pairs:
+                i, j = self.near_pairs(pos, radius)
+                keep = movable[i] | movable[j]
+                return i[keep], j[keep]
+            # when few nodes can move, it is quicker to check them against every node
+            i = np.repeat(moving, len(pos))
+            j = np.tile(np.arange(len(pos)), len(moving))
+            # pairs of two movable nodes are only taken once
+            keep = (i != j) & ~(movable[j] & (j < i))
+            i, j = i[keep], j[keep]
+            delta = pos[i] - pos[j]
+            near = np.einsum("ij,ij->i", delta, delta) < radius**2
+            return i[near], j[near]
+
+        pairs = movable_pairs()
+        paired_pos = pos[movable]
+        for _ in range(iterations):
+            start = perf_counter()
+            moved_since_paired = np.abs(pos[movable] - paired_pos).max()
+            if moved_since_paired > self.skin / 2:
+                pairs = movable_pairs()
+                paired_pos = pos[movable]
+            force = self.forces(pos, edges, pairs)[movable]
+            length = np.maximum(np.hypot(force[:, 0], force[:, 1]), 1e-9)
+            move = force * (np.minimum(length, step) / length)[:, None]
+            pos[movable] += move
+
+            new_energy = float((length**2).sum())
+            if new_energy < energy:
+                progress += 1
+                if progress >= 5:
+                    progress = 0
+                    step /= self.step_ratio
+            else:
+                progress = 0
+                step *= self.step_ratio
+            energy = new_energy
+            self.iteration_times.append(perf_counter() - start)
+            if (
+                np.hypot(move[:, 0], move[:, 1]).mean()
+                < self.settings.layout_tolerance * self.k
+            ):
+                self.converged = True
+                break
+        return pos
+
+
+def get_layout_engine(settings: NetworkGraphSettings) -> LayoutEngine:
+    """returns the layout engine selected in the settings"""
+    engines: dict[str, type[LayoutEngine]] = {
+        LayoutType.SPRING: SpringLayout,
+        LayoutType.GRID: GridLayout,
+    }
+    return engines[settings.layout_engine](settings)
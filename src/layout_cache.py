@@ -0,0 +1,170 @@
+from dataclasses import dataclass
+import hashlib
+import json
+import os
+from pathlib import Path
+import tempfile
+from typing import Any, Hashable
+import networkx as nx
+import numpy as np
+from cfg.cfg import Config
+from src.layout import node_identity
+
+# the number of layouts kept, so the cache does not grow with every edit
+MAX_LAYOUTS = 10
+
+
+def node_names(graph: nx.Graph) -> list[str]:
+    """returns the identity of each node, in the graph's order"""
+    return [node_identity(graph, node) for node in graph.nodes]
+
+
+def edge_names(graph: nx.Graph) -> list[tuple[str, str]]:
+    """returns the sorted edges of the graph, with each edge's nodes in sorted order"""
+    return sorted(
+        tuple(sorted((node_identity(graph, u), node_identity(graph, v))))
+        for u, v in graph.edges
+    )
+
+
+def last_used(path: Path) -> int:
+    """returns when the layout was last used, or 0 if it has just been removed"""
+    try:
+        return path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+def parameters_hash(parameters: dict[str, Any]) -> str:
+    """returns a hash of the layout parameters"""
+    encoded = json.dumps(parameters, sort_keys=True).encode()
+    return hashlib.sha256(encoded).hexdigest()[:12]
+
+
+def graph_hash(graph: nx.Graph, parameters: dict[str, Any]) -> str:
+    """returns a hash of the nodes and edges of the graph, and the layout parameters.
+    the order the nodes and edges were added in does not change the hash"""
+    digest = hashlib.sha256()
+    digest.update(json.dumps(parameters, sort_keys=True).encode())
+    for node in sorted(node_names(graph)):
+        digest.update(b"\0n" + node.encode())
+    for u, v in edge_names(graph):
+        digest.update(b"\0e" + u.encode() + b"\0" + v.encode())
+    return digest.hexdigest()[:24]
+
+
+@dataclass
+class SavedLayout:
+    """The positions of the nodes of a graph, and its edges, as they were saved"""
+
+    positions: dict[str, np.ndarray]
+    edges: set[tuple[str, str]]
+
+    def changed_nodes(self, graph: nx.Graph) -> set[str]:
+        """returns the nodes of the graph that were not in the saved layout, or whose
+        edges have changed since"""
+        changed = set(node_names(graph)) - self.positions.keys()
+        for u, v in self.edges.symmetric_difference(edge_names(graph)):
+            changed.update((u, v))
+        return changed
+
+
+class LayoutCache:
+    """Stores the node positions of network graph layouts on disk, so a graph that has
+    not changed since it was last laid out does not need to be laid out again.
+    Each layout is stored in its own .npz file, named by the kind of graph, the hash of
+    the layout parameters and the hash of the graph, next to the album data. The most
+    recently used layout of each kind is kept, so that a changed graph laid out with the
+    same parameters can start from it"""
+
+    def __init__(self, cfg: Config) -> None:
+        self.path = Path(cfg.data.album_data_json_path).with_suffix(".layouts")
+
+    def layout_path(
+        self, kind: str, graph: nx.Graph, parameters: dict[str, Any]
+    ) -> Path:
+        """returns the file the layout of the graph is saved in"""
+        name = f"{kind}-{parameters_hash(parameters)}-{graph_hash(graph, parameters)}"
+        return self.path / f"{name}.npz"
+
+    def _read(self, path: Path) -> SavedLayout | None:
+        try:
+            with np.load(path) as data:
+                nodes = data["nodes"].tolist()
+                positions = data["positions"]
+                edges = data["edges"]
+        except (OSError, EOFError, KeyError, ValueError):
+            return None
+        return SavedLayout(
+            dict(zip(nodes, positions)),
+            {(nodes[u], nodes[v]) for u, v in edges.tolist()},
+        )
+
+    def load(
+        self, kind: str, graph: nx.Graph, parameters: dict[str, Any]
+    ) -> dict[Hashable, np.ndarray] | None:
+        """returns the saved positions of the graph's nodes, or None if there are none"""
+        path = self.layout_path(kind, graph, parameters)
+        saved = self._read(path)
+        names = node_names(graph)
+        if saved is None or any(name not in saved.positions for name in names):
+            return None
+        try:
+            # the file is only marked as used, as touch would make it again if it had
+            # been pruned since it was read
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return {node: saved.positions[name] for node, name in zip(graph.nodes, names)}
+
+    def latest(self, kind: str, parameters: dict[str, Any]) -> SavedLayout | None:
+        """returns the most recently used layout of this kind of graph that was laid out
+        with the same parameters"""
+        layouts = sorted(
+            self.path.glob(f"{kind}-{parameters_hash(parameters)}-*.npz"),
+            key=last_used,
+        )
+        if not layouts:
+            return None
+        return self._read(layouts[-1])
+
+    def save(
+        self,
+        kind: str,
+        graph: nx.Graph,
+        parameters: dict[str, Any],
+        pos: dict[Hashable, np.ndarray],
+    ) -> None:
+        """saves the positions, replacing any saved for the same graph"""
+        self.path.mkdir(parents=True, exist_ok=True)
+        nodes = node_names(graph)
+        index = {node: i for i, node in enumerate(nodes)}
+        path = self.layout_path(kind, graph, parameters)
+        # layouts are saved from worker threads, so each save has its own temporary
+        # file. it does not end in .npz, so it is never read as a layout
+        fd, tmp_name = tempfile.mkstemp(dir=self.path, prefix=f".{path.stem}-")
+        tmp_path = Path(tmp_name)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(
+                    f,
+                    nodes=np.array(nodes, dtype=str),
+                    positions=np.array(
+                        [pos[node] for node in graph.nodes], dtype=np.float64
+                    ),
+                    edges=np.array(
+                        [(index[u], index[v]) for u, v in edge_names(graph)],
+                        dtype=np.int64,
+                    ).reshape(-1, 2),
+                )
+            tmp_path.replace(path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        self.prune()
+
+    def prune(self) -> None:
+        """removes the least recently used layouts once there are more than MAX_LAYOUTS"""
+        layouts = sorted(self.path.glob("*.npz"), key=last_used)
+        for old_layout in layouts[:-MAX_LAYOUTS]:
+            old_layout.unlink(missing_ok=True)
@@ -0,0 +1,188 @@
+import numpy as np
+from scipy import sparse
+from scipy.sparse import csgraph
+
+# the number of sources whose shortest paths are found together when estimating the
+# betweenness centrality
+SOURCE_BATCH = 64
+
+
+class NetworkAnalytics:
+    """Centrality, communities and shortest paths of a network graph, calculated on a
+    CSR adjacency matrix of its nodes.
+    The nodes are numbered with the albums first, in the order of the connection index,
+    followed by any linking groups. Each result is calculated when it is first needed,
+    and saved, so a NetworkAnalytics should be made for each version of the graph"""
+
+    def __init__(
+        self,
+        node_names: list[str],
+        num_albums: int,
+        adjacency: sparse.csr_matrix,
+        betweenness_samples: int = 100,
+        seed: int | None = None,
+    ) -> None:
+        self.node_names = node_names
+        self.num_albums = num_albums
+        self.node_ids: dict[str, int] = {}
+        for i, name in enumerate(self.node_names):
+            self.node_ids.setdefault(name, i)
+        self.adjacency: sparse.csr_matrix = adjacency.astype(np.float64)
+        self.betweenness_samples = betweenness_samples
+        self.seed = seed
+        self._degree_centrality: np.ndarray | None = None
+        self._betweenness_centrality: np.ndarray | None = None
+        self._communities: np.ndarray | None = None
+
+    @classmethod
+    def from_incidence(
+        cls,
+        album_titles: list[str],
+        group_names: list[str],
+        incidence: sparse.csr_matrix,
+        betweenness_samples: int = 100,
+        seed: int | None = None,
+    ) -> "NetworkAnalytics":
+        """the analytics of a graph that only links albums to groups, whose adjacency
+        matrix is the album by group incidence matrix and its transpose"""
+        adjacency = sparse.bmat([[None, incidence], [incidence.T, None]], format="csr")
+        return cls(
+            [*album_titles, *group_names],
+            len(album_titles),
+            adjacency,
+            betweenness_samples,
+            seed,
+        )
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.node_names)
+
+    @property
+    def degree_centrality(self) -> np.ndarray:
+        """the fraction of the other nodes that each node is linked to"""
+        if self._degree_centrality is not None:
+            return self._degree_centrality
+        degree = np.diff(self.adjacency.indptr).astype(np.float64)
+        self._degree_centrality = degree / max(self.num_nodes - 1, 1)
+        return self._degree_centrality
+
+    @property
+    def betweenness_centrality(self) -> np.ndarray:
+        """the fraction of shortest paths between other nodes that pass through each
+        node, normalised as networkx does. It is estimated from the shortest paths from
+        a random sample of betweenness_samples nodes, as finding them from every node
+        takes too long on the full personnel graph"""
+        if self._betweenness_centrality is not None:
+            return self._betweenness_centrality
+        n = self.num_nodes
+        rng = np.random.default_rng(self.seed)
+        k = min(self.betweenness_samples, n)
+        sources = np.sort(rng.choice(n, k, replace=False)) if k < n else np.arange(n)
+        betweenness = np.zeros(n)
+        for start in range(0, len(sources), SOURCE_BATCH):
+            betweenness += self._dependencies(sources[start : start + SOURCE_BATCH])
+        if n > 2:
+            betweenness *= n / (k * (n - 1) * (n - 2))
+        self._betweenness_centrality = betweenness
+        return self._betweenness_centrality
+
+    def _dependencies(self, sources: np.ndarray) -> np.ndarray:
+        """returns the dependency of the sources on each node, summed over the sources.
+        this is Brandes' algorithm, with the breadth first search of every source done
+        together, one level at a time, as products with the adjacency matrix"""
+        n, b = self.num_nodes, len(sources)
+        columns = np.arange(b)
+        distance = np.full((n, b), -1, dtype=np.int64)
+        distance[sources, columns] = 0
+        # the number of shortest paths from the source to each node
+        paths = np.zeros((n, b))
+        paths[sources, columns] = 1
+        level = 0
+        while True:
+            reached = self.adjacency @ np.where(distance == level, paths, 0)
+            new = (reached > 0) & (distance < 0)
+            if not new.any():
+                break
+            level += 1
+            distance[new] = level
+            paths[new] = reached[new]
+
+        dependency = np.zeros((n, b))
+        for level in range(level, 0, -1):
+            share = np.where(
+                distance == level, (1 + dependency) / np.maximum(paths, 1), 0
+            )
+            previous = distance == level - 1
+            dependency[previous] += (paths * (self.adjacency @ share))[previous]
+        dependency[sources, columns] = 0
+        return dependency.sum(axis=1)
+
+    @property
+    def communities(self) -> np.ndarray:
+        """the community of each node, found by label propagation, numbered from the
+        largest community. Each node takes the label most common among its neighbours,
+        keeping its own label when it is one of the most common. The albums and groups
+        take turns to update, as all nodes updating at once can swap labels back and
+        forth forever on a graph that only links albums to groups"""
+        if self._communities is not None:
+            return self._communities
+        n = self.num_nodes
+        labels = np.arange(n)
+        sides = [np.arange(self.num_albums), np.arange(self.num_albums, n)]
+        for _ in range(100):
+            changed = False
+            for side in sides:
+                new_labels = self._common_labels(side, labels)
+                changed |= bool((new_labels != labels[side]).any())
+                labels[side] = new_labels
+            if not changed:
+                break
+        _, labels, sizes = np.unique(labels, return_inverse=True, return_counts=True)
+        # renumber, so the largest community is 0
+        order = np.argsort(-sizes, kind="stable")
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        self._communities = rank[labels]
+        return self._communities
+
+    def _common_labels(self, nodes: np.ndarray, labels: np.ndarray) -> np.ndarray:
+        """returns the most common label among the neighbours of each of the nodes"""
+        rows = self.adjacency[nodes].tocoo()
+        counts = sparse.csr_matrix(
+            (rows.data, (rows.row, labels[rows.col])), shape=(len(nodes), len(labels))
+        )
+        best = counts.max(axis=1).toarray().ravel()
+        own = np.asarray(counts[np.arange(len(nodes)), labels[nodes]]).ravel()
+        common = np.asarray(counts.argmax(axis=1)).ravel()
+        # nodes without neighbours, and nodes whose label is as common as any, keep it
+        return np.where((best == 0) | (own == best), labels[nodes], common)
+
+    def community_members(self, community: int) -> list[str]:
+        """returns the names of the nodes in the community"""
+        return [
+            self.node_names[i] for i in np.flatnonzero(self.communities == community)
+        ]
+
+    def album_path(self, from_album: str, to_album: str) -> list[str] | None:
+        """returns the names of the nodes on a shortest path between the two albums,
+        alternating between albums and the groups that link them, or None if the albums
+        are not connected"""
+        start, end = self.node_ids.get(from_album), self.node_ids.get(to_album)
+        if start is None or end is None:
+            return None
+        _, predecessors = csgraph.breadth_first_order(
+            self.adjacency, start, directed=False, return_predecessors=True
+        )
+        if start != end and predecessors[end] < 0:
+            return None
+        path = [end]
+        while path[-1] != start:
+            path.append(int(predecessors[path[-1]]))
+        return [self.node_names[i] for i in reversed(path)]
+
+    def album_steps(self, path: list[str]) -> int:
+        """returns the number of steps between albums on a path from album_path. In a
+        graph of albums and groups every other node is a group, and in a graph of albums
+        alone every node is an album, so only the albums on the path are counted"""
+        return sum(self.node_ids[name] < self.num_albums for name in path) - 1
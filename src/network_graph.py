@@ -1,63 +1,113 @@
-from collections import defaultdict
 from dataclasses import dataclass, field
-from itertools import groupby
+import hashlib
+import html
 from typing import Any
+import numpy as np
 import pandas as pd
 import streamlit as st
 import networkx as nx
 import plotly.graph_objects as go
 from cfg.cfg import Config
 from src.album import Album
+from src.album_relations import PERSONNEL_RELATIONS, AlbumRelations, Relation
+from src.album_store import AlbumStore
+from src.connection_index import ConnectionIndex, ProjectedConnections
+from src.layout import get_layout_engine
+from src.network_analytics import NetworkAnalytics
+from src.network_lod import ClusterView, Viewport, points_in, visible_points
+from src.layout_cache import LayoutCache
 import plotly.express as px
 
 
 @dataclass
 class LinkingNode:
-    """A parent class to store information about nodes that link albums"""
+    """A parent class to store information about nodes that link albums.
+    the sorted albums, key list and album key are saved once calculated, and cleared
+    when an album is added"""
 
     name: str
     _albums: list[Album] = field(default_factory=list)
+    _sorted: bool = field(default=False, init=False, repr=False, compare=False)
+    _key_list: list[dict[str, str]] | None = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    _album_key: str | None = field(default=None, init=False, repr=False, compare=False)
 
     @property
     def albums(self) -> list[Album]:
         """Orders the albums by title. Necessary to ensure that"""
-        self._albums.sort(key=lambda x: x.album_title)
+        if not self._sorted:
+            self._albums.sort(key=lambda x: x.album_title)
+            self._sorted = True
         return self._albums
 
     @albums.setter
     def albums(self, album: Album) -> None:
         self._albums.append(album)
+        self.clear_cache()
 
-    @property
-    def key_list(self) -> list[dict[str, str]]:
-        """returns the list that will be hashed to create the key"""
+    def clear_cache(self) -> None:
+        """clears the values calculated from the albums"""
+        self._sorted = False
+        self._key_list = None
+        self._album_key = None
+
+    def create_key_list(self) -> list[dict[str, str]]:
+        """creates the list that will be hashed to create the key"""
         raise NotImplementedError(
             "The key list has not been implentented for this class"
         )
 
     @property
-    def album_key(self) -> int:
-        """returns a hash of the albums that the node is connected to. allows us to group similar nodes"""
-        l = []
-        for d in self.key_list:
-            for key in d:
-                l.append(d[key])
-        hash_key = "".join(l)
-        return hash(hash_key)
+    def key_list(self) -> list[dict[str, str]]:
+        """returns the list that will be hashed to create the key"""
+        if self._key_list is None:
+            self._key_list = self.create_key_list()
+        return self._key_list
 
+    def album_links(self) -> list[tuple[int, str]]:
+        """returns the key of each album the node is connected to, and how it is connected"""
+        return [(album.key, "") for album in self.albums]
 
+    @property
+    def album_key(self) -> str:
+        """returns a hash of the albums that the node is connected to. allows us to group similar nodes.
+        the hash is the same in every process, so the groups can be saved"""
+        if self._album_key is not None:
+            return self._album_key
+        digest = hashlib.blake2b(digest_size=16)
+        for album_id, link in sorted(self.album_links()):
+            digest.update(f"{album_id}\0{link}\0".encode())
+        self._album_key = digest.hexdigest()
+        return self._album_key
+
+
+@dataclass
 class Person(LinkingNode):
     """A subclass of LinkingNode specifically for album personel"""
 
+    _album_roles: dict[str, str] | None = field(
+        default=None, init=False, repr=False, compare=False
+    )
+
+    def clear_cache(self) -> None:
+        super().clear_cache()
+        self._album_roles = None
+
     def album_role(self, album_title: str) -> str:
         """the role of the person within the album"""
-        album = [album for album in self.albums if album.album_title == album_title][0]
-        return album.personnel_role(self.name)
+        if self._album_roles is None:
+            self._album_roles = {}
+            for d in self.key_list:
+                self._album_roles.setdefault(d["Album"], d["Role"])
+        return self._album_roles[album_title]
 
-    @property
-    def key_list(self) -> list[dict[str, str]]:
+    def album_links(self) -> list[tuple[int, str]]:
+        return [(album.key, album.personnel_role(self.name)) for album in self.albums]
+
+    def create_key_list(self) -> list[dict[str, str]]:
         return [
-            {"Album": album.album_title, "Role": self.album_role(album.album_title)}
+            {"Album": album.album_title, "Role": album.personnel_role(self.name)}
             for album in self.albums
         ]
 
@@ -65,8 +115,7 @@ class Person(LinkingNode):
 class Genre(LinkingNode):
     """A subclass of LinkingNode specifically for genre data"""
 
-    @property
-    def key_list(self) -> list[dict[str, str]]:
+    def create_key_list(self) -> list[dict[str, str]]:
         return [{"Album": album.album_title} for album in self.albums]
 
 
@@ -116,7 +165,7 @@ class Group:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class NetworkAlbum(Album):
     """A class that stores all of the album info, as well as info specific to the network graph"""
 
@@ -131,45 +180,51 @@ class NetworkAlbum(Album):
             return None
         return len(self.adjacencies)
 
-    @property
-    def group_info(self) -> pd.DataFrame:
-        """returns a dataframe with info about the group for the bar cahrts"""
-
-        return pd.DataFrame(
-            [
-                [self.name, album.album_title, self.album_role(album.album_title), 1]
-                for album in self.albums
-            ],
-            columns=["Person", "Album", "Role", "Count"],
-        )
-
 
 @dataclass
-class NetworkAlbum(Album):
-    """A class that stores all of the album info, as well as info specific to the network graph"""
+class Highlight:
+    """The selected album, and the albums and linking groups to highlight with it, as
+    masks over the albums and linking groups of the graph"""
 
-    adjacencies: list[str] | None = None
-    x: float | None = None
-    y: float | None = None
-
-    @property
-    def num_connections(self) -> int | None:
-        """returns the number of adjacencies for this album"""
-        if self.adjacencies is None:
-            return None
-        return len(self.adjacencies)
+    album: int
+    connected_albums: np.ndarray
+    groups: np.ndarray
 
 
 class NetworkGraph:
-
-    def __init__(self) -> None:
-        self.config: Config = st.session_state.config
+    """A graph of the albums, linked by the nodes they share through relations.
+    The config and albums are taken from the session if they are not given, and must
+    be given when the graph is built outside of the streamlit script thread. The album
+    relations can be given so they are shared with other graphs of the same albums"""
+
+    # the relations that link the albums to the nodes of the graph
+    relations: list[str] = []
+
+    def __init__(
+        self,
+        config: Config | None = None,
+        albums: AlbumStore | None = None,
+        album_relations: AlbumRelations | None = None,
+    ) -> None:
+        self.config: Config = config if config is not None else st.session_state.config
+        self.album_store: AlbumStore = (
+            albums if albums is not None else st.session_state.albums
+        )
+        self._album_relations = album_relations
+        self._album_rows: np.ndarray | None = None
         self._adjacencies: dict[str, list[str]] | None = None
         self._albums: list[NetworkAlbum] | None = None
         self._all_links: list[LinkingNode] = []
         self._linking_groups: list[Group] | None = None
         self._graph: nx.Graph | None = None
         self._album_connections: pd.DataFrame | None = None
+        self._connection_index: ConnectionIndex | None = None
+        self._group_ids: dict[str, int] | None = None
+        self._analytics: NetworkAnalytics | None = None
+        self.layout_engine = get_layout_engine(self.config.network_graph)
+        self.layout_cache = LayoutCache(self.config)
+        # the version of the albums the graph is built from
+        self.albums_version: int = self.album_store.version
 
     @property
     def adjacencies(self) -> dict[str, list[str]]:
@@ -184,30 +239,41 @@ class NetworkGraph:
         }
         return self._adjacencies
 
-    @staticmethod
-    def graph_album(album: Album) -> bool:
-        """returns true of the album should be included in the graph, flase otherwise"""
-        raise NotImplementedError("This must be impleneted in the child class")
+    @property
+    def album_relations(self) -> AlbumRelations:
+        """the links between the albums and every person and genre"""
+        if (
+            self._album_relations is None
+            or self._album_relations.version != self.album_store.version
+        ):
+            self._album_relations = AlbumRelations(self.album_store)
+        return self._album_relations
+
+    @property
+    def album_rows(self) -> np.ndarray:
+        """the rows in the album store of the albums in the graph, which are the albums
+        with at least one of the graph's relations"""
+        if self._album_rows is None:
+            self._album_rows = self.album_relations.album_rows(self.relations)
+        return self._album_rows
 
     @property
     def albums(self) -> list[NetworkAlbum]:
         if self._graph is None:
             return [
-                NetworkAlbum(**album.__dict__)
-                for album in st.session_state.albums
-                if self.graph_album(album)
+                NetworkAlbum(**self.album_store[row].field_values())
+                for row in self.album_rows.tolist()
             ]
         if self._albums is not None:
             return self._albums
 
         self._albums = []
-        for album in st.session_state.albums:
-            if not self.graph_album(album):
-                continue
+        for row in self.album_rows.tolist():
+            album = self.album_store[row]
             x, y = self.graph.nodes[album.album_title]["pos"]
             self._albums.append(
                 NetworkAlbum(
-                    **album.__dict__,
+                    **album.field_values(),
                     x=x,
                     y=y,
                     adjacencies=self.adjacencies[album.album_title],
@@ -218,7 +284,17 @@ class NetworkGraph:
     @property
     def non_album_nodes(self) -> list[LinkingNode]:
         """returns a list of all of the nodes attached to any album"""
-        raise NotImplementedError("This must be impleneted in the child class")
+        if self._all_links:
+            return self._all_links
+        relations = self.album_relations
+        albums = dict(zip(self.album_rows.tolist(), self.albums))
+        self._all_links = [
+            (Genre if relations.genre_nodes[node] else Person)(
+                relations.node_names[node], [albums[row] for row in rows]
+            )
+            for node, rows in relations.node_albums(self.relations)
+        ]
+        return self._all_links
 
     @property
     def linking_groups(self) -> list[Group]:
@@ -227,14 +303,16 @@ class NetworkGraph:
         if self._linking_groups is not None:
             return self._linking_groups
 
-        # if not, calculate the list of linking groups
-        self.non_album_nodes.sort(key=lambda x: x.album_key)
-
+        # if not, calculate the list of linking groups. nodes with the same albums are
+        # grouped, in the order they were first found, so the groups are numbered the
+        # same way every time
+        same_albums: dict[str, list[LinkingNode]] = {}
+        for node in self.non_album_nodes:
+            same_albums.setdefault(node.album_key, []).append(node)
 
         linking_groups = []
         i = 1
-        for _, group in groupby(self.non_album_nodes, key=lambda x: x.album_key):
-            people = list(group)
+        for people in same_albums.values():
             if len(people) == 1:
                 linking_groups.append(Group(people))
                 continue
@@ -255,29 +333,87 @@ class NetworkGraph:
             self._linking_groups.append(group)
         return self._linking_groups
 
+    @property
+    def group_ids(self) -> dict[str, int]:
+        """returns the position of each linking group in linking_groups, by name"""
+        if self._group_ids is not None:
+            return self._group_ids
+        group_ids = {group.name: i for i, group in enumerate(self.linking_groups)}
+        # like the linking groups, these are only saved once the graph is created
+        if self._linking_groups is not None:
+            self._group_ids = group_ids
+        return group_ids
+
     def group_from_name(self, name: str) -> Group:
         """given the name of a group, returns the Group object"""
-        return [group for group in self.linking_groups if group.name == name][0]
+        return self.linking_groups[self.group_ids[name]]
+
+    @property
+    def connection_index(self) -> ConnectionIndex:
+        """an index of the albums connected through each linking group"""
+        if self._connection_index is not None:
+            return self._connection_index
+        self._connection_index = ConnectionIndex(
+            [album.album_title for album in self.albums],
+            [
+                [album.album_title for album in group.albums]
+                for group in self.linking_groups
+            ],
+            [len(group.node) for group in self.linking_groups],
+        )
+        return self._connection_index
+
+    @property
+    def analytics(self) -> NetworkAnalytics:
+        """the centrality, communities and album paths of the graph"""
+        if self._analytics is not None:
+            return self._analytics
+        index = self.connection_index
+        self._analytics = NetworkAnalytics.from_incidence(
+            index.album_titles,
+            [group.name for group in self.linking_groups],
+            index.incidence,
+            betweenness_samples=self.config.network_graph.betweenness_samples,
+            seed=self.config.network_graph.betweenness_seed,
+        )
+        return self._analytics
+
+    def album_group_ids(self, album_id: int) -> np.ndarray:
+        """returns the positions in linking_groups of the groups the album is in"""
+        return self.connection_index.album_groups(album_id)
+
+    def highlight(self, album_title: str) -> Highlight | None:
+        """returns the album, the albums connected to it and the groups it is in, or
+        None if the album is not in the graph"""
+        index = self.connection_index
+        album_id = index.album_ids.get(album_title)
+        if album_id is None:
+            return None
+        connected_albums = np.zeros(len(index.album_titles), dtype=bool)
+        connected_albums[index.neighbours(album_id)] = True
+        groups = np.zeros(len(self.linking_groups), dtype=bool)
+        groups[self.album_group_ids(album_id)] = True
+        return Highlight(album_id, connected_albums, groups)
 
     @property
     def album_connections(self) -> pd.DataFrame:
-        """returns a dataframe with three columns:
+        """returns a dataframe with four columns:
         Album: This is an album that is connected to at least one other album
         Connected Album: an album with at least one node connecting the two albums
-        Count: This is 1"""
+        Count: This is 1
+        Weight: the number of nodes the two albums share"""
         if self._album_connections is not None:
             return self._album_connections
-        connections = nx.to_dict_of_lists(self.graph)
-        conns: list[list[str | int]] = []
-        for album in self.albums:
-            joined_albums: set[str] = set()
-            for node in connections[album.album_title]:
-                albums = [a for a in connections[node] if a != album.album_title]
-                joined_albums.update(albums)
-            for connecting_album in joined_albums:
-                conns.append([album.album_title, connecting_album, 1])
+        index = self.connection_index
+        albums, connecting_albums, weights = index.pairs()
+        titles = np.array(index.album_titles, dtype=object)
         self._album_connections = pd.DataFrame(
-            conns, columns=["Album", "Connecting Album", "Count"]
+            {
+                "Album": titles[albums],
+                "Connecting Album": titles[connecting_albums],
+                "Count": 1,
+                "Weight": weights,
+            }
         )
         return self._album_connections
 
@@ -288,14 +424,20 @@ class NetworkGraph:
         self.create_graph()
         return self.graph
 
-    def create_graph(self) -> None:
-        """creates a networkx graph of the albums and linking groups"""
+    def build_graph(self) -> nx.Graph:
+        """returns a networkx graph of the albums and linking groups, without positions"""
         G = nx.Graph()
 
         nodes = [album.album_title for album in self.albums]
-        nodes.extend([group.name for group in self.linking_groups])
         for i in nodes:
             G.add_node(i)
+        # group numbers change as groups are added, so groups are identified by their
+        # members when layouts are cached
+        for group in self.linking_groups:
+            G.add_node(
+                group.name,
+                identity="\0".join(sorted(node.name for node in group.node)),
+            )
 
         connections = []
         for group in self.linking_groups:
@@ -304,8 +446,33 @@ class NetworkGraph:
 
         for i, j in connections:
             G.add_edges_from([(i, j)])
-
-        pos = nx.spring_layout(G, k=3, iterations=1000)
+        return G
+
+    def create_graph(self, use_cache: bool = True) -> None:
+        """creates the graph and lays it out.
+        the layout is loaded from the layout cache if this graph has been laid out
+        before, unless use_cache is False, in which case it is always laid out again and
+        the cache is overwritten. A graph that has changed since it was last laid out
+        starts from the last layout, and only the changed part is laid out again"""
+        G = self.build_graph()
+
+        kind = type(self).__name__
+        parameters = self.layout_engine.parameters
+        pos = self.layout_cache.load(kind, G, parameters) if use_cache else None
+        if pos is None:
+            previous = (
+                self.layout_cache.latest(kind, parameters)
+                if use_cache and self.config.network_graph.layout_incremental
+                else None
+            )
+            if previous is None:
+                pos = self.layout_engine.layout(G)
+            else:
+                # start from the last layout, so only the edited part of the graph moves
+                pos = self.layout_engine.update(
+                    G, previous.positions, previous.changed_nodes(G)
+                )
+            self.layout_cache.save(kind, G, parameters, pos)
 
         for n, p in pos.items():
             G.nodes[n]["pos"] = p
@@ -316,203 +483,339 @@ class NetworkGraph:
 class PersonelNetowrkGraph(NetworkGraph):
     """A network graph with the album personel as the nodes"""
 
-    @staticmethod
-    def graph_album(album: Album) -> bool:
-        """returns true of the album should be included in the graph, flase otherwise"""
-        if album.personnel():
-            return True
-        return False
-
-    @property
-    def non_album_nodes(self) -> list[LinkingNode]:
-        """returns a list of all of the nodes attached to any album"""
-        if self._all_links:
-            return self._all_links
-        node_dict = defaultdict(list)
-        for album in self.albums:
-            for person in album.personnel():
-                node_dict[person].append(album)
-        self._all_links = [Person(name, node_dict[name]) for name in node_dict]
-        return self._all_links
+    relations = PERSONNEL_RELATIONS
 
 
 class GenreNetowrkGraph(NetworkGraph):
     """A network graph with the album genres as the nodes"""
 
-    @staticmethod
-    def graph_album(album: Album) -> bool:
-        """returns true of the album should be included in the graph, flase otherwise"""
-        if album.genres:
-            return True
-        return False
+    relations = [Relation.GENRE]
+
+
+class ProjectedAlbumGraph(NetworkGraph):
+    """A network graph with only the albums as nodes, linked directly when they share
+    personel or genres. Each link has the number of nodes the albums share, by role,
+    and a weight that adds network_graph.projected_role_weights for each shared node.
+    Links lighter than network_graph.projected_min_weight are left out. The relations
+    that link albums are set by network_graph.projected_relations, so the same albums
+    can be linked by their personel, their genres or both"""
+
+    def __init__(
+        self,
+        config: Config | None = None,
+        albums: AlbumStore | None = None,
+        album_relations: AlbumRelations | None = None,
+    ) -> None:
+        super().__init__(config, albums, album_relations)
+        self._projection: ProjectedConnections | None = None
+        self._album_edges: tuple[np.ndarray, np.ndarray, np.ndarray] | None = None
+
+    @property
+    def relations(self) -> list[str]:  # type: ignore[override]
+        return self.config.network_graph.projected_relations
 
     @property
     def non_album_nodes(self) -> list[LinkingNode]:
-        """returns a list of all of the nodes attached to any album"""
-        if self._all_links:
-            return self._all_links
-        node_dict = defaultdict(list)
-        for album in self.albums:
-            for genre in album.genres:
-                node_dict[genre].append(album)
-        self._all_links = [Genre(name, node_dict[name]) for name in node_dict]
-        return self._all_links
+        """the albums are linked directly, so there are no other nodes"""
+        return []
+
+    @property
+    def projection(self) -> ProjectedConnections:
+        """the connections between every pair of albums that share a node"""
+        if self._projection is not None:
+            return self._projection
+        relations = self.album_relations
+        links = relations.view(self.relations)
+        self._projection = ProjectedConnections(
+            [album.album_title for album in self.albums],
+            np.searchsorted(self.album_rows, relations.albums[links]),
+            relations.nodes[links],
+            np.array(relations.relation_names, dtype=str).astype(object)[
+                relations.relations[links]
+            ],
+            self.config.network_graph.projected_role_weights,
+        )
+        return self._projection
 
+    @property
+    def album_edges(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """returns the album ids and weight of each link in the graph"""
+        if self._album_edges is None:
+            self._album_edges = self.projection.edges(
+                self.config.network_graph.projected_min_weight
+            )
+        return self._album_edges
 
-class PersonelNetworkLines:
-    """A class that stores the data for the lines in the Personel network graph"""
+    @property
+    def connection_index(self) -> ConnectionIndex:
+        """an index of the albums linked in the graph, where the weight of a link is
+        the number of nodes the albums share"""
+        if self._connection_index is not None:
+            return self._connection_index
+        titles = self.projection.album_titles
+        albums, connecting_albums, _ = self.album_edges
+        self._connection_index = ConnectionIndex(
+            titles,
+            [[titles[i], titles[j]] for i, j in zip(albums, connecting_albums)],
+            np.asarray(self.projection.counts[albums, connecting_albums]).ravel(),
+        )
+        return self._connection_index
+
+    def album_group_ids(self, album_id: int) -> np.ndarray:
+        """there are no linking groups"""
+        return np.empty(0, dtype=np.int64)
 
-    def __init__(self, network_graph: PersonelNetowrkGraph) -> None:
+    @property
+    def analytics(self) -> NetworkAnalytics:
+        """the centrality, communities and album paths of the graph"""
+        if self._analytics is not None:
+            return self._analytics
+        index = self.connection_index
+        self._analytics = NetworkAnalytics(
+            index.album_titles,
+            len(index.album_titles),
+            index.weights.sign(),
+            betweenness_samples=self.config.network_graph.betweenness_samples,
+            seed=self.config.network_graph.betweenness_seed,
+        )
+        return self._analytics
+
+    def build_graph(self) -> nx.Graph:
+        """returns a networkx graph of the albums, without positions. each link has the
+        weight, the number of shared nodes as count, and the number by role as roles"""
+        G = nx.Graph()
+        titles = self.projection.album_titles
+        G.add_nodes_from(titles)
+        albums, connecting_albums, weights = self.album_edges
+        counts = np.asarray(self.projection.counts[albums, connecting_albums]).ravel()
+        role_counts = self.projection.pair_counts(albums, connecting_albums)
+        for k, (i, j) in enumerate(zip(albums.tolist(), connecting_albums.tolist())):
+            G.add_edge(
+                titles[i],
+                titles[j],
+                weight=float(weights[k]),
+                count=int(counts[k]),
+                roles={
+                    role: int(role_counts[role][k])
+                    for role in role_counts
+                    if role_counts[role][k]
+                },
+            )
+        return G
+
+
+class NetworkLines:
+    """A parent class that stores the data for the lines in a network graph.
+    The lines are drawn as one WebGL trace for each colour, with the lines separated by
+    gaps, rather than one trace for each line, as plotly slows down with many traces"""
+
+    def __init__(self, network_graph: NetworkGraph) -> None:
         self.config = network_graph.config
         self.network_graph = network_graph
         self._edge_details: list[dict[str, str]] = []
-        self._scatter_plots: list[go.Scatter] | None = None
+        self._edge_coordinates: tuple[np.ndarray, np.ndarray] | None = None
+        self._edge_groups: np.ndarray | None = None
+        self._edge_colours: np.ndarray | None = None
+        self._scatter_plots: list[go.Scattergl] | None = None
+        # the lines highlighted for the selected album, if there is one
+        self.highlighted: np.ndarray | None = None
 
     @property
     def edge_details(self) -> list[dict[str, str]]:
         if self._edge_details:
             return self._edge_details
-        for _, edge in enumerate(self.network_graph.graph.edges()):
-            album_title, group_name = edge
-            group = self.network_graph.group_from_name(group_name)
-            if isinstance(group.single_node, Person):
-                role = group.single_node.album_role(album_title)
+        for album_title, group_name in self.network_graph.graph.edges():
             self._edge_details.append(
                 {
                     "album_title": album_title,
                     "group_name": group_name,
-                    "role": role,
                 }
             )
         return self._edge_details
 
+    def edge_colour(self, details: dict[str, str]) -> str:
+        """returns the colour of a line that is not dimmed"""
+        raise NotImplementedError("This must be impleneted in the child class")
+
     @property
-    def scatter_plots(self) -> list[go.Scatter]:
-        if self._scatter_plots is not None:
-            return self._scatter_plots
-        self._scatter_plots = []
-        for details in self.edge_details:
-            album_title = details["album_title"]
-            group_name = details["group_name"]
-            role = details["role"]
-            x0, y0 = self.network_graph.graph.nodes[album_title]["pos"]
-            x1, y1 = self.network_graph.graph.nodes[group_name]["pos"]
-
-            self._scatter_plots.append(
-                go.Scatter(
-                    x=[x0, x1],
-                    y=[y0, y1],
-                    line=dict(
-                        width=1,
-                        color=self.config.network_graph.connection_colourmap[role],
-                    ),
-                    hoverinfo="none",
-                    showlegend=False,
-                    mode="lines",
-                )
-            )
+    def edge_coordinates(self) -> tuple[np.ndarray, np.ndarray]:
+        """returns (number of lines, 3) arrays of the x and y coordinates of the lines.
+        the last column is nan, which plotly draws as a gap between the lines"""
+        if self._edge_coordinates is not None:
+            return self._edge_coordinates
+        graph = self.network_graph.graph
+        coordinates = np.full((graph.number_of_edges(), 3, 2), np.nan)
+        for i, (u, v) in enumerate(graph.edges()):
+            coordinates[i, 0] = graph.nodes[u]["pos"]
+            coordinates[i, 1] = graph.nodes[v]["pos"]
+        self._edge_coordinates = coordinates[:, :, 0], coordinates[:, :, 1]
+        return self._edge_coordinates
+
+    @property
+    def edge_groups(self) -> np.ndarray:
+        """returns the position in linking_groups of the group at the end of each line"""
+        if self._edge_groups is not None:
+            return self._edge_groups
+        group_ids = self.network_graph.group_ids
+        self._edge_groups = np.fromiter(
+            (group_ids[details["group_name"]] for details in self.edge_details),
+            dtype=np.int64,
+            count=len(self.edge_details),
+        )
+        return self._edge_groups
+
+    @property
+    def edge_colours(self) -> np.ndarray:
+        """returns the colour of each line"""
+        if self._edge_colours is not None:
+            return self._edge_colours
+        self._edge_colours = np.array(
+            [self.edge_colour(details) for details in self.edge_details], dtype=object
+        )
+        return self._edge_colours
+
+    def lines_trace(self, edges: np.ndarray, width: int, colour: str) -> go.Scattergl:
+        """returns a single trace drawing the selected lines"""
+        x, y = self.edge_coordinates
+        return go.Scattergl(
+            x=x[edges].ravel(),
+            y=y[edges].ravel(),
+            line=dict(width=width, color=colour),
+            hoverinfo="none",
+            showlegend=False,
+            mode="lines",
+        )
+
+    def colour_traces(self, edges: np.ndarray, width: int) -> list[go.Scattergl]:
+        """returns a trace for each colour of the selected lines"""
+        colours = self.edge_colours
+        return [
+            self.lines_trace(edges & (colours == colour), width, colour)
+            for colour in dict.fromkeys(colours[edges])
+        ]
+
+    @property
+    def scatter_plots(self) -> list[go.Scattergl]:
+        """the traces drawing every line, built when they are first needed"""
+        if self._scatter_plots is None:
+            self._scatter_plots = self.traces()
         return self._scatter_plots
 
-    def highlight_album(self, highlight_albums: list[str]) -> None:
+    def highlighted_edges(self, highlight: Highlight) -> np.ndarray:
+        """returns a mask of the lines to the groups the selected album is in"""
+        return highlight.groups[self.edge_groups]
+
+    def traces(self, visible: np.ndarray | None = None) -> list[go.Scattergl]:
+        """returns the traces drawing the visible lines, or every line if visible is
+        None, coloured for the current highlight"""
+        if visible is None:
+            visible = np.ones(len(self.edge_details), dtype=bool)
+        if self.highlighted is None:
+            return self.colour_traces(visible, 1)
+        # the dimmed lines are drawn first, so the highlighted lines are on top
+        return [
+            self.lines_trace(~self.highlighted & visible, 1, "grey"),
+            *self.colour_traces(self.highlighted & visible, 2),
+        ]
+
+    def edges_in(self, viewport: Viewport) -> np.ndarray:
+        """returns a mask of the lines with at least one end in the viewport"""
+        x, y = self.edge_coordinates
+        return viewport.contains(x[:, 0], y[:, 0]) | viewport.contains(x[:, 1], y[:, 1])
+
+    def highlight_album(self, highlight: Highlight) -> None:
         """colours only the lines connected to the selected album and the albums connected to it"""
-        for plt, details in zip(self.scatter_plots, self.edge_details):
-            album_title = details["album_title"]
-            group = self.network_graph.group_from_name(details["group_name"])
-            group_albums = [album.album_title for album in group.albums]
-            role = details["role"]
-            if highlight_albums[0] in group_albums:
-                plt.line = dict(
-                    width=2,
-                    color=self.config.network_graph.connection_colourmap[role],
-                )
-            else:
-                plt.line = dict(
-                    width=1,
-                    color="grey",
-                )
+        self.highlighted = self.highlighted_edges(highlight)
+        self._scatter_plots = None
 
     def default_colours(self) -> None:
         """sets the default colours for the lines"""
-        for plt, details in zip(self.scatter_plots, self.edge_details):
-            role = details["role"]
-            plt.line = dict(
-                width=1,
-                color=self.config.network_graph.connection_colourmap[role],
-            )
+        self.highlighted = None
+        self._scatter_plots = None
 
 
-class GenreNetworkLines:
-    """A class that stores the data for the lines in the network graph where the nodes are Genre"""
-
-    def __init__(self, network_graph: NetworkGraph) -> None:
-        self.config = network_graph.config
-        self.network_graph = network_graph
-        self._edge_details: list[dict[str, str]] = []
-        self._scatter_plots: list[go.Scatter] | None = None
+class PersonelNetworkLines(NetworkLines):
+    """A class that stores the data for the lines in the Personel network graph"""
 
     @property
     def edge_details(self) -> list[dict[str, str]]:
         if self._edge_details:
             return self._edge_details
-        for _, edge in enumerate(self.network_graph.graph.edges()):
-            album_title, group_name = edge
+        for album_title, group_name in self.network_graph.graph.edges():
+            group = self.network_graph.group_from_name(group_name)
+            if isinstance(group.single_node, Person):
+                role = group.single_node.album_role(album_title)
             self._edge_details.append(
                 {
                     "album_title": album_title,
                     "group_name": group_name,
+                    "role": role,
                 }
             )
         return self._edge_details
 
+    def edge_colour(self, details: dict[str, str]) -> str:
+        return self.config.network_graph.connection_colourmap[details["role"]]
+
+
+class GenreNetworkLines(NetworkLines):
+    """A class that stores the data for the lines in the network graph where the nodes are Genre"""
+
+    def edge_colour(self, details: dict[str, str]) -> str:
+        return self.config.network_graph.connection_default_colour
+
+
+class ProjectedAlbumLines(NetworkLines):
+    """A class that stores the data for the lines in the network graph where the albums
+    are linked directly. Each line is coloured by the role most of the shared nodes have
+    """
+
+    def __init__(self, network_graph: ProjectedAlbumGraph) -> None:
+        super().__init__(network_graph)
+        self._edge_albums: np.ndarray | None = None
+
     @property
-    def scatter_plots(self) -> list[go.Scatter]:
-        if self._scatter_plots is not None:
-            return self._scatter_plots
-        self._scatter_plots = []
-        for details in self.edge_details:
-            album_title = details["album_title"]
-            group_name = details["group_name"]
-            x0, y0 = self.network_graph.graph.nodes[album_title]["pos"]
-            x1, y1 = self.network_graph.graph.nodes[group_name]["pos"]
-
-            self._scatter_plots.append(
-                go.Scatter(
-                    x=[x0, x1],
-                    y=[y0, y1],
-                    line=dict(
-                        width=1,
-                        color=self.config.network_graph.connection_default_colour,
-                    ),
-                    hoverinfo="none",
-                    showlegend=False,
-                    mode="lines",
-                )
+    def edge_details(self) -> list[dict[str, str]]:
+        if self._edge_details:
+            return self._edge_details
+        for album_title, connecting_album, roles in self.network_graph.graph.edges(
+            data="roles"
+        ):
+            self._edge_details.append(
+                {
+                    "album_title": album_title,
+                    "connecting_album": connecting_album,
+                    "role": max(roles, key=roles.get) if roles else "unknown",
+                }
             )
-        return self._scatter_plots
+        return self._edge_details
 
-    def highlight_album(self, highlight_albums: list[str]) -> None:
-        """colours only the lines connected to the selected album and the albums connected to it"""
-        for plt, details in zip(self.scatter_plots, self.edge_details):
-            group = self.network_graph.group_from_name(details["group_name"])
-            group_albums = [album.album_title for album in group.albums]
-            if highlight_albums[0] in group_albums:
-                plt.line = dict(
-                    width=2,
-                    color=self.config.network_graph.connection_default_colour,
-                )
-            else:
-                plt.line = dict(
-                    width=1,
-                    color="grey",
+    def edge_colour(self, details: dict[str, str]) -> str:
+        return self.config.network_graph.connection_colourmap.get(
+            details["role"], self.config.network_graph.connection_default_colour
+        )
+
+    @property
+    def edge_albums(self) -> np.ndarray:
+        """returns the ids of the two albums at the ends of each line"""
+        if self._edge_albums is not None:
+            return self._edge_albums
+        album_ids = self.network_graph.connection_index.album_ids
+        self._edge_albums = np.array(
+            [
+                (
+                    album_ids[details["album_title"]],
+                    album_ids[details["connecting_album"]],
                 )
+                for details in self.edge_details
+            ],
+            dtype=np.int64,
+        ).reshape(-1, 2)
+        return self._edge_albums
 
-    def default_colours(self) -> None:
-        """sets the default colours for the lines"""
-        for plt in self.scatter_plots:
-            plt.line = dict(
-                width=1,
-                color=self.config.network_graph.connection_default_colour,
-            )
+    def highlighted_edges(self, highlight: Highlight) -> np.ndarray:
+        """returns a mask of the lines to the selected album"""
+        return (self.edge_albums == highlight.album).any(axis=1)
 
 
 class AlbumPoints:
@@ -522,18 +825,21 @@ class AlbumPoints:
         self.config = network_graph.config
         self.network_graph = network_graph
         self._album_info: list[dict[str, int | str]] = []
-        self._scatter_plot: go.Scatter | None = None
+        self._scatter_plot: go.Scattergl | None = None
 
     @property
-    def scatter_plot(self) -> go.Scatter:
+    def scatter_plot(self) -> go.Scattergl:
         """creates a scattter plot of the albums"""
         if self._scatter_plot is not None:
             return self._scatter_plot
-        # define base graph
-        self._scatter_plot = go.Scatter(
-            x=[],
-            y=[],
-            text=[],
+        albums = self.network_graph.albums
+        # the hover text is kept short, and the points carry their node id, so the
+        # details of an album are only built when it is selected
+        self._scatter_plot = go.Scattergl(
+            x=np.array([album.x for album in albums], dtype=np.float64),
+            y=np.array([album.y for album in albums], dtype=np.float64),
+            text=[f"{album.album_title} ({album.artist})" for album in albums],
+            customdata=np.arange(len(albums)),
             mode="markers",
             marker_symbol=self.config.network_graph.album_symbol,
             showlegend=True,
@@ -554,43 +860,39 @@ class AlbumPoints:
             ),
         )
 
-        for album in self.network_graph.albums:
-            # check if the node is an album
-            self._scatter_plot["x"] += tuple([album.x])  # type: ignore
-            self._scatter_plot["y"] += tuple([album.y])  # type: ignore
-            node_info = f"{album.album_title} ({album.artist})<br><i>{album.release_date}<i><br># of connections: {album.num_connections}"
-            self._scatter_plot["text"] += tuple([node_info])  # type: ignore
-
         self._scatter_plot.marker = self.default_marker
         return self._scatter_plot
 
-    def highlight_album(self, highlight_albums: list[str]) -> None:
-        colors = []
-        symbols = []
-        sizes = []
-        for album in self.network_graph.albums:
-            if album.album_title == highlight_albums[0]:
-                colors.append(self.config.network_graph.album_highlight_color)
-                symbols.append(self.config.network_graph.album_symbol)
-                sizes.append(self.config.network_graph.album_highlight_size)
-            elif album.album_title in highlight_albums:
-                colors.append(
-                    self.config.network_graph.album_highlight_connection_color
-                )
-                symbols.append(self.config.network_graph.album_symbol)
-                sizes.append(self.config.network_graph.album_size)
-            else:
-                colors.append(self.config.network_graph.album_lowlight_color)
-                symbols.append(self.config.network_graph.album_symbol)
-                sizes.append(self.config.network_graph.album_lowlight_size)
-        # colors = self.network_graph_colors.highlight_album(highlight_albums)
+    def album_details(self, album_id: int) -> str:
+        """returns the details of the album, shown as html when it is selected"""
+        album = self.network_graph.albums[album_id]
+        return (
+            f"<b>{html.escape(album.album_title)}</b> ({html.escape(album.artist)})"
+            f"<br><i>{album.release_date}</i>"
+            f"<br># of connections: {album.num_connections}"
+        )
+
+    def highlight_album(self, highlight: Highlight) -> None:
+        settings = self.config.network_graph
+        colors = np.where(
+            highlight.connected_albums,
+            settings.album_highlight_connection_color,
+            settings.album_lowlight_color,
+        ).astype(object)
+        sizes = np.where(
+            highlight.connected_albums,
+            settings.album_size,
+            settings.album_lowlight_size,
+        )
+        colors[highlight.album] = settings.album_highlight_color
+        sizes[highlight.album] = settings.album_highlight_size
         self.scatter_plot.marker = dict(
             showscale=True,
             colorscale="RdBu",
             reversescale=True,
             color=colors,
             size=sizes,
-            symbol=symbols,
+            symbol=self.config.network_graph.album_symbol,
             opacity=1.0,
             colorbar=dict(
                 thickness=10,
@@ -630,18 +932,28 @@ class NonAlbumPoints:
         self.config = network_graph.config
 
         self.network_graph = network_graph
-        self._scatter_plot: go.Scatter | None = None
+        self._scatter_plot: go.Scattergl | None = None
 
     @property
-    def scatter_plot(self) -> go.Scatter:
+    def scatter_plot(self) -> go.Scattergl:
         """creates a scattter plot of the albums"""
         if self._scatter_plot is not None:
             return self._scatter_plot
-        # add people nodes
-        self._scatter_plot = go.Scatter(
-            x=[],
-            y=[],
-            text=[],
+        groups = self.network_graph.linking_groups
+        # the groups are numbered after the albums, as they are in the analytics
+        num_albums = len(self.network_graph.albums)
+        self._scatter_plot = go.Scattergl(
+            x=np.array([group.x for group in groups], dtype=np.float64),
+            y=np.array([group.y for group in groups], dtype=np.float64),
+            text=[
+                (
+                    f"{group.name} ({len(group.node)} people)"
+                    if len(group.node) > 1
+                    else group.name
+                )
+                for group in groups
+            ],
+            customdata=np.arange(num_albums, num_albums + len(groups)),
             mode="markers",
             marker_symbol=self.config.network_graph.person_symbol,
             marker_color=self.config.network_graph.person_colour,
@@ -649,51 +961,41 @@ class NonAlbumPoints:
             showlegend=False,
         )
 
-        for group in self.network_graph.linking_groups:
-            self._scatter_plot["x"] += tuple([group.x])  # type: ignore
-            self._scatter_plot["y"] += tuple([group.y])  # type: ignore
-            node_info = group.name
-            if len(group.node) > 1:
-                node_info += f" ({len(group.node)} people)"
-                if len(group.node) < 6:
-                    for node in group.node:
-                        node_info += f"<br>{node.name}"
-            if isinstance(group, Person):
-                for album in group.albums:
-                    role = group.album_role(album.album_title)
-                    colour = self.config.network_graph.connection_colourmap[role]
-                    node_info += f"<br>{album.album_title}: <span style='color:{colour}'>{role}</span>."
-            else:
-                for album in group.albums:
-                    node_info += f"<br>{album.album_title}."
-            self._scatter_plot["text"] += tuple([node_info])  # type: ignore
-
         return self._scatter_plot
 
-    def highlight_album(self, highlight_albums: list[str]) -> None:
+    def group_details(self, group_id: int) -> str:
+        """returns the details of the linking group, shown as html when it is
+        selected"""
+        group = self.network_graph.linking_groups[group_id]
+        node_info = f"<b>{html.escape(group.name)}</b>"
+        if len(group.node) > 1:
+            node_info += f" ({len(group.node)} people)"
+            if len(group.node) < 6:
+                for node in group.node:
+                    node_info += f"<br>{html.escape(node.name)}"
+        # the people in a group have the same role on each of its albums
+        if isinstance(group.single_node, Person):
+            colourmap = self.config.network_graph.connection_colourmap
+            for link in group.single_node.key_list:
+                colour = colourmap[link["Role"]]
+                node_info += (
+                    f"<br>{html.escape(link['Album'])}: "
+                    f"<span style='color:{colour}'>{html.escape(link['Role'])}</span>."
+                )
+        else:
+            for album in group.albums:
+                node_info += f"<br>{html.escape(album.album_title)}."
+        return node_info
+
+    def highlight_album(self, highlight: Highlight) -> None:
         """highlight the people connected to the highlighted album"""
-        highlight_album = highlight_albums[0]
-        people_colors = []
-        people_size = []
-        for group in self.network_graph.linking_groups:
-            album_names = [album.album_title for album in group.albums]
-            if highlight_album in album_names:
-                if isinstance(group, Person):
-                    people_colors.append(
-                        self.config.network_graph.connection_colourmap[
-                            group.album_role(highlight_album)
-                        ]
-                        # self.config.network_graph.person_highlight_color
-                    )
-                else:
-                    people_colors.append(
-                        self.config.network_graph.album_highlight_color
-                    )
-
-                people_size.append(self.config.network_graph.person_highlight_size)
-            else:
-                people_colors.append(self.config.network_graph.person_colour)
-                people_size.append(self.config.network_graph.person_size)
+        settings = self.config.network_graph
+        people_colors = np.where(
+            highlight.groups, settings.album_highlight_color, settings.person_colour
+        )
+        people_size = np.where(
+            highlight.groups, settings.person_highlight_size, settings.person_size
+        )
         self.scatter_plot.marker = dict(
             color=people_colors, size=people_size, opacity=1.0
         )
@@ -701,7 +1003,6 @@ class NonAlbumPoints:
     def default_colours(self) -> None:
         """sets the default colours for the lines"""
         self.scatter_plot.marker = dict(
-
             color=self.config.network_graph.person_colour,
             size=self.config.network_graph.person_size,
             opacity=1.0,
@@ -710,15 +1011,18 @@ class NonAlbumPoints:
 
 class NetworkPlots:
 
-    def __init__(self, network_lines: PersonelNetworkLines | GenreNetworkLines) -> None:
-        self.config: Config = st.session_state.config
+    def __init__(self, network_lines: NetworkLines) -> None:
         self.network_graph = network_lines.network_graph
-        self.graph = self.network_graph.graph
-        self.album_connections = self.network_graph.album_connections
+        self.config: Config = self.network_graph.config
         self.network_lines = network_lines
         self.album_scatter = AlbumPoints(self.network_graph)
         self.non_album_scatter = NonAlbumPoints(self.network_graph)
         self._person_info: list[list[str]] = []
+        self._graph_arrays: tuple[np.ndarray, np.ndarray, np.ndarray, list] | None = (
+            None
+        )
+        # true if the last network plot was too large to draw, and shows clusters
+        self.clustered = False
 
     @property
     def person_info(self) -> list[list[str]]:
@@ -727,32 +1031,45 @@ class NetworkPlots:
         self.network_plot()
         return self._person_info
 
-    def network_plot(self, highlight_album: str | None = None) -> go.Figure:
-        """creates a scatter plot of the albums and linking groups"""
-        if highlight_album is not None:
-            highlight_albums = [highlight_album]
-            connections = self.network_graph.album_connections[
-                self.network_graph.album_connections["Album"] == highlight_album
-            ]["Connecting Album"].tolist()
-            highlight_albums += connections
-
-        if highlight_album is not None:
-            self.album_scatter.highlight_album(highlight_albums)
-            self.network_lines.highlight_album(highlight_albums)
-            self.non_album_scatter.highlight_album(highlight_albums)
+    def network_plot(
+        self, highlight_album: str | None = None, viewport: Viewport | None = None
+    ) -> go.Figure:
+        """creates a scatter plot of the albums and linking groups, or only those in the
+        viewport if one is given. If there are more nodes or lines to draw than
+        network_graph.max_rendered_nodes or max_rendered_edges, the nodes are drawn as
+        clusters instead"""
+        highlight = (
+            self.network_graph.highlight(highlight_album)
+            if highlight_album is not None
+            else None
+        )
+        if highlight is not None:
+            self.network_lines.highlight_album(highlight)
         else:
-            self.album_scatter.default_colours()
             self.network_lines.default_colours()
-            self.non_album_scatter.default_colours()
 
+        # the size of the figure is found from the graph, so no traces are built for a
+        # graph that is drawn as clusters
+        positions, edges, _, _ = self.graph_arrays
+        if viewport is None:
+            num_nodes, num_edges = len(positions), len(edges)
+        else:
+            inside = viewport.contains(positions[:, 0], positions[:, 1])
+            num_nodes, num_edges = inside.sum(), inside[edges].any(axis=1).sum()
+        settings = self.config.network_graph
+        self.clustered = bool(
+            num_nodes > settings.max_rendered_nodes
+            or num_edges > settings.max_rendered_edges
+        )
+        if self.clustered:
+            data = self.cluster_plots(viewport)
+            if highlight is not None:
+                data += self.highlight_plots(highlight, viewport)
+        else:
+            data = self.detail_plots(highlight, viewport)
 
         return go.Figure(
-            data=[
-                *self.network_lines.scatter_plots,
-                self.non_album_scatter.scatter_plot,
-
-                self.album_scatter.scatter_plot,
-            ],
+            data=data,
             layout=go.Layout(
                 title="<br>Network Graph",
                 titlefont=dict(size=16),
@@ -760,11 +1077,122 @@ class NetworkPlots:
                 coloraxis_showscale=True,
                 hovermode="closest",
                 margin=dict(b=20, l=5, r=5, t=40),
-                xaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
-                yaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
+                xaxis=dict(
+                    showgrid=False,
+                    zeroline=False,
+                    showticklabels=False,
+                    range=[viewport.x0, viewport.x1] if viewport is not None else None,
+                ),
+                yaxis=dict(
+                    showgrid=False,
+                    zeroline=False,
+                    showticklabels=False,
+                    range=[viewport.y0, viewport.y1] if viewport is not None else None,
+                ),
             ),
         )
 
+    def detail_plots(
+        self, highlight: Highlight | None, viewport: Viewport | None = None
+    ) -> list[go.Scattergl]:
+        """returns the traces drawing every line and node, or those in the viewport"""
+        if highlight is not None:
+            self.album_scatter.highlight_album(highlight)
+            self.non_album_scatter.highlight_album(highlight)
+        else:
+            self.album_scatter.default_colours()
+            self.non_album_scatter.default_colours()
+        album_points = self.album_scatter.scatter_plot
+        group_points = self.non_album_scatter.scatter_plot
+        if viewport is None:
+            return [*self.network_lines.scatter_plots, group_points, album_points]
+        return [
+            *self.network_lines.traces(self.network_lines.edges_in(viewport)),
+            visible_points(group_points, points_in(group_points, viewport)),
+            visible_points(album_points, points_in(album_points, viewport)),
+        ]
+
+    def highlight_plots(
+        self, highlight: Highlight, viewport: Viewport | None = None
+    ) -> list[go.Scattergl]:
+        """returns the traces drawing the highlighted album, the albums and groups
+        connected to it and the lines between them, in full detail, to be drawn over
+        the clusters"""
+        self.album_scatter.highlight_album(highlight)
+        self.non_album_scatter.highlight_album(highlight)
+        album_points = self.album_scatter.scatter_plot
+        group_points = self.non_album_scatter.scatter_plot
+        albums = highlight.connected_albums.copy()
+        albums[highlight.album] = True
+        groups = highlight.groups
+        edges = self.network_lines.highlighted
+        if viewport is not None:
+            albums = albums & points_in(album_points, viewport)
+            groups = groups & points_in(group_points, viewport)
+            edges = edges & self.network_lines.edges_in(viewport)
+        album_points = visible_points(album_points, albums)
+        # the clusters have their own colour bar
+        album_points.marker.showscale = False
+        return [
+            *self.network_lines.colour_traces(edges, 2),
+            visible_points(group_points, groups),
+            album_points,
+        ]
+
+    @property
+    def graph_arrays(self) -> tuple[np.ndarray, np.ndarray, np.ndarray, list[str]]:
+        """returns the positions of the nodes of the graph, its edges as pairs of node
+        positions in the graph, a mask of the album nodes and the node names"""
+        if self._graph_arrays is not None:
+            return self._graph_arrays
+        graph = self.network_graph.graph
+        names = list(graph.nodes)
+        index = {name: i for i, name in enumerate(names)}
+        album_titles = {album.album_title for album in self.network_graph.albums}
+        self._graph_arrays = (
+            np.array([graph.nodes[name]["pos"] for name in names], dtype=np.float64),
+            np.array(
+                [(index[u], index[v]) for u, v in graph.edges()], dtype=np.int64
+            ).reshape(-1, 2),
+            np.array([name in album_titles for name in names], dtype=bool),
+            names,
+        )
+        return self._graph_arrays
+
+    def cluster_plots(self, viewport: Viewport | None = None) -> list[go.Scattergl]:
+        """returns the traces drawing the graph, or the part of it in the viewport, as
+        clusters of nodes"""
+        positions, edges, album_nodes, names = self.graph_arrays
+        if viewport is not None:
+            inside = viewport.contains(positions[:, 0], positions[:, 1])
+            new_index = np.cumsum(inside) - 1
+            edges = new_index[edges[inside[edges].all(axis=1)]]
+            positions, album_nodes = positions[inside], album_nodes[inside]
+            names = [name for name, shown in zip(names, inside) if shown]
+        if not len(positions):
+            return []
+        settings = self.config.network_graph
+        clusters = ClusterView(
+            positions,
+            edges,
+            album_nodes,
+            names,
+            settings.max_rendered_nodes,
+            settings.max_rendered_edges,
+        )
+        return [
+            *clusters.line_traces(settings.connection_default_colour),
+            clusters.points_trace(settings.person_symbol, settings.person_size),
+        ]
+
+    def node_details(self, node_id: int) -> str:
+        """returns the details of the album or linking group with the node id the points
+        carry as customdata, numbered with the albums first"""
+        num_albums = len(self.network_graph.albums)
+        if node_id < num_albums:
+            return self.album_scatter.album_details(node_id)
+        return self.non_album_scatter.group_details(node_id - num_albums)
+
     def top_nodes(self) -> go.Figure:
         """creates a bar plot of the top 30 people with the most connections"""
         nodes = self.network_graph.linking_groups.copy()
@@ -786,18 +1214,27 @@ class NetworkPlots:
             category_orders={
                 "Person": [group.name for group in nodes],
                 # "Role": ["musician", "producer", "arranger", "writer", "unknown"],
-
             },
             height=800,
         )
 
     def top_albums(self) -> go.Figure:
         """creates a bar plot of the top 30 albums with the most connections"""
-        data = self.album_connections
-        df = data[["Album", "Count"]].groupby("Album").count()
-        df = df.sort_values(["Count"], ascending=False)
-        album_order = df.index.tolist()[:30]
-        data = data[data["Album"].isin(album_order)]
+        index = self.network_graph.connection_index
+        counts = index.counts
+        # stable, so albums with the same count stay in album order
+        top_ids = np.argsort(-counts, kind="stable")[:30]
+        top_ids = top_ids[counts[top_ids] > 0]
+        titles = np.array(index.album_titles, dtype=object)
+        # selecting the rows of the weights gives the neighbours of each album in turn
+        data = pd.DataFrame(
+            {
+                "Album": np.repeat(titles[top_ids], counts[top_ids]),
+                "Connecting Album": titles[index.weights[top_ids].indices],
+                "Count": 1,
+            }
+        )
+        album_order = titles[top_ids].tolist()
         return px.bar(
             data,
             x="Count",
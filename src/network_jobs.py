@@ -0,0 +1,150 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+import threading
+import streamlit as st
+from cfg.cfg import Config
+from src.album_relations import AlbumRelations
+from src.album_store import AlbumStore
+from src.network_graph import (
+    GenreNetowrkGraph,
+    NetworkGraph,
+    PersonelNetowrkGraph,
+    ProjectedAlbumGraph,
+)
+
+# the network graphs, by the session state key that their plots are stored under
+NETWORK_GRAPHS: dict[str, type[NetworkGraph]] = {
+    "personel_network": PersonelNetowrkGraph,
+    "genre_network": GenreNetowrkGraph,
+    "album_network": ProjectedAlbumGraph,
+}
+
+
+@st.cache_resource
+def layout_executor() -> ThreadPoolExecutor:
+    """one pool for every session, with a worker for each kind of graph so they can be
+    laid out at the same time"""
+    return ThreadPoolExecutor(
+        max_workers=len(NETWORK_GRAPHS), thread_name_prefix="network-layout"
+    )
+
+
+def build_network_graph(
+    graph_type: type[NetworkGraph],
+    config: Config,
+    albums: AlbumStore,
+    album_relations: AlbumRelations,
+    use_cache: bool = True,
+) -> NetworkGraph:
+    """builds the graph, its layout and album connections. This runs in a worker
+    thread, so it must not use the session state"""
+    network_graph = graph_type(config, albums, album_relations)
+    network_graph.create_graph(use_cache=use_cache)
+    network_graph.albums
+    network_graph.linking_groups
+    network_graph.album_connections
+    return network_graph
+
+
+@dataclass
+class NetworkData:
+    """A copy of the albums and their relations, shared by the jobs building every
+    kind of graph for the same version of the albums"""
+
+    albums: AlbumStore
+    album_relations: AlbumRelations
+
+
+def network_data() -> NetworkData:
+    """returns the network data for the session's current albums, copying the albums and
+    finding their relations if they have changed since it was last made"""
+    albums: AlbumStore = st.session_state.albums
+    data: NetworkData | None = st.session_state.get("network_data")
+    if data is None or data.albums.version != albums.version:
+        copy = albums.copy()
+        data = NetworkData(copy, AlbumRelations(copy))
+        st.session_state.network_data = data
+    return data
+
+
+@dataclass
+class NetworkJob:
+
+    albums_version: int
+    future: Future[NetworkGraph]
+
+
+@dataclass
+class SharedNetworkJobs:
+    """The jobs building the graphs of the shared catalogue, used by every session that
+    has not edited its albums. The lock stops two sessions starting the same job"""
+
+    jobs: dict[str, NetworkJob] = field(default_factory=dict)
+    data: NetworkData | None = None
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+@st.cache_resource(max_entries=1)
+def shared_network_jobs(data_stamp: str) -> SharedNetworkJobs:
+    """one set of jobs for every session, made again when the catalogue is reloaded"""
+    return SharedNetworkJobs()
+
+
+def submit_network_job(
+    session_key: str, data: NetworkData, use_cache: bool
+) -> NetworkJob:
+    """starts building the graph in the layout executor"""
+    future = layout_executor().submit(
+        build_network_graph,
+        NETWORK_GRAPHS[session_key],
+        st.session_state.config,
+        data.albums,
+        data.album_relations,
+        use_cache,
+    )
+    return NetworkJob(data.albums.version, future)
+
+
+def network_job(session_key: str, use_cache: bool = True) -> NetworkJob:
+    """returns the job building the graph for the session's current albums, starting it
+    if it has not been started. While the session's albums are the unedited shared
+    catalogue, which is read only, the graphs are built once for every session.
+    Otherwise the albums are copied, so later edits cannot change them part way through
+    the build, and every kind of graph shares the same copy"""
+    albums: AlbumStore = st.session_state.albums
+    if not albums.edited:
+        shared = shared_network_jobs(st.session_state.data_stamp)
+        with shared.lock:
+            job = shared.jobs.get(session_key)
+            if use_cache and job is not None and job.albums_version == albums.version:
+                return job
+            if shared.data is None or shared.data.albums is not albums.base:
+                shared.data = NetworkData(albums.base, AlbumRelations(albums.base))
+            shared.jobs[session_key] = submit_network_job(
+                session_key, shared.data, use_cache
+            )
+            return shared.jobs[session_key]
+    jobs: dict[str, NetworkJob] = st.session_state.setdefault("network_jobs", {})
+    job = jobs.get(session_key)
+    if use_cache and job is not None and job.albums_version == albums.version:
+        return job
+    jobs[session_key] = submit_network_job(session_key, network_data(), use_cache)
+    return jobs[session_key]
+
+
+def drop_network_job(session_key: str, job: NetworkJob) -> None:
+    """forgets the job, so that the graph is built again the next time it is needed"""
+    jobs: dict[str, NetworkJob] = st.session_state.get("network_jobs", {})
+    if jobs.get(session_key) is job:
+        del jobs[session_key]
+    if "data_stamp" in st.session_state:
+        shared = shared_network_jobs(st.session_state.data_stamp)
+        with shared.lock:
+            if shared.jobs.get(session_key) is job:
+                del shared.jobs[session_key]
+
+
+def start_network_jobs() -> None:
+    """starts building every network graph, so they are ready when the page is opened"""
+    for session_key in NETWORK_GRAPHS:
+        network_job(session_key)
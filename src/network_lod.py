@@ -0,0 +1,183 @@
+from dataclasses import dataclass
+from typing import Any
+import numpy as np
+import plotly.graph_objects as go
+
+# the number of line widths the bundled lines between clusters are drawn with
+BUNDLE_WIDTHS = [1, 2, 4]
+# the number of album titles listed in the hover text of a cluster
+CLUSTER_TITLES = 5
+
+
+@dataclass
+class Viewport:
+    """A rectangle of the network graph, in the coordinates of the layout"""
+
+    x0: float
+    x1: float
+    y0: float
+    y1: float
+
+    @classmethod
+    def from_box(cls, box: dict[str, Any]) -> "Viewport":
+        """creates the viewport from a box selected on a plotly chart"""
+        x0, x1 = sorted(box["x"])
+        y0, y1 = sorted(box["y"])
+        return cls(x0, x1, y0, y1)
+
+    def contains(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """returns a mask of the points inside the viewport"""
+        return (x >= self.x0) & (x <= self.x1) & (y >= self.y0) & (y <= self.y1)
+
+
+def points_in(trace: go.Scattergl, viewport: Viewport) -> np.ndarray:
+    """returns a mask of the points of a trace inside the viewport"""
+    return viewport.contains(
+        np.asarray(trace.x, dtype=np.float64), np.asarray(trace.y, dtype=np.float64)
+    )
+
+
+def visible_points(trace: go.Scattergl, visible: np.ndarray) -> go.Scattergl:
+    """returns a copy of a points trace with only the visible points. marker colours
+    and sizes given for each point are filtered with them"""
+    points = go.Scattergl(trace)
+    n = len(visible)
+    for name in ["x", "y"]:
+        points[name] = np.asarray(points[name], dtype=np.float64)[visible]
+    for name in ["text", "customdata"]:
+        if points[name] is not None and len(points[name]) == n:
+            points[name] = np.asarray(points[name], dtype=object)[visible]
+    for name in ["color", "size", "symbol"]:
+        value = points.marker[name]
+        if value is not None and not isinstance(value, str) and np.ndim(value) == 1:
+            points.marker[name] = np.asarray(value)[visible]
+    return points
+
+
+class ClusterView:
+    """A summary of a network graph too large to draw in full. The nodes are binned into
+    a grid of at most max_nodes cells, and each cell with nodes in it is drawn as one
+    cluster. The lines between nodes in different clusters are bundled into one line
+    for each pair of clusters, drawn wider the more lines it bundles. Only the
+    max_edges bundles with the most lines are drawn"""
+
+    def __init__(
+        self,
+        positions: np.ndarray,
+        edges: np.ndarray,
+        album_nodes: np.ndarray,
+        names: list[str],
+        max_nodes: int,
+        max_edges: int,
+    ) -> None:
+        self.positions = positions
+        self.edges = edges
+        self.album_nodes = album_nodes
+        self.names = names
+        self.max_nodes = max_nodes
+        self.max_edges = max_edges
+        self.clusters, self.cluster_positions = self.grid_clusters()
+
+    def grid_clusters(self) -> tuple[np.ndarray, np.ndarray]:
+        """returns the cluster of each node, and the mean position of each cluster"""
+        cells = max(int(np.sqrt(self.max_nodes)), 1)
+        low = self.positions.min(axis=0)
+        span = np.maximum(self.positions.max(axis=0) - low, 1e-9)
+        cell = np.minimum(
+            ((self.positions - low) / span * cells).astype(np.int64), cells - 1
+        )
+        _, clusters = np.unique(cell[:, 0] * cells + cell[:, 1], return_inverse=True)
+        clusters = clusters.ravel()
+        counts = np.bincount(clusters)
+        cluster_positions = np.column_stack(
+            [
+                np.bincount(clusters, self.positions[:, axis]) / counts
+                for axis in range(2)
+            ]
+        )
+        return clusters, cluster_positions
+
+    def bundles(self) -> tuple[np.ndarray, np.ndarray]:
+        """returns the pairs of clusters with lines between them, and the number of lines
+        between each pair, keeping the max_edges pairs with the most lines"""
+        ends = np.sort(self.clusters[self.edges], axis=1)
+        ends = ends[ends[:, 0] != ends[:, 1]]
+        pairs, counts = np.unique(ends, axis=0, return_counts=True)
+        keep = np.argsort(-counts, kind="stable")[: self.max_edges]
+        return pairs.reshape(-1, 2)[keep], counts[keep]
+
+    def line_traces(self, colour: str) -> list[go.Scattergl]:
+        """returns a trace for each line width, drawing the bundles"""
+        pairs, counts = self.bundles()
+        if not len(counts):
+            return []
+        # the widths split the bundles into equal parts by the number of lines
+        thresholds = np.quantile(
+            counts, np.linspace(0, 1, len(BUNDLE_WIDTHS) + 1)[1:-1]
+        )
+        widths = np.searchsorted(thresholds, counts, side="right")
+        traces = []
+        for i, width in enumerate(BUNDLE_WIDTHS):
+            selected = pairs[widths == i]
+            if not len(selected):
+                continue
+            coordinates = np.full((len(selected), 3, 2), np.nan)
+            coordinates[:, :2] = self.cluster_positions[selected]
+            traces.append(
+                go.Scattergl(
+                    x=coordinates[:, :, 0].ravel(),
+                    y=coordinates[:, :, 1].ravel(),
+                    line=dict(width=width, color=colour),
+                    hoverinfo="none",
+                    showlegend=False,
+                    mode="lines",
+                )
+            )
+        return traces
+
+    def cluster_text(self) -> list[str]:
+        """returns the hover text of each cluster"""
+        albums = np.bincount(
+            self.clusters, self.album_nodes, len(self.cluster_positions)
+        )
+        others = np.bincount(
+            self.clusters, ~self.album_nodes, len(self.cluster_positions)
+        )
+        titles: list[list[str]] = [[] for _ in range(len(self.cluster_positions))]
+        for node in np.flatnonzero(self.album_nodes).tolist():
+            cluster_titles = titles[self.clusters[node]]
+            if len(cluster_titles) < CLUSTER_TITLES:
+                cluster_titles.append(self.names[node])
+        return [
+            f"{int(n_albums)} albums, {int(n_others)} other nodes<br>"
+            + "<br>".join(cluster_titles)
+            for n_albums, n_others, cluster_titles in zip(albums, others, titles)
+        ]
+
+    def points_trace(self, symbol: str, min_size: int) -> go.Scattergl:
+        """returns a trace of the clusters, sized by the number of nodes in them and
+        coloured by the number of albums"""
+        counts = np.bincount(self.clusters)
+        albums = np.bincount(self.clusters, self.album_nodes, len(counts))
+        return go.Scattergl(
+            x=self.cluster_positions[:, 0],
+            y=self.cluster_positions[:, 1],
+            text=self.cluster_text(),
+            mode="markers",
+            hoverinfo="text",
+            showlegend=False,
+            marker=dict(
+                symbol=symbol,
+                size=min_size + 2 * np.sqrt(counts),
+                color=albums,
+                colorscale="Viridis",
+                showscale=True,
+                colorbar=dict(
+                    thickness=10,
+                    title="Albums",
+                    xanchor="left",
+                    titleside="right",
+                ),
+                line=dict(width=0),
+            ),
+        )
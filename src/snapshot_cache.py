@@ -0,0 +1,201 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+import shutil
+import tempfile
+from typing import Any, Iterable
+import uuid
+import numpy as np
+from cfg.cfg import Config
+from src.album_store import (
+    LIST_COLUMNS,
+    SCALAR_COLUMNS,
+    TEXT_COLUMNS,
+    AlbumStore,
+    ListColumn,
+)
+from src.symbol_table import SymbolTable
+
+CACHE_FORMAT = 2
+META_FILE = "meta.json"
+STRINGS_FILE = "strings.txt"
+SYMBOLS_FILE = "symbols.txt"
+# each string in the table is followed by a separator that cannot appear in album data
+STRING_SEPARATOR = "\0"
+
+
+def file_hash(path: Path) -> str:
+    """returns the sha256 hash of the contents of a file"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# the files are opened with newline="", so that a carriage return in the album data is
+# not turned into a newline
+
+
+def read_strings(path: Path) -> list[str]:
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        return f.read().split(STRING_SEPARATOR)[:-1]
+
+
+def write_strings(path: Path, strings: Iterable[str]) -> None:
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write("".join(s + STRING_SEPARATOR for s in strings))
+
+
+def file_stamp(path: Path) -> dict[str, int]:
+    stat = path.stat()
+    return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+
+class SnapshotCache:
+    """A binary copy of the album json files, stored as a directory of .npy files and a
+    string table, with the genre and personnel symbol table alongside. Numeric columns
+    and list codes are memory mapped when loaded, and strings are held once in the table
+    and referenced by id.
+    The cache is fresh if the json files have the same modification time as when it was
+    written, or if they have been touched but their contents hash is unchanged.
+    Every write makes a new bundle directory, named by the hash of the data and a unique
+    suffix, so that a bundle is never overwritten while another session has it mapped"""
+
+    def __init__(self, cfg: Config) -> None:
+        self.sources = [
+            Path(cfg.data.album_data_json_path),
+            Path(cfg.data.personal_data_json_path),
+        ]
+        self.path = Path(cfg.data.album_data_json_path).with_suffix(".cache")
+
+    def _read_meta(self) -> dict[str, Any] | None:
+        try:
+            with open(self.path / META_FILE, "r") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def source_stamps(self) -> dict[str, dict[str, Any]]:
+        """returns the modification time, size and hash of each json file. This should be
+        called before the files are read, so a change while reading makes the cache stale
+        """
+        return {
+            str(source): {**file_stamp(source), "sha256": file_hash(source)}
+            for source in self.sources
+        }
+
+    def bundle(self) -> Path | None:
+        """returns the bundle directory of the cache if it is fresh, None otherwise"""
+        meta = self._read_meta()
+        if meta is None or meta.get("format") != CACHE_FORMAT:
+            return None
+        sources: dict[str, dict[str, Any]] = meta["sources"]
+        if any(str(source) not in sources for source in self.sources):
+            return None
+        touched = False
+        for source in self.sources:
+            saved = sources[str(source)]
+            if not source.exists():
+                return None
+            stamp = file_stamp(source)
+            if stamp == {k: saved[k] for k in stamp}:
+                continue
+            if file_hash(source) != saved["sha256"]:
+                return None
+            saved.update(stamp)
+            touched = True
+        if touched:
+            # the contents are unchanged, so record the new times to skip hashing next time
+            self._write_meta(meta["bundle"], sources)
+        return self.path / meta["bundle"]
+
+    def load(self) -> AlbumStore | None:
+        """returns the cached albums, or None if the cache is missing or out of date"""
+        bundle = self.bundle()
+        if bundle is None:
+            return None
+        table = read_strings(bundle / STRINGS_FILE)
+        # id -1 picks up the None at the end of the table
+        strings = np.empty(len(table) + 1, dtype=object)
+        strings[: len(table)] = table
+        strings[-1] = None
+
+        columns: dict[str, Any] = {}
+        for name in SCALAR_COLUMNS:
+            # copy on write, so edits to the store never reach the cache files
+            columns[name] = np.load(bundle / f"{name}.npy", mmap_mode="c")
+        for name in TEXT_COLUMNS:
+            columns[name] = strings[np.load(bundle / f"{name}.npy")]
+        symbols = SymbolTable(read_strings(bundle / SYMBOLS_FILE))
+        for name in LIST_COLUMNS:
+            columns[name] = ListColumn(
+                np.load(bundle / f"{name}.codes.npy", mmap_mode="c"),
+                np.load(bundle / f"{name}.offsets.npy", mmap_mode="c"),
+                symbols,
+            )
+        return AlbumStore(columns)
+
+    def write(self, albums: AlbumStore, sources: dict[str, dict[str, Any]]) -> None:
+        """writes the albums to a new bundle, recording the json files they were read from"""
+        data_hash = hashlib.sha256(
+            "".join(sources[str(source)]["sha256"] for source in self.sources).encode()
+        ).hexdigest()[:16]
+        bundle_name = f"{data_hash}-{uuid.uuid4().hex[:8]}"
+        bundle = self.path / bundle_name
+        # a partly written bundle is never used, as the metadata is written last
+        bundle.mkdir(parents=True)
+
+        string_ids: dict[str, int] = {}
+
+        def encode(values: np.ndarray) -> np.ndarray:
+            return np.fromiter(
+                (
+                    (
+                        string_ids.setdefault(v, len(string_ids))
+                        if isinstance(v, str)
+                        else -1
+                    )
+                    for v in values
+                ),
+                dtype=np.int32,
+                count=len(values),
+            )
+
+        for name in SCALAR_COLUMNS:
+            np.save(bundle / f"{name}.npy", np.asarray(albums.columns[name]))
+        for name in TEXT_COLUMNS:
+            np.save(bundle / f"{name}.npy", encode(albums.columns[name]))
+        symbols: SymbolTable = albums.columns[LIST_COLUMNS[0]].symbols
+        for name in LIST_COLUMNS:
+            column: ListColumn = albums.columns[name]
+            codes = (
+                column.codes
+                if column.symbols is symbols
+                else symbols.encode(column.values)
+            )
+            np.save(bundle / f"{name}.codes.npy", codes)
+            np.save(bundle / f"{name}.offsets.npy", column.offsets)
+        write_strings(bundle / STRINGS_FILE, string_ids)
+        write_strings(bundle / SYMBOLS_FILE, symbols.names)
+
+        self._write_meta(bundle_name, sources)
+        for old_bundle in self.path.iterdir():
+            if old_bundle.is_dir() and old_bundle.name != bundle_name:
+                # fails if another session still has the old bundle mapped
+                shutil.rmtree(old_bundle, ignore_errors=True)
+
+    def _write_meta(self, bundle: str, sources: dict[str, dict[str, Any]]) -> None:
+        # the cache can be written by several sessions at once, so each write has its
+        # own temporary file
+        fd, tmp_name = tempfile.mkstemp(dir=self.path, prefix=f".{META_FILE}-")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(
+                    {"format": CACHE_FORMAT, "bundle": bundle, "sources": sources}, f
+                )
+            os.replace(tmp_name, self.path / META_FILE)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
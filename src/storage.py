@@ -0,0 +1,526 @@
+from contextlib import contextmanager
+import json
+from enum import StrEnum
+from pathlib import Path
+import sqlite3
+from typing import Iterator
+import numpy as np
+import pandas as pd
+from cfg.cfg import Config
+from src.album import Album
+from src.album_journal import AlbumJournal
+from src.album_store import LIST_COLUMNS, AlbumStore
+from src.snapshot_cache import SnapshotCache, file_hash, file_stamp
+import cfg.schema as sch
+
+
+def read_json_albums(cfg: Config) -> AlbumStore:
+    """reads the albums from the album and personal data json files"""
+    albums = pd.read_json(Path(cfg.data.album_data_json_path), orient="records")
+    personal = pd.read_json(Path(cfg.data.personal_data_json_path), orient="records")
+    albums[sch.Album.total_time_s] = albums[sch.Album.total_time_s].fillna(0)
+
+    data = albums.merge(personal, on=sch.Album.key)
+    return AlbumStore.from_frame(data)
+
+
+def load_catalogue(cfg: Config) -> AlbumStore:
+    """loads the albums from the snapshot cache if it is up to date, or the json files if
+    not, without the edits in the journal. The journal generation is read first, so the
+    albums are never given a newer generation than their keys"""
+    generation = AlbumJournal(cfg).generation
+    cache = SnapshotCache(cfg)
+    albums = cache.load()
+    if albums is None:
+        sources = cache.source_stamps()
+        albums = read_json_albums(cfg)
+        cache.write(albums, sources)
+    albums.generation = generation
+    return albums
+
+
+def load_albums(cfg: Config) -> AlbumStore:
+    """loads the albums, then applies any edits from the journal"""
+    albums = load_catalogue(cfg)
+    AlbumJournal(cfg).replay(albums)
+    return albums
+
+
+def files_stamp(paths: list[Path]) -> str:
+    """returns a string that changes whenever any of the files change"""
+    stamps = []
+    for path in paths:
+        stamp = file_stamp(path) if path.exists() else {}
+        stamps.append(f"{path}:{stamp.get('mtime_ns')}:{stamp.get('size')}")
+    return "|".join(stamps)
+
+
+class StorageType(StrEnum):
+
+    JSON = "json"
+    SQLITE = "sqlite"
+
+
+class StorageBackend:
+    """A parent class for the places the albums can be saved.
+    The query methods work on the in memory albums, and can be overridden by backends
+    that are able to run them closer to the data"""
+
+    def __init__(self, cfg: Config) -> None:
+        self.cfg = cfg
+
+    def load_albums(self) -> AlbumStore:
+        raise NotImplementedError("This must be impleneted in the child class")
+
+    def save_album(self, album: Album, albums: AlbumStore) -> None:
+        """saves the changes made to a single album"""
+        raise NotImplementedError("This must be impleneted in the child class")
+
+    def save_all(self, albums: AlbumStore) -> None:
+        """saves every album, used when the album keys have changed"""
+        raise NotImplementedError("This must be impleneted in the child class")
+
+    def move_album(self, albums: AlbumStore, key: int, new_key: int) -> None:
+        """moves the album at key to new_key, and saves every album"""
+        albums.move(key, new_key)
+        self.save_all(albums)
+
+    def load_catalogue(self) -> AlbumStore:
+        """loads the albums that can be shared by every session, without the edits that
+        apply_edits adds to each session's overlay"""
+        return self.load_albums()
+
+    def apply_edits(self, albums: AlbumStore) -> None:
+        """applies the edits that are not in the catalogue to a session's albums"""
+
+    def rebuild(self) -> None:
+        """remakes anything the backend derives from the json files, once they have
+        been written by an import"""
+
+    @property
+    def data_files(self) -> list[Path]:
+        """the files that the catalogue is loaded from"""
+        raise NotImplementedError("This must be impleneted in the child class")
+
+    @property
+    def edit_files(self) -> list[Path]:
+        """the files that apply_edits reads the edits from"""
+        return []
+
+    def data_stamp(self) -> str:
+        """returns a string that changes whenever any of the data files change"""
+        return files_stamp(self.data_files)
+
+    def edits_stamp(self) -> str:
+        """returns a string that changes whenever any of the edit files change"""
+        return files_stamp(self.edit_files)
+
+    def genre_counts_by_year(self, albums: AlbumStore) -> pd.DataFrame:
+        """returns a dataframe of the form {Year, Genre, Count}"""
+        df = pd.DataFrame(
+            {
+                "Year": albums.release_date[albums.genres.rows],
+                "Genre": albums.genres.values,
+                "Count": 1,
+            }
+        )
+        return df.groupby(["Year", "Genre"]).sum().reset_index()
+
+    def listened_status_by_year(self, albums: AlbumStore) -> pd.DataFrame:
+        """returns a dataframe of the form {Year, Status, Albums}"""
+        status = np.select(
+            [albums.listened, albums.previous_listened],
+            ["Listened", "Previously Heard"],
+            default="Unlistened",
+        )
+        df = pd.DataFrame({"Year": albums.release_date, "Status": status, "Albums": 1})
+        return df.groupby(["Year", "Status"]).sum().reset_index()
+
+    def artist_status_counts(self, albums: AlbumStore) -> pd.DataFrame:
+        """returns a dataframe of the form {Artist, Status, Albums}. Status is one of
+        "Listened", "Unlistened" """
+        df = pd.DataFrame(
+            {
+                "Artist": albums.artist,
+                "Status": np.where(albums.listened, "Listened", "Unlistened"),
+                "Albums": 1,
+            }
+        )
+        return df.groupby(["Artist", "Status"]).sum().reset_index()
+
+
+class JsonStorage(StorageBackend):
+    """Stores the albums in the album and personal data json files, with edits
+    appended to a journal"""
+
+    def __init__(self, cfg: Config) -> None:
+        super().__init__(cfg)
+        self.journal = AlbumJournal(cfg)
+
+    def load_albums(self) -> AlbumStore:
+        return load_albums(self.cfg)
+
+    def save_album(self, album: Album, albums: AlbumStore) -> None:
+        self.journal.record(album, albums.generation, load_catalogue)
+        if self.journal.entries >= self.cfg.data.journal_compaction_threshold:
+            self.journal.fold(load_catalogue)
+
+    def save_all(self, albums: AlbumStore) -> None:
+        self.journal.compact(albums)
+
+    def move_album(self, albums: AlbumStore, key: int, new_key: int) -> None:
+        """moves the album in the saved albums, with the edits of every session, rather
+        than writing this session's albums over them"""
+        generation = self.journal.move(
+            albums[key], new_key, albums.generation, load_catalogue
+        )
+        up_to_date = generation == albums.generation + 1
+        albums.move(key, new_key)
+        if up_to_date:
+            albums.generation = generation
+
+    def load_catalogue(self) -> AlbumStore:
+        return load_catalogue(self.cfg)
+
+    def apply_edits(self, albums: AlbumStore) -> None:
+        self.journal.replay(albums)
+
+    @property
+    def data_files(self) -> list[Path]:
+        return [
+            Path(self.cfg.data.album_data_json_path),
+            Path(self.cfg.data.personal_data_json_path),
+        ]
+
+    @property
+    def edit_files(self) -> list[Path]:
+        return [self.journal.path]
+
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS albums (
+    key INTEGER PRIMARY KEY,
+    album_title TEXT NOT NULL,
+    artist TEXT NOT NULL,
+    release_date INTEGER,
+    total_time_s INTEGER,
+    tracks INTEGER
+);
+CREATE TABLE IF NOT EXISTS personal (
+    key INTEGER PRIMARY KEY REFERENCES albums(key),
+    listened INTEGER NOT NULL,
+    previous_listened INTEGER NOT NULL,
+    comments TEXT,
+    listen_again TEXT
+);
+CREATE TABLE IF NOT EXISTS people (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS album_people (
+    album_key INTEGER NOT NULL REFERENCES albums(key),
+    person_id INTEGER NOT NULL REFERENCES people(id),
+    role TEXT NOT NULL,
+    position INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS edits (
+    key INTEGER PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS genres (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS album_genres (
+    album_key INTEGER NOT NULL REFERENCES albums(key),
+    genre_id INTEGER NOT NULL REFERENCES genres(id),
+    position INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_albums_release_date ON albums(release_date);
+CREATE INDEX IF NOT EXISTS idx_albums_artist ON albums(artist);
+CREATE INDEX IF NOT EXISTS idx_album_people_album ON album_people(album_key);
+CREATE INDEX IF NOT EXISTS idx_album_people_person ON album_people(person_id);
+CREATE INDEX IF NOT EXISTS idx_album_genres_album ON album_genres(album_key);
+"""
+
+PERSONNEL_COLUMNS: list[str] = [
+    name for name in LIST_COLUMNS if name != sch.Album.genres
+]
+
+
+class SqliteStorage(StorageBackend):
+    """Stores the albums in normalised sqlite tables. The database is made from the json
+    files when it does not exist, and again by rebuild after an Excel import. The hash
+    of each json file it was made from is kept in the meta table, so it is also made
+    again if their contents change, but not when they are only touched.
+    Every time the albums are all written the generation in the meta table goes up, so
+    the shared catalogue is only loaded again then. The keys of the albums saved one at
+    a time since are kept in the edits table, and only those rows are read again to
+    apply them to each session"""
+
+    def __init__(self, cfg: Config) -> None:
+        super().__init__(cfg)
+        self.path = (
+            Path(cfg.data.sqlite_path)
+            if cfg.data.sqlite_path
+            else Path(cfg.data.album_data_json_path).with_suffix(".sqlite")
+        )
+        self.json_files = [
+            Path(cfg.data.album_data_json_path),
+            Path(cfg.data.personal_data_json_path),
+        ]
+        self._schema_created = False
+
+    @property
+    def data_files(self) -> list[Path]:
+        return self.json_files
+
+    @property
+    def edit_files(self) -> list[Path]:
+        return [self.path]
+
+    def data_stamp(self) -> str:
+        return f"{super().data_stamp()}|generation:{self.generation()}"
+
+    def generation(self) -> int:
+        """returns the number of times every album has been written"""
+        if not self.path.exists():
+            return 0
+        with self.connect() as conn:
+            row = conn.execute(
+                "SELECT value FROM meta WHERE name = 'generation'"
+            ).fetchone()
+        return int(row[0]) if row else 0
+
+    @contextmanager
+    def connect(self) -> Iterator[sqlite3.Connection]:
+        """opens a connection and commits on exit. A new connection is used each time,
+        as streamlit reruns can happen on different threads. The tables are created
+        the first time the backend connects"""
+        conn = sqlite3.connect(self.path)
+        try:
+            with conn:
+                if not self._schema_created:
+                    conn.executescript(SQLITE_SCHEMA)
+                    self._schema_created = True
+                yield conn
+        finally:
+            conn.close()
+
+    def source_stamps(self) -> dict[str, dict[str, int | str]]:
+        """returns the modification time, size and hash of each json file"""
+        return {
+            str(path): {**file_stamp(path), "sha256": file_hash(path)}
+            for path in self.json_files
+            if path.exists()
+        }
+
+    def outdated(self) -> bool:
+        """returns true if the database has not been made, or the contents of any of the
+        json files have changed since it was. the files are only hashed if their
+        modification time or size has changed, and the new times are saved if the
+        contents have not"""
+        if not self.path.exists():
+            return True
+        with self.connect() as conn:
+            row = conn.execute(
+                "SELECT value FROM meta WHERE name = 'sources'"
+            ).fetchone()
+        if row is None:
+            return True
+        saved = json.loads(row[0])
+        current: dict[str, dict[str, int | str]] = {}
+        for path in self.json_files:
+            if not path.exists():
+                continue
+            stamp = saved.get(str(path), {})
+            current[str(path)] = {**file_stamp(path), "sha256": stamp.get("sha256")}
+            if current[str(path)] != stamp:
+                current[str(path)]["sha256"] = file_hash(path)
+                if current[str(path)]["sha256"] != stamp.get("sha256"):
+                    return True
+        if current != saved:
+            with self.connect() as conn:
+                self._write_sources(conn, current)
+        return False
+
+    def _write_sources(
+        self, conn: sqlite3.Connection, sources: dict[str, dict[str, int | str]]
+    ) -> None:
+        conn.execute(
+            "INSERT OR REPLACE INTO meta (name, value) VALUES ('sources', ?)",
+            (json.dumps(sources),),
+        )
+
+    def rebuild(self) -> None:
+        """makes the database again from the json files and the journal. The files are
+        stamped before they are read, so a change while reading makes it outdated"""
+        sources = self.source_stamps()
+        albums = load_albums(self.cfg)
+        with self.connect() as conn:
+            self._write_all(conn, albums)
+            self._write_sources(conn, sources)
+
+    def _read_albums(
+        self, conn: sqlite3.Connection, keys: list[int] | None = None
+    ) -> pd.DataFrame:
+        """reads the albums with the given keys, or every album if keys is None"""
+        params = [] if keys is None else keys
+        placeholders = ", ".join("?" * len(params))
+        where = "" if keys is None else f"WHERE key IN ({placeholders})"
+        data = pd.read_sql_query(
+            f"SELECT * FROM albums JOIN personal USING (key) {where} ORDER BY key",
+            conn,
+            params=params,
+        )
+        where = "" if keys is None else f"WHERE album_key IN ({placeholders})"
+        lists: dict[str, dict[int, list[str]]] = {name: {} for name in LIST_COLUMNS}
+        people = conn.execute(
+            "SELECT album_key, role, name FROM album_people "
+            f"JOIN people ON people.id = album_people.person_id {where} "
+            "ORDER BY album_key, role, position",
+            params,
+        )
+        for album_key, role, name in people:
+            lists[role].setdefault(album_key, []).append(name)
+        genres = conn.execute(
+            "SELECT album_key, name FROM album_genres "
+            f"JOIN genres ON genres.id = album_genres.genre_id {where} "
+            "ORDER BY album_key, position",
+            params,
+        )
+        for album_key, name in genres:
+            lists[sch.Album.genres].setdefault(album_key, []).append(name)
+        for name in LIST_COLUMNS:
+            data[name] = [lists[name].get(key, []) for key in data[sch.Album.key]]
+        return data
+
+    def load_albums(self) -> AlbumStore:
+        if self.outdated():
+            self.rebuild()
+        with self.connect() as conn:
+            return AlbumStore.from_frame(self._read_albums(conn))
+
+    def apply_edits(self, albums: AlbumStore) -> None:
+        """reads the albums saved since every album was last written, and copies them
+        into the session's albums"""
+        with self.connect() as conn:
+            keys = [key for (key,) in conn.execute("SELECT key FROM edits")]
+            if not keys:
+                return
+            edited = AlbumStore.from_frame(self._read_albums(conn, keys))
+        for album in edited:
+            albums.update_row(album.key, album.field_values())
+
+    def _write_album(self, conn: sqlite3.Connection, album: Album) -> None:
+        """replaces all of the rows for a single album"""
+        details = album.album_details()
+        conn.execute(
+            "INSERT OR REPLACE INTO albums "
+            "(key, album_title, artist, release_date, total_time_s, tracks) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                album.key,
+                album.album_title,
+                album.artist,
+                album.release_date,
+                album.total_time_s,
+                details[sch.Album.tracks],
+            ),
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO personal "
+            "(key, listened, previous_listened, comments, listen_again) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (
+                album.key,
+                album.listened,
+                album.previous_listened,
+                album.comments if isinstance(album.comments, str) else None,
+                album.listen_again if isinstance(album.listen_again, str) else None,
+            ),
+        )
+        conn.execute("DELETE FROM album_people WHERE album_key = ?", (album.key,))
+        for role in PERSONNEL_COLUMNS:
+            for position, name in enumerate(details[role]):  # type: ignore
+                conn.execute("INSERT OR IGNORE INTO people (name) VALUES (?)", (name,))
+                conn.execute(
+                    "INSERT INTO album_people (album_key, person_id, role, position) "
+                    "SELECT ?, id, ?, ? FROM people WHERE name = ?",
+                    (album.key, role, position, name),
+                )
+        conn.execute("DELETE FROM album_genres WHERE album_key = ?", (album.key,))
+        for position, name in enumerate(album.genres):
+            conn.execute("INSERT OR IGNORE INTO genres (name) VALUES (?)", (name,))
+            conn.execute(
+                "INSERT INTO album_genres (album_key, genre_id, position) "
+                "SELECT ?, id, ? FROM genres WHERE name = ?",
+                (album.key, position, name),
+            )
+
+    def save_album(self, album: Album, albums: AlbumStore) -> None:
+        with self.connect() as conn:
+            self._write_album(conn, album)
+            conn.execute("INSERT OR IGNORE INTO edits (key) VALUES (?)", (album.key,))
+
+    def _write_all(self, conn: sqlite3.Connection, albums: AlbumStore) -> None:
+        """replaces every album, and starts a new generation"""
+        for table in ["album_people", "album_genres", "personal", "albums", "edits"]:
+            conn.execute(f"DELETE FROM {table}")
+        for album in albums:
+            self._write_album(conn, album)
+        conn.execute(
+            "INSERT INTO meta (name, value) VALUES ('generation', '1') "
+            "ON CONFLICT (name) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+        )
+
+    def save_all(self, albums: AlbumStore) -> None:
+        with self.connect() as conn:
+            self._write_all(conn, albums)
+
+    def genre_counts_by_year(self, albums: AlbumStore) -> pd.DataFrame:
+        with self.connect() as conn:
+            return pd.read_sql_query(
+                "SELECT release_date AS Year, genres.name AS Genre, COUNT(*) AS Count "
+                "FROM album_genres "
+                "JOIN albums ON albums.key = album_genres.album_key "
+                "JOIN genres ON genres.id = album_genres.genre_id "
+                "GROUP BY Year, Genre ORDER BY Year, Genre",
+                conn,
+            )
+
+    def listened_status_by_year(self, albums: AlbumStore) -> pd.DataFrame:
+        with self.connect() as conn:
+            return pd.read_sql_query(
+                "SELECT release_date AS Year, "
+                "CASE WHEN listened THEN 'Listened' "
+                "WHEN previous_listened THEN 'Previously Heard' "
+                "ELSE 'Unlistened' END AS Status, "
+                "COUNT(*) AS Albums "
+                "FROM albums JOIN personal USING (key) "
+                "GROUP BY Year, Status ORDER BY Year, Status",
+                conn,
+            )
+
+    def artist_status_counts(self, albums: AlbumStore) -> pd.DataFrame:
+        with self.connect() as conn:
+            return pd.read_sql_query(
+                "SELECT artist AS Artist, "
+                "CASE WHEN listened THEN 'Listened' ELSE 'Unlistened' END AS Status, "
+                "COUNT(*) AS Albums "
+                "FROM albums JOIN personal USING (key) "
+                "GROUP BY Artist, Status ORDER BY Artist, Status",
+                conn,
+            )
+
+
+def get_storage(cfg: Config) -> StorageBackend:
+    """returns the storage backend selected in the config"""
+    backends: dict[str, type[StorageBackend]] = {
+        StorageType.JSON: JsonStorage,
+        StorageType.SQLITE: SqliteStorage,
+    }
+    return backends[cfg.data.storage_backend](cfg)
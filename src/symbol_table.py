@@ -0,0 +1,49 @@
+import sys
+import threading
+from typing import Iterable
+import numpy as np
+
+
+class SymbolTable:
+    """Interns names, so that each name is stored once and referred to by an integer id.
+    Ids never change once given out, so a table can be shared and added to by several
+    stores at once"""
+
+    def __init__(self, names: Iterable[str] = ()) -> None:
+        self._lock = threading.Lock()
+        self.names: list[str] = []
+        self.ids: dict[str, int] = {}
+        self._array = np.empty(0, dtype=object)
+        for name in names:
+            self.intern(name)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def intern(self, name: str) -> int:
+        """returns the id of the name, adding it to the table if it is new"""
+        symbol_id = self.ids.get(name)
+        if symbol_id is not None:
+            return symbol_id
+        with self._lock:
+            symbol_id = self.ids.get(name)
+            if symbol_id is None:
+                symbol_id = len(self.names)
+                self.names.append(sys.intern(name))
+                self.ids[name] = symbol_id
+        return symbol_id
+
+    def encode(self, names: Iterable[str]) -> np.ndarray:
+        return np.fromiter((self.intern(name) for name in names), dtype=np.int32)
+
+    @property
+    def array(self) -> np.ndarray:
+        """the names as an object array, so that ids can be decoded with numpy indexing"""
+        if len(self._array) != len(self.names):
+            array = np.empty(len(self.names), dtype=object)
+            array[:] = self.names
+            self._array = array
+        return self._array
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return self.array[codes]
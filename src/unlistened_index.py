@@ -0,0 +1,57 @@
+import heapq
+from typing import Iterable
+
+
+class UnlistenedIndex:
+    """A min-heap of the keys of unlistened albums.
+    Albums that are marked as listened are removed lazily: their key stays in the heap
+    until it reaches the top, where it is discarded because it is no longer a member"""
+
+    def __init__(self, keys: Iterable[int]) -> None:
+        self._members: set[int] = set(keys)
+        self._heap: list[int] = list(self._members)
+        heapq.heapify(self._heap)
+
+    def __len__(self) -> int:
+        return len(self._members)
+
+    def __contains__(self, key: int) -> bool:
+        return key in self._members
+
+    def mark_listened(self, key: int) -> None:
+        self._members.discard(key)
+
+    def mark_unlistened(self, key: int) -> None:
+        if key in self._members:
+            return
+        self._members.add(key)
+        heapq.heappush(self._heap, key)
+
+    def update(self, key: int, listened: bool) -> None:
+        if listened:
+            self.mark_listened(key)
+        else:
+            self.mark_unlistened(key)
+
+    def _discard_stale(self) -> None:
+        """removes keys from the top of the heap that are no longer unlistened"""
+        while self._heap and self._heap[0] not in self._members:
+            heapq.heappop(self._heap)
+
+    def peek(self) -> int | None:
+        """returns the lowest unlistened key, or None if every album has been listened to"""
+        self._discard_stale()
+        if not self._heap:
+            return None
+        return self._heap[0]
+
+    def smallest(self, n: int) -> list[int]:
+        """returns the n lowest unlistened keys, in order"""
+        keys: list[int] = []
+        while self._heap and len(keys) < n:
+            key = heapq.heappop(self._heap)
+            if key in self._members and (not keys or keys[-1] != key):
+                keys.append(key)
+        for key in keys:
+            heapq.heappush(self._heap, key)
+        return keys
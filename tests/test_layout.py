@@ -0,0 +1,29 @@
+import networkx as nx
+import numpy as np
+from cfg.cfg import NetworkGraphSettings
+from src.layout import GridLayout
+
+
+def laid_out_graph() -> tuple[GridLayout, nx.Graph, dict[str, np.ndarray]]:
+    engine = GridLayout(NetworkGraphSettings())
+    graph = nx.path_graph([f"album {i}" for i in range(10)])
+    return engine, graph, engine.layout(graph)
+
+
+def test_update_without_changes_keeps_positions() -> None:
+    engine, graph, pos = laid_out_graph()
+    updated = engine.update(graph, pos, set())
+    assert updated.keys() == pos.keys()
+    for node in graph.nodes:
+        np.testing.assert_array_equal(updated[node], pos[node])
+    assert engine.converged
+
+
+def test_update_only_moves_changed_nodes() -> None:
+    engine, graph, pos = laid_out_graph()
+    graph.add_edge("album 9", "album 10")
+    updated = engine.update(graph, pos, {"album 10"})
+    assert np.isfinite(updated["album 10"]).all()
+    # only the new node and its neighbour can move
+    for node in [f"album {i}" for i in range(9)]:
+        np.testing.assert_allclose(updated[node], pos[node])
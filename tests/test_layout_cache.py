@@ -0,0 +1,49 @@
+from pathlib import Path
+import networkx as nx
+import numpy as np
+import pytest
+from cfg.cfg import Config, Data, NetworkGraphSettings
+from src.layout_cache import LayoutCache
+
+PARAMETERS = {"engine": "grid"}
+
+
+@pytest.fixture
+def cache(tmp_path: Path) -> LayoutCache:
+    return LayoutCache(
+        Config(
+            data=Data(
+                album_data_csv_name="albums",
+                album_data_json_path=str(tmp_path / "albums.json"),
+                csv_save_dir=str(tmp_path),
+                personal_data_csv_name="personal",
+                personal_data_json_path=str(tmp_path / "personal.json"),
+                raw_excel_path=str(tmp_path / "albums.xlsx"),
+                sheet_name="Sheet1",
+            ),
+            network_graph=NetworkGraphSettings(),
+        )
+    )
+
+
+def save_path_graph(cache: LayoutCache) -> nx.Graph:
+    graph = nx.path_graph(["Blue", "Hejira"])
+    cache.save("Graph", graph, PARAMETERS, {"Blue": np.zeros(2), "Hejira": np.ones(2)})
+    return graph
+
+
+def test_load_does_not_remake_pruned_layouts(cache: LayoutCache) -> None:
+    graph = save_path_graph(cache)
+    cache.layout_path("Graph", graph, PARAMETERS).write_bytes(b"")
+    assert cache.load("Graph", graph, PARAMETERS) is None
+    assert cache.latest("Graph", PARAMETERS) is None
+
+    cache.layout_path("Graph", graph, PARAMETERS).unlink()
+    assert cache.load("Graph", graph, PARAMETERS) is None
+    assert not cache.layout_path("Graph", graph, PARAMETERS).exists()
+
+
+def test_latest_only_matches_parameters(cache: LayoutCache) -> None:
+    save_path_graph(cache)
+    assert cache.latest("Graph", PARAMETERS) is not None
+    assert cache.latest("Graph", {"engine": "spring"}) is None
@@ -0,0 +1,22 @@
+import numpy as np
+from scipy import sparse
+from src.network_analytics import NetworkAnalytics
+
+
+def test_album_steps_through_groups() -> None:
+    # Blue and Hejira share a group, Hejira and Harvest share another
+    incidence = sparse.csr_matrix(np.array([[1, 0], [1, 1], [0, 1]]))
+    analytics = NetworkAnalytics.from_incidence(
+        ["Blue", "Hejira", "Harvest"], ["Joni Mitchell", "Neil Young"], incidence
+    )
+    path = analytics.album_path("Blue", "Harvest")
+    assert path == ["Blue", "Joni Mitchell", "Hejira", "Neil Young", "Harvest"]
+    assert analytics.album_steps(path) == 2
+
+
+def test_album_steps_between_albums() -> None:
+    adjacency = sparse.csr_matrix(np.array([[0, 1, 0], [1, 0, 1], [0, 1, 0]]))
+    analytics = NetworkAnalytics(["Blue", "Hejira", "Harvest"], 3, adjacency)
+    path = analytics.album_path("Blue", "Harvest")
+    assert path == ["Blue", "Hejira", "Harvest"]
+    assert analytics.album_steps(path) == 2
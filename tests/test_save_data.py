@@ -0,0 +1,250 @@
+import os
+from pathlib import Path
+import openpyxl
+import pandas as pd
+import pytest
+from cfg.cfg import Config, Data, NetworkGraphSettings
+import cfg.schema as sch
+from src.album_store import AlbumStore
+from src.storage import get_storage
+from utils.save_data import (
+    EXCEL_COLUMNS,
+    OutputFormat,
+    diff_albums,
+    ingest_excel,
+    sync_excel,
+)
+
+SHEET = [
+    ["✓", "Blue", "Joni Mitchell", 1971, 2150, "Lovely", None],
+    [None, "Harvest", "Neil Young", 1972, 2265, None, None],
+    [None, "Pink Moon", "Nick Drake", 1972, 1701, None, None],
+]
+
+
+def write_sheet(cfg: Config, rows: list[list]) -> None:
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = cfg.data.sheet_name
+    sheet.append([str(name) for name in EXCEL_COLUMNS])
+    for row in rows:
+        sheet.append(row)
+    workbook.save(cfg.data.raw_excel_path)
+
+
+@pytest.fixture
+def cfg(tmp_path: Path) -> Config:
+    cfg = Config(
+        data=Data(
+            album_data_csv_name="albums",
+            album_data_json_path=str(tmp_path / "albums.json"),
+            csv_save_dir=str(tmp_path),
+            personal_data_csv_name="personal",
+            personal_data_json_path=str(tmp_path / "personal.json"),
+            raw_excel_path=str(tmp_path / "albums.xlsx"),
+            sheet_name="Sheet1",
+        ),
+        network_graph=NetworkGraphSettings(),
+    )
+    write_sheet(cfg, SHEET)
+    ingest_excel(cfg, [OutputFormat.JSON])
+    return cfg
+
+
+def store(rows: list[tuple[str, str, int, int]]) -> AlbumStore:
+    return AlbumStore.from_frame(
+        pd.DataFrame(
+            rows,
+            columns=[
+                sch.Album.album_title,
+                sch.Album.artist,
+                sch.Album.release_date,
+                sch.Album.total_time_s,
+            ],
+        )
+        .rename_axis(sch.Album.key)
+        .reset_index()
+    )
+
+
+def test_diff_albums_finds_changed_fields() -> None:
+    albums = store([("Blue", "Joni Mitchell", 1971, 2150), ("Harvest", "N", 1972, 1)])
+    sheet = store([("Blue", "Joni Mitchell", 1971, 2150), ("Harvest", "Neil", 1972, 1)])
+    diff = diff_albums(albums, sheet)
+    assert diff.changed == {1: {sch.Album.artist: "Neil"}}
+    assert diff.added is None
+    assert diff.removed == 0
+
+
+def test_diff_albums_ignores_app_fields() -> None:
+    albums = store([("Blue", "Joni Mitchell", 1971, 2150)])
+    sheet = store([("Blue", "Joni Mitchell", 1971, 2150)])
+    albums.update_row(0, {sch.PersonalData.comments: "edited in the app"})
+    albums.update_row(0, {sch.PersonalData.listened: True})
+    assert not diff_albums(albums, sheet).changed
+
+
+def test_diff_albums_finds_added_and_removed_rows() -> None:
+    albums = store([("Blue", "Joni Mitchell", 1971, 2150)])
+    sheet = store([("Blue", "Joni Mitchell", 1971, 2150), ("Harvest", "N", 1972, 1)])
+    diff = diff_albums(albums, sheet)
+    assert diff.added is not None
+    assert [album.album_title for album in diff.added] == ["Harvest"]
+    assert diff_albums(sheet, albums).removed == 1
+
+
+def test_sync_keeps_app_edits(cfg: Config) -> None:
+    storage = get_storage(cfg)
+    albums = storage.load_albums()
+    albums.update_row(
+        1,
+        {
+            sch.PersonalData.listened: True,
+            sch.PersonalData.comments: "Great",
+            sch.Album.genres: ["Folk Rock"],
+        },
+    )
+    storage.save_album(albums[1], albums)
+
+    sheet = [list(row) for row in SHEET]
+    sheet[1][2] = "Neil Young & Crazy Horse"
+    sheet[1][0] = None
+    write_sheet(cfg, sheet)
+    diff = sync_excel(cfg)
+
+    assert diff.changed == {1: {sch.Album.artist: "Neil Young & Crazy Horse"}}
+    album = get_storage(cfg).load_albums()[1]
+    assert album.artist == "Neil Young & Crazy Horse"
+    assert album.listened
+    assert album.comments == "Great"
+    assert album.genres == ["Folk Rock"]
+
+
+def test_sync_adds_and_removes_rows(cfg: Config) -> None:
+    write_sheet(
+        cfg, [*SHEET, [None, "Hejira", "Joni Mitchell", 1976, 3112, None, None]]
+    )
+    diff = sync_excel(cfg)
+    assert diff.added is not None and len(diff.added) == 1
+    albums = get_storage(cfg).load_albums()
+    assert [album.album_title for album in albums][-1] == "Hejira"
+
+    write_sheet(cfg, SHEET[:2])
+    assert sync_excel(cfg).removed == 2
+    assert len(get_storage(cfg).load_albums()) == 2
+
+
+def test_snapshot_needs_json(cfg: Config) -> None:
+    with pytest.raises(ValueError):
+        ingest_excel(cfg, [OutputFormat.SNAPSHOT])
+
+
+def test_ingest_reaches_sqlite_backend(cfg: Config) -> None:
+    cfg.data.storage_backend = "sqlite"
+    assert get_storage(cfg).load_albums()[1].artist == "Neil Young"
+
+    sheet = [list(row) for row in SHEET]
+    sheet[1][2] = "Neil Young & Crazy Horse"
+    write_sheet(cfg, sheet)
+    ingest_excel(cfg, [OutputFormat.JSON])
+    assert get_storage(cfg).load_albums()[1].artist == "Neil Young & Crazy Horse"
+
+
+def test_sync_matches_inserted_rows_by_title(cfg: Config) -> None:
+    storage = get_storage(cfg)
+    albums = storage.load_albums()
+    albums.update_row(0, {sch.Album.musicians: ["Stephen Stills"]})
+    storage.save_album(albums[0], albums)
+
+    court_and_spark = [None, "Court and Spark", "Joni Mitchell", 1974, 2209, None, None]
+    write_sheet(cfg, [court_and_spark, *SHEET])
+    diff = sync_excel(cfg)
+
+    assert not diff.changed
+    albums = get_storage(cfg).load_albums()
+    assert [album.album_title for album in albums] == [
+        "Court and Spark",
+        "Blue",
+        "Harvest",
+        "Pink Moon",
+    ]
+    assert list(albums.key) == [0, 1, 2, 3]
+    blue = albums[1]
+    assert blue.musicians == ["Stephen Stills"]
+    assert blue.listened
+    assert not albums[0].musicians
+    assert not albums[0].listened
+
+
+def test_sync_keeps_albums_moved_in_the_app(cfg: Config) -> None:
+    storage = get_storage(cfg)
+    albums = storage.load_albums()
+    albums.update_row(0, {sch.PersonalData.comments: "Great"})
+    albums.move(0, 2)
+    storage.save_all(albums)
+
+    assert not sync_excel(cfg).changed
+    albums = get_storage(cfg).load_albums()
+    assert albums[2].album_title == "Blue"
+    assert albums[2].comments == "Great"
+
+
+def test_sqlite_keeps_edits_when_json_is_touched(cfg: Config) -> None:
+    cfg.data.storage_backend = "sqlite"
+    storage = get_storage(cfg)
+    albums = storage.load_albums()
+    albums.update_row(1, {sch.PersonalData.comments: "Great"})
+    storage.save_album(albums[1], albums)
+
+    path = Path(cfg.data.album_data_json_path)
+    later = path.stat().st_mtime_ns + 10**9
+    os.utime(path, ns=(later, later))
+    assert get_storage(cfg).load_albums()[1].comments == "Great"
+
+
+def test_sqlite_edits_keep_the_shared_catalogue(cfg: Config) -> None:
+    cfg.data.storage_backend = "sqlite"
+    storage = get_storage(cfg)
+    catalogue = storage.load_catalogue()
+    catalogue.freeze()
+    data_stamp = storage.data_stamp()
+
+    albums = catalogue.overlay()
+    albums.update_row(1, {sch.Album.genres: ["Folk Rock"]})
+    storage.save_album(albums[1], albums)
+    assert storage.data_stamp() == data_stamp
+
+    session = catalogue.overlay()
+    storage.apply_edits(session)
+    assert session[1].genres == ["Folk Rock"]
+    assert not catalogue[1].genres
+
+    storage.save_all(session)
+    assert storage.data_stamp() != data_stamp
+
+
+def test_move_keeps_edits_from_other_sessions(cfg: Config) -> None:
+    storage = get_storage(cfg)
+    mover, editor = storage.load_albums(), storage.load_albums()
+    editor.update_row(2, {sch.PersonalData.comments: "Sparse"})
+    storage.save_album(editor[2], editor)
+
+    storage.move_album(mover, 0, 2)
+    albums = get_storage(cfg).load_albums()
+    assert [album.album_title for album in albums] == ["Harvest", "Pink Moon", "Blue"]
+    assert albums[1].comments == "Sparse"
+    assert albums[2].listened
+
+
+def test_stale_edits_follow_their_album(cfg: Config) -> None:
+    storage = get_storage(cfg)
+    mover, editor = storage.load_albums(), storage.load_albums()
+    storage.move_album(mover, 0, 2)
+
+    # the editor still has the keys from before the move
+    editor.update_row(1, {sch.PersonalData.comments: "Great"})
+    storage.save_album(editor[1], editor)
+    albums = get_storage(cfg).load_albums()
+    assert albums[0].album_title == "Harvest"
+    assert albums[0].comments == "Great"
+    assert not albums[1].comments
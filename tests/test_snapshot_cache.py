@@ -0,0 +1,8 @@
+from pathlib import Path
+from src.snapshot_cache import read_strings, write_strings
+
+
+def test_strings_keep_carriage_returns(tmp_path: Path) -> None:
+    strings = ["Blue", "Court\rand Spark", "Hejira\r\n", ""]
+    write_strings(tmp_path / "strings.txt", strings)
+    assert read_strings(tmp_path / "strings.txt") == strings
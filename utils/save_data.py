@@ -1,47 +1,89 @@
+from dataclasses import dataclass, field
+from enum import StrEnum
+from typing import Any
+import numpy as np
 import pandas as pd
+import openpyxl
 
 from pathlib import Path
 
 from cfg.cfg import Config
 import cfg.schema as sch
+from src.album_journal import AlbumJournal
+from src.album_store import AlbumStore
+from src.snapshot_cache import SnapshotCache
+from src.storage import get_storage
 
 SETTING_PATH = Path("C:/Users/ste-c/OneDrive/Documents/1001-albums/cfg/setting.yaml")
 
+LISTENED_COLUMN = "✓"
+EXCEL_COLUMNS = [
+    LISTENED_COLUMN,
+    sch.AlbumExcelColumns.album_title,
+    sch.AlbumExcelColumns.artist,
+    sch.AlbumExcelColumns.release_date,
+    sch.AlbumExcelColumns.total_time,
+    sch.PersonalExcelColumns.comments,
+    sch.PersonalExcelColumns.listen_again,
+]
 
-def save_csv(cfg: Config) -> None:
+# the fields that the sheet owns. everything else, such as the genres, personnel and
+# listening history, is edited in the app and is kept when the sheet is synced
+SHEET_COLUMNS = [
+    sch.Album.album_title,
+    sch.Album.artist,
+    sch.Album.release_date,
+    sch.Album.total_time_s,
+]
 
-    excel = pd.read_excel(cfg.data.raw_excel_path, cfg.data.sheet_name)
 
-    excel["listened"] = excel["✓"].apply(lambda x: True if x == "✓" else False)
-    excel["previous_listened"] = excel.apply(
-        lambda x: True if (x["✓"] == "✓") and (pd.isna(x["Comments"])) else False,
-        axis=1,
-    )
-    excel["key"] = excel.index
-    raw_data_csv = excel[
-        ["key", "Album Title", "Artist", "Release Date", "Total Times (s)"]
-    ]
-    raw_data_csv.to_csv(
-        Path(cfg.data.csv_save_dir) / f"{cfg.data.album_data_csv_name}.csv", index=False
-    )
-    personal_data_csv = excel[["key", "listened", "previous_listened", "Comments"]]
-    personal_data_csv.to_csv(
-        Path(cfg.data.csv_save_dir) / f"{cfg.data.personal_data_csv_name}.csv",
-        index=False,
-    )
+class OutputFormat(StrEnum):
 
+    CSV = "csv"
+    JSON = "json"
+    SNAPSHOT = "snapshot"
 
-def convert_excel_to_json(cfg: Config) -> None:
 
-    excel = pd.read_excel(cfg.data.raw_excel_path, cfg.data.sheet_name)
+def read_excel(cfg: Config) -> pd.DataFrame:
+    """streams the rows of the sheet, keeping only the columns that are used"""
+    workbook = openpyxl.load_workbook(
+        cfg.data.raw_excel_path, read_only=True, data_only=True
+    )
+    try:
+        rows = workbook[cfg.data.sheet_name].iter_rows(values_only=True)
+        header = list(next(rows))
+        indexes = {name: header.index(name) for name in EXCEL_COLUMNS if name in header}
+        data: dict[str, list] = {name: [] for name in indexes}
+        last_row = 0
+        for i, row in enumerate(rows, start=1):
+            for name, index in indexes.items():
+                data[name].append(row[index] if index < len(row) else None)
+            if any(row):
+                last_row = i
+    finally:
+        workbook.close()
 
-    excel["listened"] = excel["✓"].apply(lambda x: True if x == "✓" else False)
-    excel["previous_listened"] = excel.apply(
-        lambda x: True if (x["✓"] == "✓") and (pd.isna(x["Comments"])) else False,
-        axis=1,
+    # read only sheets can report empty rows after the data, so these are trimmed
+    excel = pd.DataFrame({name: values[:last_row] for name, values in data.items()})
+    for name in EXCEL_COLUMNS:
+        if name not in excel.columns:
+            excel[name] = None
+    return excel
+
+
+def derive_columns(excel: pd.DataFrame) -> pd.DataFrame:
+    """adds the key, listened and previous_listened columns"""
+    excel[sch.PersonalExcelColumns.listened] = excel[LISTENED_COLUMN] == "✓"
+    excel[sch.PersonalExcelColumns.previous_listened] = (
+        excel[sch.PersonalExcelColumns.listened]
+        & excel[sch.PersonalExcelColumns.comments].isna()
     )
-    excel["key"] = excel.index
-    raw_data_csv = excel[
+    excel[sch.AlbumExcelColumns.key] = excel.index
+    return excel
+
+
+def album_data(excel: pd.DataFrame) -> pd.DataFrame:
+    return excel[
         [
             sch.AlbumExcelColumns.key,
             sch.AlbumExcelColumns.album_title,
@@ -49,8 +91,7 @@ def convert_excel_to_json(cfg: Config) -> None:
             sch.AlbumExcelColumns.release_date,
             sch.AlbumExcelColumns.total_time,
         ]
-    ]
-    raw_data_csv.rename(
+    ].rename(
         {
             sch.AlbumExcelColumns.key: sch.Album.key,
             sch.AlbumExcelColumns.album_title: sch.Album.album_title,
@@ -59,13 +100,11 @@ def convert_excel_to_json(cfg: Config) -> None:
             sch.AlbumExcelColumns.total_time: sch.Album.total_time_s,
         },
         axis=1,
-        inplace=True,
     )
-    with open(Path(cfg.data.album_data_json_path), "w") as f:
-        text = raw_data_csv.to_json(orient="records")
-        f.write(text)
 
-    personal_data_csv = excel[
+
+def personal_data(excel: pd.DataFrame) -> pd.DataFrame:
+    return excel[
         [
             sch.PersonalExcelColumns.key,
             sch.PersonalExcelColumns.listened,
@@ -73,8 +112,7 @@ def convert_excel_to_json(cfg: Config) -> None:
             sch.PersonalExcelColumns.comments,
             sch.PersonalExcelColumns.listen_again,
         ]
-    ]
-    personal_data_csv.rename(
+    ].rename(
         {
             sch.PersonalExcelColumns.key: sch.PersonalData.key,
             sch.PersonalExcelColumns.listened: sch.PersonalData.listened,
@@ -83,8 +121,200 @@ def convert_excel_to_json(cfg: Config) -> None:
             sch.PersonalExcelColumns.listen_again: sch.PersonalData.listen_again,
         },
         axis=1,
-        inplace=True,
     )
+
+
+def write_csv(cfg: Config, excel: pd.DataFrame) -> None:
+    raw_data_csv = excel[
+        ["key", "Album Title", "Artist", "Release Date", "Total Times (s)"]
+    ]
+    raw_data_csv.to_csv(
+        Path(cfg.data.csv_save_dir) / f"{cfg.data.album_data_csv_name}.csv", index=False
+    )
+    personal_data_csv = excel[["key", "listened", "previous_listened", "Comments"]]
+    personal_data_csv.to_csv(
+        Path(cfg.data.csv_save_dir) / f"{cfg.data.personal_data_csv_name}.csv",
+        index=False,
+    )
+
+
+def write_json(cfg: Config, albums: pd.DataFrame, personal: pd.DataFrame) -> None:
+    with open(Path(cfg.data.album_data_json_path), "w") as f:
+        text = albums.to_json(orient="records")
+        f.write(text)
+
     with open(cfg.data.personal_data_json_path, "w") as f:
-        text = personal_data_csv.to_json(orient="records")
+        text = personal.to_json(orient="records")
         f.write(text)
+
+
+def sheet_albums(albums: pd.DataFrame, personal: pd.DataFrame) -> AlbumStore:
+    """returns the albums in the sheet as a store"""
+    data = albums.merge(personal, on=sch.Album.key)
+    data[sch.Album.total_time_s] = data[sch.Album.total_time_s].fillna(0)
+    return AlbumStore.from_frame(data)
+
+
+def write_snapshot_cache(
+    cfg: Config, albums: pd.DataFrame, personal: pd.DataFrame
+) -> None:
+    """writes the snapshot cache for the json files that have just been written"""
+    cache = SnapshotCache(cfg)
+    sources = cache.source_stamps()
+    cache.write(sheet_albums(albums, personal), sources)
+
+
+def ingest_excel(cfg: Config, formats: list[OutputFormat] | None = None) -> None:
+    """reads the sheet once, and writes each of the output formats from it.
+    every format is written if none are given. the snapshot cache is stamped with the
+    json files, so it can only be written with them. the storage backend is rebuilt
+    from the new json files"""
+    if formats is None:
+        formats = list(OutputFormat)
+    if OutputFormat.SNAPSHOT in formats and OutputFormat.JSON not in formats:
+        raise ValueError("the snapshot cache can only be written with the json files")
+    excel = derive_columns(read_excel(cfg))
+    if OutputFormat.CSV in formats:
+        write_csv(cfg, excel)
+    if OutputFormat.JSON not in formats:
+        return
+    albums = album_data(excel)
+    personal = personal_data(excel)
+    write_json(cfg, albums, personal)
+    # the journal holds edits to the albums as they were before this import
+    AlbumJournal(cfg).clear()
+    if OutputFormat.SNAPSHOT in formats:
+        write_snapshot_cache(cfg, albums, personal)
+    get_storage(cfg).rebuild()
+
+
+def save_csv(cfg: Config) -> None:
+    ingest_excel(cfg, [OutputFormat.CSV])
+
+
+def convert_excel_to_json(cfg: Config) -> None:
+    ingest_excel(cfg, [OutputFormat.JSON, OutputFormat.SNAPSHOT])
+
+
+def row_hashes(albums: AlbumStore) -> np.ndarray:
+    """returns a hash of the sheet fields of each album"""
+    frame = pd.DataFrame({name: albums.columns[name] for name in SHEET_COLUMNS})
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy()
+
+
+# the fields used to find the saved album for each sheet row, tried in turn. the title
+# and artist are tried first, then the title alone so that an artist correction in the
+# sheet keeps the album, then the artist and year so that a title correction does too
+MATCH_FIELDS = [
+    [sch.Album.album_title, sch.Album.artist],
+    [sch.Album.album_title],
+    [sch.Album.artist, sch.Album.release_date],
+]
+
+
+def identity(albums: AlbumStore, row: int, fields: list[str]) -> tuple:
+    """returns the values of the given fields for a row, ignoring case and spacing"""
+    return tuple(str(albums.columns[name][row]).strip().casefold() for name in fields)
+
+
+def match_albums(albums: AlbumStore, sheet: AlbumStore) -> np.ndarray:
+    """returns the row of the saved album for each sheet row, or -1 if it is new.
+    albums that appear more than once are matched in the order they appear"""
+    matches = np.full(len(sheet), -1, dtype=np.int64)
+    used = np.zeros(len(albums), dtype=bool)
+    for fields in MATCH_FIELDS:
+        candidates: dict[tuple, list[int]] = {}
+        for row in np.flatnonzero(~used).tolist():
+            candidates.setdefault(identity(albums, row, fields), []).append(row)
+        for row in np.flatnonzero(matches < 0).tolist():
+            rows = candidates.get(identity(sheet, row, fields))
+            if rows:
+                matches[row] = rows.pop(0)
+                used[matches[row]] = True
+    return matches
+
+
+@dataclass
+class SheetDiff:
+    """The changes between the sheet and the saved albums.
+    changed holds only the fields that differ, keyed by album key. matches holds the
+    row of the saved album for each sheet row, or -1 for the rows in added"""
+
+    changed: dict[int, dict[str, Any]] = field(default_factory=dict)
+    added: AlbumStore | None = None
+    removed: int = 0
+    matches: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int64))
+
+
+def diff_albums(albums: AlbumStore, sheet: AlbumStore) -> SheetDiff:
+    """compares the sheet fields of each album with the sheet row it matches. rows are
+    matched by title and artist rather than position, so inserting or reordering rows
+    in the sheet does not move the data entered in the app onto another album. matched
+    rows are compared by hash first, so only the rows that have changed are checked
+    field by field"""
+    matches = match_albums(albums, sheet)
+    matched = np.flatnonzero(matches >= 0)
+    diff = SheetDiff(removed=len(albums) - len(matched), matches=matches)
+    changed_rows = matched[
+        row_hashes(albums)[matches[matched]] != row_hashes(sheet)[matched]
+    ]
+    for row in changed_rows.tolist():
+        key = int(matches[row])
+        old, new = albums[key], sheet[row]
+        values = {
+            name: getattr(new, name)
+            for name in SHEET_COLUMNS
+            if getattr(old, name) != getattr(new, name)
+        }
+        if values:
+            diff.changed[key] = values
+    added = np.flatnonzero(matches < 0)
+    if len(added):
+        diff.added = sheet.take(added)
+    return diff
+
+
+def synced_albums(albums: AlbumStore, diff: SheetDiff) -> AlbumStore:
+    """returns the albums with the removed albums dropped and the added albums inserted
+    after the album above them in the sheet. the saved albums keep their order, so an
+    album moved in the app stays where it was moved to"""
+    added_after: dict[int, list[int]] = {}
+    previous, added = -1, len(albums)
+    for match in diff.matches.tolist():
+        if match < 0:
+            added_after.setdefault(previous, []).append(added)
+            added += 1
+        else:
+            previous = match
+    matched = set(diff.matches.tolist())
+    order = list(added_after.get(-1, []))
+    for row in range(len(albums)):
+        if row in matched:
+            order += [row, *added_after.get(row, [])]
+    combined = albums.copy()
+    if diff.added is not None:
+        combined.extend(diff.added)
+    synced = combined.take(np.array(order, dtype=np.int64))
+    synced.columns[sch.Album.key] = np.arange(len(synced), dtype=np.int64)
+    return synced
+
+
+def sync_excel(cfg: Config) -> SheetDiff:
+    """updates the saved albums from the sheet, rather than regenerating them.
+    only the albums whose sheet fields have changed are saved, and the genres and
+    personnel entered in the app are kept with the album they were entered for. albums
+    added to the sheet are inserted, and albums removed from the sheet are dropped"""
+    excel = derive_columns(read_excel(cfg))
+    sheet = sheet_albums(album_data(excel), personal_data(excel))
+    storage = get_storage(cfg)
+    albums = storage.load_albums()
+    diff = diff_albums(albums, sheet)
+    for key, values in diff.changed.items():
+        albums.update_row(key, values)
+    if diff.added is None and not diff.removed:
+        for key in diff.changed:
+            storage.save_album(albums[key], albums)
+        return diff
+    # the keys of the albums have changed, so every album is written
+    storage.save_all(synced_albums(albums, diff))
+    return diff